@@ -9,33 +9,166 @@ See Wikipedia article (https://en.wikipedia.org/wiki/A*_search_algorithm)
 
 """
 
+import functools
+import heapq
 import math
+import os
+import time
+from array import array
 
 import matplotlib.pyplot as plt
 
+import grid_map
+from bit_grid import BitGrid
+from instrumentation import Instrumentation
+
 show_animation = True
 
+# anytime search: time budget, first heuristic weight and its decrease
+# between iterations
+ANYTIME_TIME_BUDGET = 0.02  # [s]
+ANYTIME_WEIGHT = 3.0
+ANYTIME_WEIGHT_STEP = 0.5
+# decimals f is rounded to when planning_array breaks f ties by cost, so
+# the rounding errors of an exact heuristic do not decide the order
+TIE_DIGITS = 9
+# search modes of AStarPlanner.planning
+PLANNING_MODES = ("node", "array", "jps", "bidirectional", "anytime")
+
 
 class AStarPlanner:
 
-    def __init__(self, ox, oy, resolution, rr):
+    def __init__(self, ox, oy, resolution, rr, instrumentation=None,
+                 packed=False, distance_map=False):
         """
         Initialize grid map for a star planning
 
-        ox: x position list of Obstacles [m]
-        oy: y position list of Obstacles [m]
+        ox: x position list or array of Obstacles [m], None leaves the
+            map empty. Arrays are used without copying, memory-mapped
+            ones (see from_point_file) are read one chunk at a time.
+        oy: y position list or array of Obstacles [m]
         resolution: grid resolution [m]
         rr: robot radius[m]
+        instrumentation: Instrumentation collecting counters, timers and
+                         callbacks, None runs headless
+        packed: keep the obstacle map as a BitGrid, one bit per cell,
+                for maps whose bool array does not fit in memory. Searches
+                on it are slower.
+        distance_map: also keep the distance from every cell to its
+                      nearest obstacle, 8 bytes per cell, so the robot
+                      radius can be changed without rebuilding the map,
+                      see set_robot_radius
         """
 
         self.resolution = resolution
         self.rr = rr
+        self.instrumentation = instrumentation
+        self.packed = packed
         self.min_x, self.min_y = 0, 0
         self.max_x, self.max_y = 0, 0
         self.obstacle_map = None
+        self.keep_distance_map = distance_map
+        self.distance_map = None  # read-only, shared by for_robot_radius
         self.x_width, self.y_width = 0, 0
+        self.n_expanded = 0  # nodes expanded by the last planning call
+        self.map_version = 0  # bumped on every obstacle map change
         self.motion = self.get_motion_model()
-        self.calc_obstacle_map(ox, oy)
+        if ox is not None:
+            self.calc_obstacle_map(ox, oy)
+
+    @classmethod
+    def from_obstacle_map(cls, obstacle_map, resolution, rr, min_x, min_y,
+                          max_x, max_y, instrumentation=None):
+        """
+        Initialize a star planning on an obstacle map that is already built,
+        e.g. one loaded from a cache or mapped from shared memory
+
+        obstacle_map: bool array or BitGrid of shape (x_width, y_width),
+                      used as is
+        resolution: grid resolution [m]
+        rr: robot radius[m]
+        min_x, min_y, max_x, max_y: map bounds [m]
+        instrumentation: see __init__
+        """
+        planner = cls(None, None, resolution, rr, instrumentation,
+                      packed=isinstance(obstacle_map, BitGrid))
+        planner.min_x, planner.min_y = min_x, min_y
+        planner.max_x, planner.max_y = max_x, max_y
+        planner.obstacle_map = obstacle_map
+        planner.x_width, planner.y_width = obstacle_map.shape
+        return planner
+
+    @classmethod
+    def from_distance_map(cls, distance_map, resolution, rr, min_x, min_y,
+                          max_x, max_y, instrumentation=None, packed=False):
+        """
+        Initialize a star planning for robot radius rr on a distance map
+        that is already built, see grid_map.build_distance_map
+
+        distance_map: float array of shape (x_width, y_width), used as is
+        """
+        planner = cls(None, None, resolution, rr, instrumentation, packed,
+                      distance_map=True)
+        planner.min_x, planner.min_y = min_x, min_y
+        planner.max_x, planner.max_y = max_x, max_y
+        planner.distance_map = distance_map
+        planner.x_width, planner.y_width = distance_map.shape
+        planner.obstacle_map = grid_map.obstacle_map_of_radius(
+            distance_map, rr, packed)
+        return planner
+
+    @classmethod
+    def from_cache(cls, ox, oy, resolution, rr, cache_dir,
+                   instrumentation=None):
+        """
+        Initialize a star planning from the obstacle map cached in cache_dir,
+        building and saving it first if it is not there yet
+
+        Cache files are named by a hash of the obstacles and parameters and
+        are memory-mapped when loaded.
+        """
+        path = os.path.join(cache_dir, grid_map.obstacle_map_key(
+            ox, oy, resolution, rr) + ".grid")
+        if os.path.exists(path):
+            obstacle_map, params = grid_map.load_obstacle_map(path)
+            return cls.from_obstacle_map(obstacle_map, **params,
+                                         instrumentation=instrumentation)
+
+        planner = cls(ox, oy, resolution, rr, instrumentation)
+        os.makedirs(cache_dir, exist_ok=True)
+        grid_map.save_obstacle_map(path, planner.obstacle_map, resolution, rr,
+                                   planner.min_x, planner.min_y,
+                                   planner.max_x, planner.max_y)
+        return planner
+
+    @classmethod
+    def from_point_file(cls, path, resolution, rr, dtype="<f4", columns=2,
+                        instrumentation=None, packed=False):
+        """
+        Initialize a star planning on the obstacle points of a binary point
+        file, e.g. a LiDAR dump, see grid_map.load_point_file
+
+        The file is memory-mapped and rasterized one chunk of points at a
+        time, the points never become Python lists.
+        """
+        ox, oy = grid_map.load_point_file(path, dtype, columns)
+        return cls(ox, oy, resolution, rr, instrumentation, packed=packed)
+
+    @classmethod
+    def from_occupancy_image(cls, path, pixel_size, resolution, rr,
+                             origin=(0.0, 0.0),
+                             occupied_thresh=grid_map.OCCUPIED_THRESH,
+                             instrumentation=None, packed=False):
+        """
+        Initialize a star planning on an occupancy grid image, e.g. a PNG
+        map, see grid_map.load_occupancy_image
+
+        pixel_size: size of an image pixel [m]
+        origin: position of the lower-left corner of the image [m]
+        """
+        ox, oy = grid_map.load_occupancy_image(path, pixel_size, origin,
+                                               occupied_thresh)
+        return cls(ox, oy, resolution, rr, instrumentation, packed=packed)
 
     class Node:
         def __init__(self, x, y, cost, parent_index):
@@ -48,7 +181,7 @@ class AStarPlanner:
             return str(self.x) + "," + str(self.y) + "," + str(
                 self.cost) + "," + str(self.parent_index)
 
-    def planning(self, sx, sy, gx, gy):
+    def planning(self, sx, sy, gx, gy, mode="node", heuristic=None):
         """
         A star path search
 
@@ -57,6 +190,15 @@ class AStarPlanner:
             s_y: start y position [m]
             gx: goal x position [m]
             gy: goal y position [m]
+            mode: "node" keeps Node objects in open/closed dicts,
+                  "array" keeps the search state in flat per-cell arrays,
+                  "jps" runs Jump Point Search,
+                  "bidirectional" searches from start and goal at once,
+                  "anytime" returns the best path planning_anytime finds
+                  within ANYTIME_TIME_BUDGET
+            heuristic: h(gx, gy, x, y) on grid indexes replacing
+                       calc_xy_heuristic, "array" mode only, see
+                       planning_array
 
         output:
             rx: x position list of the final path
@@ -68,34 +210,63 @@ class AStarPlanner:
         goal_node = self.Node(self.calc_xy_index(gx, self.min_x),
                               self.calc_xy_index(gy, self.min_y), 0.0, -1)
 
+        search = {"node": self.planning_node,
+                  "array": self.planning_array,
+                  "jps": self.planning_jps,
+                  "bidirectional": self.planning_bidirectional,
+                  "anytime": self.planning_anytime_final}.get(mode)
+        if search is None:
+            raise ValueError("unknown planning mode: {}".format(mode))
+        if heuristic is not None:
+            if mode != "array":
+                raise ValueError("a heuristic is only used by the array "
+                                 "mode, not {}".format(mode))
+            search = functools.partial(search, heuristic=heuristic)
+
+        inst = self.instrumentation
+        if inst is not None:
+            inst.start("search")
+        rx, ry = search(start_node, goal_node)
+        if inst is not None:
+            inst.stop("path")
+
+        return rx, ry
+
+    def planning_node(self, start_node, goal_node):
+        """
+        A star path search keeping Node objects in open and closed dicts
+        """
+        on_expand = None if self.instrumentation is None else \
+            self.instrumentation.on_expand
+
         open_set, closed_set = dict(), dict()
-        open_set[self.calc_grid_index(start_node)] = start_node
+        start_id = self.calc_grid_index(start_node)
+        open_set[start_id] = start_node
+
+        # priority queue of (f, discovery order, grid index). f is cached at
+        # push time and ties are broken by discovery order, so nodes come out
+        # in the same order as a min() scan over open_set. Entries left behind
+        # by a cheaper update are skipped once their node is closed.
+        order = {start_id: 0}
+        open_heap = [(self.calc_node_heuristic(goal_node, start_node), 0,
+                      start_id)]
+        n_pushed = 0
+        found = False
 
         while 1:
             if len(open_set) == 0:
-                print("Open set is empty..")
                 break
 
-            c_id = min(
-                open_set,
-                key=lambda o: open_set[o].cost + self.calc_heuristic(goal_node,
-                                                                     open_set[
-                                                                         o]))
+            c_id = heapq.heappop(open_heap)[2]
+            if c_id not in open_set:
+                continue
             current = open_set[c_id]
 
-            # show graph
-            if show_animation:  # pragma: no cover
-                plt.plot(self.calc_grid_position(current.x, self.min_x),
-                         self.calc_grid_position(current.y, self.min_y), "xc")
-                # for stopping simulation with the esc key.
-                plt.gcf().canvas.mpl_connect('key_release_event',
-                                             lambda event: [exit(
-                                                 0) if event.key == 'escape' else None])
-                if len(closed_set.keys()) % 10 == 0:
-                    plt.pause(0.001)
+            if on_expand is not None:
+                on_expand(current.x, current.y)
 
             if current.x == goal_node.x and current.y == goal_node.y:
-                print("Find goal")
+                found = True
                 goal_node.parent_index = current.parent_index
                 goal_node.cost = current.cost
                 break
@@ -122,15 +293,609 @@ class AStarPlanner:
 
                 if n_id not in open_set:
                     open_set[n_id] = node  # discovered a new node
+                    order[n_id] = len(order)
+                elif open_set[n_id].cost > node.cost:
+                    # This path is the best until now. record it
+                    open_set[n_id] = node
                 else:
-                    if open_set[n_id].cost > node.cost:
-                        # This path is the best until now. record it
-                        open_set[n_id] = node
+                    continue
+
+                heapq.heappush(open_heap, (
+                    node.cost + self.calc_node_heuristic(goal_node, node),
+                    order[n_id], n_id))
+                n_pushed += 1
 
+        self.finish_search(found, len(closed_set), n_pushed,
+                           len(closed_set) * len(self.motion) - n_pushed)
         rx, ry = self.calc_final_path(goal_node, closed_set)
 
         return rx, ry
 
+    def planning_array(self, start_node, goal_node, heuristic=None):
+        """
+        A star path search keeping g-cost, parent index and closed flag of
+        every grid cell in preallocated flat arrays instead of Node objects,
+        which keeps memory and garbage collector load low on big grids.
+        Cells are numbered ix * y_width + iy, the layout of obstacle_map.
+
+        With the default heuristic, expands nodes in the same order as
+        planning(mode="node").
+
+        heuristic: h(gx, gy, x, y) on grid indexes, calc_xy_heuristic by
+                   default. f ties of a given heuristic, to TIE_DIGITS
+                   decimals, go to the node with the larger cost instead
+                   of the one discovered first, so with an exact
+                   heuristic, e.g. a cost-to-go field, only the nodes of
+                   one optimal path are expanded.
+        """
+        x_width, y_width = self.x_width, self.y_width
+        n_cells = x_width * y_width
+        index_type = "i" if n_cells < 2 ** 31 else "q"
+        cost = array("d", [math.inf]) * n_cells
+        parent = array(index_type, [-1]) * n_cells
+        order = array(index_type, [0]) * n_cells  # discovery order
+        closed = bytearray(n_cells)
+        blocked = self.blocked_cells()
+        motion = [(dx, dy, dx * y_width + dy, c) for dx, dy, c in self.motion]
+        h = heuristic or self.calc_xy_heuristic
+        deep_ties = heuristic is not None
+        gx, gy = goal_node.x, goal_node.y
+        goal_id = gx * y_width + gy
+        on_expand = None if self.instrumentation is None else \
+            self.instrumentation.on_expand
+
+        start_id = start_node.x * y_width + start_node.y
+        cost[start_id] = 0.0
+        n_discovered = 1
+        open_heap = [(h(gx, gy, start_node.x, start_node.y), 0, start_id)]
+        n_expanded = n_pushed = 0
+        found = False
+
+        while 1:
+            if not open_heap:
+                break
+
+            c_id = heapq.heappop(open_heap)[2]
+            if closed[c_id]:
+                continue
+            cx, cy = divmod(c_id, y_width)
+
+            if on_expand is not None:
+                on_expand(cx, cy)
+
+            if c_id == goal_id:
+                found = True
+                goal_node.parent_index = parent[c_id]
+                goal_node.cost = cost[c_id]
+                break
+
+            closed[c_id] = 1
+            n_expanded += 1
+            c_cost = cost[c_id]
+
+            for dx, dy, d_id, move_cost in motion:
+                x, y = cx + dx, cy + dy
+                if x < 0 or y < 0 or x >= x_width or y >= y_width:
+                    continue
+                n_id = c_id + d_id
+                if blocked[n_id] or closed[n_id]:
+                    continue
+
+                n_cost = c_cost + move_cost
+                if cost[n_id] == math.inf:
+                    order[n_id] = n_discovered  # discovered a new node
+                    n_discovered += 1
+                elif cost[n_id] <= n_cost:
+                    continue
+                cost[n_id] = n_cost
+                parent[n_id] = c_id
+                if deep_ties:
+                    heapq.heappush(open_heap, (
+                        round(n_cost + h(gx, gy, x, y), TIE_DIGITS),
+                        -n_cost, n_id))
+                else:
+                    heapq.heappush(open_heap, (n_cost + h(gx, gy, x, y),
+                                               order[n_id], n_id))
+                n_pushed += 1
+
+        self.finish_search(found, n_expanded, n_pushed,
+                           n_expanded * len(motion) - n_pushed)
+        rx, ry = self.calc_final_path_array(goal_node, parent)
+
+        return rx, ry
+
+    def planning_jps(self, start_node, goal_node):
+        """
+        Jump Point Search
+
+        On the uniform-cost 8-connected grid of the motion model, only the
+        jump points, where an obstacle forces a turn, have to be expanded.
+        Moves follow get_motion_model, a diagonal move only needs the cell
+        it goes to to be free. The path is optimal, and is returned cell by
+        cell like the other modes.
+
+        Ref:
+        D. Harabor, A. Grastien, "Online Graph Pruning for Pathfinding on
+        Grid Maps", AAAI 2011
+        """
+        x_width, y_width = self.x_width, self.y_width
+        blocked = self.blocked_cells()
+        gx, gy = goal_node.x, goal_node.y
+        h = self.calc_xy_heuristic
+        on_expand = None if self.instrumentation is None else \
+            self.instrumentation.on_expand
+
+        def free(x, y):
+            return 0 <= x < x_width and 0 <= y < y_width and \
+                not blocked[x * y_width + y]
+
+        def jump(x, y, dx, dy):
+            # walk from (x, y) towards (dx, dy) until a jump point, the goal
+            # or an obstacle
+            while 1:
+                x += dx
+                y += dy
+                if not free(x, y):
+                    return None
+                if x == gx and y == gy:
+                    return x, y
+                if dx and dy:
+                    if (not free(x - dx, y) and free(x - dx, y + dy)) or \
+                            (not free(x, y - dy) and free(x + dx, y - dy)):
+                        return x, y
+                    if jump(x, y, dx, 0) or jump(x, y, 0, dy):
+                        return x, y
+                elif dx:
+                    if (not free(x, y + 1) and free(x + dx, y + 1)) or \
+                            (not free(x, y - 1) and free(x + dx, y - 1)):
+                        return x, y
+                else:
+                    if (not free(x + 1, y) and free(x + 1, y + dy)) or \
+                            (not free(x - 1, y) and free(x - 1, y + dy)):
+                        return x, y
+
+        def directions(x, y, parent):
+            # pruned neighbour directions of a jump point
+            if parent is None:
+                return [(m[0], m[1]) for m in self.motion]
+            dx = (x > parent[0]) - (x < parent[0])
+            dy = (y > parent[1]) - (y < parent[1])
+            if dx and dy:
+                dirs = [(dx, 0), (0, dy), (dx, dy)]
+                if not free(x - dx, y):
+                    dirs.append((-dx, dy))
+                if not free(x, y - dy):
+                    dirs.append((dx, -dy))
+            elif dx:
+                dirs = [(dx, 0)]
+                for d in (1, -1):
+                    if not free(x, y + d):
+                        dirs.append((dx, d))
+            else:
+                dirs = [(0, dy)]
+                for d in (1, -1):
+                    if not free(x + d, y):
+                        dirs.append((d, dy))
+            return dirs
+
+        start = (start_node.x, start_node.y)
+        cost, parent = {start: 0.0}, {start: None}
+        closed = set()
+        order = 0  # ties go to the earlier push, like the other modes
+        open_heap = [(h(gx, gy, start[0], start[1]), order, start)]
+        n_expanded = n_jumps = 0
+        found = False
+
+        while 1:
+            if not open_heap:
+                break
+
+            current = heapq.heappop(open_heap)[2]
+            if current in closed:
+                continue
+
+            if on_expand is not None:
+                on_expand(current[0], current[1])
+
+            if current == (gx, gy):
+                found = True
+                goal_node.cost = cost[current]
+                break
+
+            closed.add(current)
+            n_expanded += 1
+            cx, cy = current
+
+            dirs = directions(cx, cy, parent[current])
+            n_jumps += len(dirs)
+            for dx, dy in dirs:
+                jump_point = jump(cx, cy, dx, dy)
+                if jump_point is None or jump_point in closed:
+                    continue
+                # jump points are reached by a straight or diagonal line
+                n = max(abs(jump_point[0] - cx), abs(jump_point[1] - cy))
+                n_cost = cost[current] + n * math.hypot(dx, dy)
+                if n_cost < cost.get(jump_point, math.inf):
+                    cost[jump_point] = n_cost
+                    parent[jump_point] = current
+                    order += 1
+                    heapq.heappush(open_heap, (
+                        n_cost + h(gx, gy, jump_point[0], jump_point[1]),
+                        order, jump_point))
+
+        self.finish_search(found, n_expanded, order, n_jumps - order)
+        rx, ry = self.calc_final_path_jps(goal_node, parent)
+
+        return rx, ry
+
+    def finish_search(self, found, n_expanded, n_pushed, n_rejected):
+        """
+        publish the counters a search kept locally, and with instrumentation
+        stop the search timer and start the path extraction one
+
+        found: whether the goal was reached
+        n_expanded: expanded nodes
+        n_pushed: open set pushes, the start node not counted
+        n_rejected: generated neighbours that were not pushed
+        """
+        self.n_expanded = n_expanded
+        inst = self.instrumentation
+        if inst is None:
+            return
+        inst.stop("search")
+        inst.count(expansions=n_expanded, pushes=n_pushed,
+                   rejections=n_rejected)
+        inst.log("Find goal" if found else "Open set is empty..")
+        inst.start("path")
+
+    def calc_final_path_jps(self, goal_node, parent):
+        # generate final course, filling in the cells between jump points
+        rx, ry = [self.calc_grid_position(goal_node.x, self.min_x)], [
+            self.calc_grid_position(goal_node.y, self.min_y)]
+        x, y = goal_node.x, goal_node.y
+        jump_point = parent.get((x, y))
+        while jump_point is not None:
+            dx = (jump_point[0] > x) - (jump_point[0] < x)
+            dy = (jump_point[1] > y) - (jump_point[1] < y)
+            while (x, y) != jump_point:
+                x += dx
+                y += dy
+                rx.append(self.calc_grid_position(x, self.min_x))
+                ry.append(self.calc_grid_position(y, self.min_y))
+            jump_point = parent[jump_point]
+
+        return rx, ry
+
+    def planning_bidirectional(self, start_node, goal_node):
+        """
+        Bidirectional A* search
+
+        A forward search from the start and a backward search from the goal
+        run at once, each step expanding the side with the smaller open set,
+        and the cheapest path found where they meet is kept. Nodes already
+        closed by the other side, or whose f-score reaches that cost, are
+        not expanded. The search stops once either side's lowest f-score
+        reaches the cost of the best meeting, which proves it optimal.
+
+        Both sides use the octile distance to their target, exact on an
+        obstacle free 8-connected grid and consistent, whatever
+        calc_xy_heuristic does, as the stopping test relies on it.
+
+        Ref:
+        H. Kwa, "BS*: An admissible bidirectional staged heuristic search
+        algorithm", Artificial Intelligence 38, 1989
+        """
+        x_width, y_width = self.x_width, self.y_width
+        blocked = self.blocked_cells()
+        motion = [(dx, dy, dx * y_width + dy, c) for dx, dy, c in self.motion]
+        target = ((goal_node.x, goal_node.y), (start_node.x, start_node.y))
+        diagonal = math.sqrt(2) - 1.0
+
+        on_expand = None if self.instrumentation is None else \
+            self.instrumentation.on_expand
+
+        def octile(d, x, y):
+            dx, dy = abs(target[d][0] - x), abs(target[d][1] - y)
+            return dx + dy + diagonal * min(dx, dy) - min(dx, dy)
+
+        start_id = start_node.x * y_width + start_node.y
+        goal_id = goal_node.x * y_width + goal_node.y
+        # index 0 holds the forward search, 1 the backward one
+        cost = ({start_id: 0.0}, {goal_id: 0.0})
+        parent = ({start_id: -1}, {goal_id: -1})
+        closed = (set(), set())
+        open_heap = ([(octile(0, start_node.x, start_node.y), 0, start_id)],
+                     [(octile(1, goal_node.x, goal_node.y), 0, goal_id)])
+        order = 0
+        best_cost, meet_id = math.inf, -1
+        if start_id == goal_id:
+            best_cost, meet_id = 0.0, start_id
+        n_expanded = 0
+
+        while 1:
+            for d in (0, 1):
+                while open_heap[d] and open_heap[d][0][2] in closed[d]:
+                    heapq.heappop(open_heap[d])
+            if not open_heap[0] or not open_heap[1]:
+                break
+            if max(open_heap[0][0][0], open_heap[1][0][0]) >= best_cost:
+                break
+
+            d = 0 if len(open_heap[0]) <= len(open_heap[1]) else 1
+            f, _, c_id = heapq.heappop(open_heap[d])
+            closed[d].add(c_id)
+            if c_id in closed[1 - d] or f >= best_cost:
+                continue
+            if d == 1 and blocked[c_id]:
+                continue  # no move ends in an obstacle
+            n_expanded += 1
+            cx, cy = divmod(c_id, y_width)
+            c_cost = cost[d][c_id]
+            if on_expand is not None:
+                on_expand(cx, cy)
+
+            for dx, dy, d_id, move_cost in motion:
+                x, y = cx + dx, cy + dy
+                if x < 0 or y < 0 or x >= x_width or y >= y_width:
+                    continue
+                n_id = c_id + d_id
+                # forward moves go into n, backward ones come out of it,
+                # which only the start may do from inside an obstacle
+                if n_id in closed[d] or (
+                        blocked[n_id] and (d == 0 or n_id != start_id)):
+                    continue
+
+                n_cost = c_cost + move_cost
+                if n_cost >= cost[d].get(n_id, math.inf):
+                    continue
+                cost[d][n_id] = n_cost
+                parent[d][n_id] = c_id
+                order += 1
+                heapq.heappush(open_heap[d],
+                               (n_cost + octile(d, x, y), order, n_id))
+
+                if n_id in cost[1 - d] and \
+                        n_cost + cost[1 - d][n_id] < best_cost:
+                    best_cost = n_cost + cost[1 - d][n_id]
+                    meet_id = n_id
+
+        if meet_id != -1:
+            goal_node.cost = best_cost
+
+        self.finish_search(meet_id != -1, n_expanded, order,
+                           n_expanded * len(motion) - order)
+        rx, ry = self.calc_final_path_bidirectional(goal_node, meet_id,
+                                                    parent)
+
+        return rx, ry
+
+    def calc_final_path_bidirectional(self, goal_node, meet_id, parent):
+        # generate final course by joining the backward chain from the
+        # meeting node to the goal and the forward chain to the start
+        if meet_id == -1:
+            return [self.calc_grid_position(goal_node.x, self.min_x)], [
+                self.calc_grid_position(goal_node.y, self.min_y)]
+
+        ids = []
+        i = meet_id
+        while i != -1:
+            ids.append(i)
+            i = parent[1][i]
+        ids.reverse()
+        i = parent[0][meet_id]
+        while i != -1:
+            ids.append(i)
+            i = parent[0][i]
+
+        rx, ry = [], []
+        for i in ids:
+            ix, iy = divmod(i, self.y_width)
+            rx.append(self.calc_grid_position(ix, self.min_x))
+            ry.append(self.calc_grid_position(iy, self.min_y))
+
+        return rx, ry
+
+    def planning_anytime(self, sx, sy, gx, gy,
+                         time_budget=ANYTIME_TIME_BUDGET,
+                         weight=ANYTIME_WEIGHT,
+                         weight_step=ANYTIME_WEIGHT_STEP):
+        """
+        Anytime Repairing A* (ARA*) path search, a generator of better and
+        better paths
+
+        The first search runs with the heuristic inflated by weight and
+        always completes, so a path comes quickly. Each following one
+        lowers the weight by weight_step, or to the bound reached, down to
+        1 and continues from the state of the one before: only the nodes
+        whose cost dropped after they were expanded are expanded again.
+        The search stops when the time budget is spent, in the middle of
+        an iteration whose path is then not reported, or once the path is
+        proven optimal.
+
+        input:
+            sx, sy: start position [m]
+            gx, gy: goal position [m]
+            time_budget: time after which no further path is searched [s]
+            weight: heuristic weight of the first search, at least 1
+            weight_step: weight decrease between searches
+
+        yields:
+            rx, ry: x and y position lists of the path, goal first like
+                    planning
+            bound: suboptimality bound, the path costs at most bound times
+                   the optimal one, 1.0 for a proven optimal path
+
+        Nothing is yielded when there is no path.
+
+        Ref:
+        M. Likhachev, G. Gordon, S. Thrun, "ARA*: Anytime A* with Provable
+        Bounds on Sub-Optimality", NIPS 2003
+        """
+        start_node = self.Node(self.calc_xy_index(sx, self.min_x),
+                               self.calc_xy_index(sy, self.min_y), 0.0, -1)
+        goal_node = self.Node(self.calc_xy_index(gx, self.min_x),
+                              self.calc_xy_index(gy, self.min_y), 0.0, -1)
+
+        inst = self.instrumentation
+        if inst is not None:
+            inst.start("search")
+        try:
+            yield from self.anytime_search(start_node, goal_node,
+                                           time_budget, weight, weight_step)
+        finally:
+            if inst is not None:
+                inst.stop("path")
+
+    def planning_anytime_final(self, start_node, goal_node):
+        # last path of the anytime search, for planning(mode="anytime")
+        rx, ry = [self.calc_grid_position(goal_node.x, self.min_x)], [
+            self.calc_grid_position(goal_node.y, self.min_y)]
+        for rx, ry, _ in self.anytime_search(start_node, goal_node):
+            pass
+
+        return rx, ry
+
+    def anytime_search(self, start_node, goal_node,
+                       time_budget=ANYTIME_TIME_BUDGET,
+                       weight=ANYTIME_WEIGHT,
+                       weight_step=ANYTIME_WEIGHT_STEP):
+        """
+        ARA* search of planning_anytime on grid nodes
+
+        The search state lives in flat per-cell arrays like in
+        planning_array. The heuristic is the octile distance, consistent
+        on the 8-connected grid whatever calc_xy_heuristic does, which the
+        bounds rely on.
+        """
+        deadline = time.perf_counter() + time_budget
+        x_width, y_width = self.x_width, self.y_width
+        n_cells = x_width * y_width
+        index_type = "i" if n_cells < 2 ** 31 else "q"
+        cost = array("d", [math.inf]) * n_cells
+        parent = array(index_type, [-1]) * n_cells
+        key = array("d", [math.inf]) * n_cells  # OPEN key, inf outside OPEN
+        closed = bytearray(n_cells)
+        incons = []  # nodes whose cost dropped after they were closed
+        blocked = self.blocked_cells()
+        motion = [(dx, dy, dx * y_width + dy, c) for dx, dy, c in self.motion]
+        gx, gy = goal_node.x, goal_node.y
+        goal_id = gx * y_width + gy
+        diagonal = math.sqrt(2) - 1.0
+        on_expand = None if self.instrumentation is None else \
+            self.instrumentation.on_expand
+
+        def octile(x, y):
+            dx, dy = abs(gx - x), abs(gy - y)
+            return dx + dy + diagonal * min(dx, dy) - min(dx, dy)
+
+        start_id = start_node.x * y_width + start_node.y
+        w = max(weight, 1.0)
+        cost[start_id] = 0.0
+        h = octile(start_node.x, start_node.y)
+        key[start_id] = w * h
+        # (key, h, index) entries, ties go to the node nearer the goal.
+        # Entries whose key is no longer the node's key are stale.
+        open_heap = [(key[start_id], h, start_id)]
+        n_expanded = n_pushed = n_iterations = 0
+        found = False
+
+        try:
+            while 1:
+                # improve the path with weight w until the goal's cost is no
+                # more than the lowest key, or the deadline
+                timed_out = False
+                while open_heap:
+                    f, _, c_id = open_heap[0]
+                    if f != key[c_id]:
+                        heapq.heappop(open_heap)
+                        continue
+                    if cost[goal_id] <= f:
+                        break
+                    if n_iterations and not n_expanded & 63 and \
+                            time.perf_counter() > deadline:
+                        timed_out = True
+                        break
+                    heapq.heappop(open_heap)
+                    key[c_id] = math.inf
+                    closed[c_id] = 1
+                    n_expanded += 1
+                    cx, cy = divmod(c_id, y_width)
+                    c_cost = cost[c_id]
+                    if on_expand is not None:
+                        on_expand(cx, cy)
+
+                    for dx, dy, d_id, move_cost in motion:
+                        x, y = cx + dx, cy + dy
+                        if x < 0 or y < 0 or x >= x_width or y >= y_width:
+                            continue
+                        n_id = c_id + d_id
+                        if blocked[n_id]:
+                            continue
+                        n_cost = c_cost + move_cost
+                        if n_cost >= cost[n_id]:
+                            continue
+                        cost[n_id] = n_cost
+                        parent[n_id] = c_id
+                        if closed[n_id]:
+                            if key[n_id] == math.inf:
+                                key[n_id] = -1.0  # marks a node in incons
+                                incons.append(n_id)
+                            continue
+                        h = octile(x, y)
+                        key[n_id] = n_cost + w * h
+                        heapq.heappush(open_heap, (key[n_id], h, n_id))
+                        n_pushed += 1
+                n_iterations += 1
+                if timed_out or cost[goal_id] == math.inf:
+                    break
+
+                # the optimal cost is at least the lowest cost plus heuristic
+                # over OPEN and INCONS
+                lower = min((cost[i] + octile(*divmod(i, y_width))
+                             for i in incons + [e[2] for e in open_heap
+                                                if e[0] == key[e[2]]]),
+                            default=math.inf)
+                bound = max(1.0, min(w, cost[goal_id] / lower)) \
+                    if lower < cost[goal_id] else 1.0
+                found = True
+                goal_node.cost = cost[goal_id]
+                goal_node.parent_index = parent[goal_id]
+                yield self.calc_final_path_array(goal_node, parent) + (bound,)
+
+                if bound <= 1.0 or time.perf_counter() > deadline:
+                    break
+                # next search: lower weight, INCONS back into OPEN, OPEN keys
+                # recomputed and CLOSED emptied. A weight over the bound
+                # cannot give a better path.
+                w = max(1.0, min(w - weight_step, bound))
+                open_ids = {e[2] for e in open_heap if e[0] == key[e[2]]}
+                open_ids.update(incons)
+                incons = []
+                closed = bytearray(n_cells)
+                open_heap = []
+                for i in open_ids:
+                    h = octile(*divmod(i, y_width))
+                    key[i] = cost[i] + w * h
+                    open_heap.append((key[i], h, i))
+                heapq.heapify(open_heap)
+        finally:
+            # also when the caller stops early
+            self.finish_search(found, n_expanded, n_pushed,
+                               n_expanded * len(motion) - n_pushed)
+
+    def calc_final_path_array(self, goal_node, parent):
+        # generate final course by walking the parent array
+        rx, ry = [self.calc_grid_position(goal_node.x, self.min_x)], [
+            self.calc_grid_position(goal_node.y, self.min_y)]
+        parent_index = goal_node.parent_index
+        while parent_index != -1:
+            ix, iy = divmod(parent_index, self.y_width)
+            rx.append(self.calc_grid_position(ix, self.min_x))
+            ry.append(self.calc_grid_position(iy, self.min_y))
+            parent_index = parent[parent_index]
+
+        return rx, ry
+
     def calc_final_path(self, goal_node, closed_set):
         # generate final course
         rx, ry = [self.calc_grid_position(goal_node.x, self.min_x)], [
@@ -146,8 +911,16 @@ class AStarPlanner:
 
     @staticmethod
     def calc_heuristic(n1, n2):
+        return AStarPlanner.calc_xy_heuristic(n1.x, n1.y, n2.x, n2.y)
+
+    def calc_node_heuristic(self, n1, n2):
+        # heuristic of the searches, calc_xy_heuristic of the planner class
+        return self.calc_xy_heuristic(n1.x, n1.y, n2.x, n2.y)
+
+    @staticmethod
+    def calc_xy_heuristic(x1, y1, x2, y2):
         w = 1.0  # weight of heuristic
-        d = w * math.hypot(n1.x - n2.x, n1.y - n2.y)
+        d = w * math.hypot(x1 - x2, y1 - y2)
         return d
 
     def calc_grid_position(self, index, min_position):
@@ -161,12 +934,31 @@ class AStarPlanner:
         pos = index * self.resolution + min_position
         return pos
 
+    def map_params(self):
+        """
+        keyword arguments of from_obstacle_map besides the obstacle map,
+        to build the planner again on a copy of its map, e.g. in a worker
+        process
+        """
+        return dict(resolution=self.resolution, rr=self.rr,
+                    min_x=self.min_x, min_y=self.min_y,
+                    max_x=self.max_x, max_y=self.max_y)
+
     def calc_xy_index(self, position, min_pos):
         return round((position - min_pos) / self.resolution)
 
     def calc_grid_index(self, node):
         return (node.y - self.min_y) * self.x_width + (node.x - self.min_x)
 
+    def blocked_cells(self):
+        """
+        flat view of the obstacle map, blocked[ix * y_width + iy] is true
+        for an obstacle cell
+        """
+        if isinstance(self.obstacle_map, BitGrid):
+            return self.obstacle_map.cells()
+        return memoryview(self.obstacle_map.reshape(-1))
+
     def verify_node(self, node):
         px = self.calc_grid_position(node.x, self.min_x)
         py = self.calc_grid_position(node.y, self.min_y)
@@ -181,39 +973,87 @@ class AStarPlanner:
             return False
 
         # collision check
-        if self.obstacle_map[node.x][node.y]:
+        if self.obstacle_map[node.x, node.y]:
             return False
 
         return True
 
     def calc_obstacle_map(self, ox, oy):
+        inst = self.instrumentation
+        if inst is not None:
+            inst.start("map_build")
 
-        self.min_x = round(min(ox))
-        self.min_y = round(min(oy))
-        self.max_x = round(max(ox))
-        self.max_y = round(max(oy))
-        print("min_x:", self.min_x)
-        print("min_y:", self.min_y)
-        print("max_x:", self.max_x)
-        print("max_y:", self.max_y)
+        self.min_x, self.min_y, self.max_x, self.max_y = (
+            round(v) for v in grid_map.point_bounds(ox, oy))
 
         self.x_width = round((self.max_x - self.min_x) / self.resolution)
         self.y_width = round((self.max_y - self.min_y) / self.resolution)
-        print("x_width:", self.x_width)
-        print("y_width:", self.y_width)
 
         # obstacle map generation
-        self.obstacle_map = [[False for _ in range(self.y_width)]
-                             for _ in range(self.x_width)]
-        for ix in range(self.x_width):
-            x = self.calc_grid_position(ix, self.min_x)
-            for iy in range(self.y_width):
-                y = self.calc_grid_position(iy, self.min_y)
-                for iox, ioy in zip(ox, oy):
-                    d = math.hypot(iox - x, ioy - y)
-                    if d <= self.rr:
-                        self.obstacle_map[ix][iy] = True
-                        break
+        if self.keep_distance_map:
+            self.distance_map = grid_map.build_distance_map(
+                ox, oy, self.resolution, self.min_x, self.min_y,
+                self.x_width, self.y_width)
+            self.distance_map.flags.writeable = False
+            self.obstacle_map = grid_map.obstacle_map_of_radius(
+                self.distance_map, self.rr, self.packed)
+        else:
+            self.obstacle_map = grid_map.build_obstacle_map(
+                ox, oy, self.resolution, self.rr, self.min_x, self.min_y,
+                self.x_width, self.y_width, self.packed)
+        self.map_version += 1
+
+        if inst is not None:
+            inst.stop("map_build")
+            inst.log("min_x:", self.min_x)
+            inst.log("min_y:", self.min_y)
+            inst.log("max_x:", self.max_x)
+            inst.log("max_y:", self.max_y)
+            inst.log("x_width:", self.x_width)
+            inst.log("y_width:", self.y_width)
+
+    def update_obstacle_cells(self, added=(), removed=()):
+        """
+        mark grid cells as obstacle or free
+
+        added: (ix, iy) grid indexes that become obstacles
+        removed: (ix, iy) grid indexes that become free
+        """
+        for ix, iy in added:
+            self.obstacle_map[ix, iy] = True
+        for ix, iy in removed:
+            self.obstacle_map[ix, iy] = False
+        self.map_version += 1
+
+    def set_robot_radius(self, rr):
+        """
+        plan for another robot radius on the distance map
+
+        A cell is free for radius rr when its distance to the nearest
+        obstacle is > rr. The obstacle map of the new radius replaces the
+        current one, cells changed by update_obstacle_cells are lost.
+        """
+        if self.distance_map is None:
+            raise ValueError("planner has no distance map, "
+                             "create it with distance_map=True")
+        self.rr = rr
+        self.obstacle_map = grid_map.obstacle_map_of_radius(
+            self.distance_map, rr, self.packed)
+        self.map_version += 1
+
+    def for_robot_radius(self, rr):
+        """
+        :return: planner of the same class for robot radius rr sharing the
+                 distance map and the instrumentation of this one, e.g.
+                 one per robot size of a fleet
+        """
+        if self.distance_map is None:
+            raise ValueError("planner has no distance map, "
+                             "create it with distance_map=True")
+        return self.from_distance_map(
+            self.distance_map, self.resolution, rr, self.min_x, self.min_y,
+            self.max_x, self.max_y, instrumentation=self.instrumentation,
+            packed=self.packed)
 
     @staticmethod
     def get_motion_model():
@@ -230,6 +1070,30 @@ class AStarPlanner:
         return motion
 
 
+class ExpansionAnimation:
+    """
+    on_expand callback plotting the nodes a planner expands, what
+    show_animation used to do inside the search loop
+    """
+
+    def __init__(self, planner, pause_every=10):
+        self.planner = planner
+        self.pause_every = pause_every
+        self.n_expanded = 0
+
+    def __call__(self, ix, iy):  # pragma: no cover
+        p = self.planner
+        plt.plot(p.calc_grid_position(ix, p.min_x),
+                 p.calc_grid_position(iy, p.min_y), "xc")
+        # for stopping simulation with the esc key.
+        plt.gcf().canvas.mpl_connect('key_release_event',
+                                     lambda event: [exit(
+                                         0) if event.key == 'escape' else None])
+        if self.n_expanded % self.pause_every == 0:
+            plt.pause(0.001)
+        self.n_expanded += 1
+
+
 def main():
     print(__file__ + " start!!")
 
@@ -282,7 +1146,10 @@ def main():
         plt.grid(True)
         plt.axis("equal")
 
-    a_star = AStarPlanner(ox, oy, grid_size, robot_radius)
+    a_star = AStarPlanner(ox, oy, grid_size, robot_radius,
+                          Instrumentation(verbose=True))
+    if show_animation:  # pragma: no cover
+        a_star.instrumentation.on_expand = ExpansionAnimation(a_star)
     rx, ry = a_star.planning(sx, sy, gx, gy)
 
     if show_animation:  # pragma: no cover
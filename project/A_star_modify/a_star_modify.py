@@ -7,47 +7,107 @@ import matplotlib.pyplot as plt
 import numpy as np
 from collections import deque
 
+import a_star
+import grid_map
+import potential_field_planning
+from a_star import ExpansionAnimation
+from caching import LRUCache
+from instrumentation import Instrumentation
+
 # Parameters
 KP = 5.0  # attractive potential gain
 ETA = 100.0  # repulsive potential gain
+PMAP_CACHE_BYTES = 64 * 2 ** 20  # potential field cache size [bytes]
 show_animation = True
 
-class AStarPlanner:
+class AStarPlanner(a_star.AStarPlanner):
+    """在a_star.AStarPlanner基础上，用势场值缩放启发函数
+    """
 
-    def __init__(self, ox, oy, resolution, rr):
+    def __init__(self, ox, oy, resolution, rr, instrumentation=None,
+                 packed=False, pmap_cache_bytes=PMAP_CACHE_BYTES,
+                 field_workers=1, distance_map=False):
         """
         Initialize grid map for a star planning
 
-        ox: x position list of Obstacles [m]
-        oy: y position list of Obstacles [m]
+        ox: x position list or array of Obstacles [m], see
+            a_star.AStarPlanner
+        oy: y position list or array of Obstacles [m]
         resolution: grid resolution [m]
         rr: robot radius[m]
+        instrumentation: see a_star.AStarPlanner
+        packed: see a_star.AStarPlanner
+        pmap_cache_bytes: size bound of the potential field cache [bytes]
+        field_workers: number of processes computing the potential field,
+                       see calc_potential_field
+        distance_map: see a_star.AStarPlanner, the repulsive potential is
+                      then read from the distance map
         """
 
-        # A star参数
-        self.resolution = resolution
-        self.rr = rr
-        self.min_x, self.min_y = 0, 0
-        self.max_x, self.max_y = 0, 0
+        # potential_field参数
         self.ox = ox
         self.oy = oy
-        self.obstacle_map = None
-        self.x_width, self.y_width = 0, 0
-        self.motion = self.get_motion_model()
-        self.calc_obstacle_map(ox, oy)
-
-    class Node:
-        def __init__(self, x, y, cost, parent_index):
-            self.x = x  # index of grid
-            self.y = y  # index of grid
-            self.cost = cost
-            self.parent_index = parent_index
-
-        def __str__(self):
-            return str(self.x) + "," + str(self.y) + "," + str(
-                self.cost) + "," + str(self.parent_index)
-
-    def planning(self, sx, sy, gx, gy):
+        self.pmap = None
+        self.pmap_cells = None  # pmap按ix * y_width + iy展平的memoryview
+        # 势力图缓存，键为(map_version, 终点网格)，LRU淘汰
+        self.pmap_cache = LRUCache(pmap_cache_bytes)
+        self.pmap_cache_version = None
+        self.field_workers = field_workers
+        super().__init__(ox, oy, resolution, rr, instrumentation, packed,
+                         distance_map)
+
+    @classmethod
+    def from_obstacle_map(cls, obstacle_map, resolution, rr, min_x, min_y,
+                          max_x, max_y, instrumentation=None, ox=None,
+                          oy=None):
+        """在已建好的障碍物地图上初始化，如共享内存中的地图
+
+        Args:
+            ox, oy (list): [障碍物坐标，计算势力图用]
+            其余参数见a_star.AStarPlanner.from_obstacle_map
+        """
+        planner = super().from_obstacle_map(
+            obstacle_map, resolution, rr, min_x, min_y, max_x, max_y,
+            instrumentation)
+        planner.ox, planner.oy = ox, oy
+        return planner
+
+    @classmethod
+    def from_cache(cls, ox, oy, resolution, rr, cache_dir,
+                   instrumentation=None):
+        """从cache_dir中缓存的障碍物地图初始化，见a_star.AStarPlanner.from_cache
+
+        缓存文件只存障碍物地图，计算势力图用的障碍物坐标由ox, oy传入
+
+        Args:
+            ox, oy (list): [障碍物坐标]
+            其余参数见a_star.AStarPlanner.from_cache
+        """
+        planner = super().from_cache(ox, oy, resolution, rr, cache_dir,
+                                     instrumentation)
+        planner.ox, planner.oy = ox, oy
+        return planner
+
+    def map_params(self):
+        """from_obstacle_map的参数，含计算势力图用的障碍物坐标
+        """
+        params = super().map_params()
+        params.update(ox=self.ox, oy=self.oy)
+        return params
+
+    def for_robot_radius(self, rr):
+        """另一机器人半径的规划器，共用距离图，势力图参数与本规划器相同
+
+        Args:
+            rr (double): [机器人半径m]
+        """
+        planner = super().for_robot_radius(rr)
+        planner.ox, planner.oy = self.ox, self.oy
+        planner.field_workers = self.field_workers
+        planner.pmap_cache = LRUCache(self.pmap_cache.max_bytes)
+        return planner
+
+    def planning(self, sx, sy, gx, gy, mode="node", heuristic=None):
         """
         A star path search
 
@@ -56,178 +116,85 @@ class AStarPlanner:
             s_y: start y position [m]
             gx: goal x position [m]
             gy: goal y position [m]
+            mode: search state layout, see a_star.AStarPlanner.planning
+            heuristic: see a_star.AStarPlanner.planning, the potential
+                       field is then not used
 
         output:
             rx: x position list of the final path
             ry: y position list of the final path
         """
 
-        # potential_field参数
-        self.calc_potential_field(gx,gy, self.ox, self.oy,self.resolution,self.rr)
-
-        start_node = self.Node(self.calc_xy_index(sx, self.min_x),
-                               self.calc_xy_index(sy, self.min_y), 0.0, -1)
-        goal_node = self.Node(self.calc_xy_index(gx, self.min_x),
-                              self.calc_xy_index(gy, self.min_y), 0.0, -1)
-
-        open_set, closed_set = dict(), dict()
-        open_set[self.calc_grid_index(start_node)] = start_node
-
-        while 1:
-            if len(open_set) == 0:
-                print("Open set is empty..")
-                break
-
-            c_id = min(
-                open_set,
-                key=lambda o: open_set[o].cost + self.calc_heuristic(goal_node,
-                                                                     open_set[
-                                                                         o]))
-            current = open_set[c_id]
-
-            # show graph
-            if show_animation:  # pragma: no cover
-                plt.plot(self.calc_grid_position(current.x, self.min_x),
-                         self.calc_grid_position(current.y, self.min_y), "xc")
-                # for stopping simulation with the esc key.
-                plt.gcf().canvas.mpl_connect('key_release_event',
-                                             lambda event: [exit(
-                                                 0) if event.key == 'escape' else None])
-                if len(closed_set.keys()) % 10 == 0:
-                    plt.pause(0.001)
-
-            if current.x == goal_node.x and current.y == goal_node.y:
-                print("Find goal")
-                goal_node.parent_index = current.parent_index
-                goal_node.cost = current.cost
-                break
-
-            # Remove the item from the open set
-            del open_set[c_id]
-
-            # Add it to the closed set
-            closed_set[c_id] = current
-
-            # expand_grid search grid based on motion model
-            for i, _ in enumerate(self.motion):
-                node = self.Node(current.x + self.motion[i][0],
-                                 current.y + self.motion[i][1],
-                                 current.cost + self.motion[i][2], c_id)
-                n_id = self.calc_grid_index(node)
-
-                # If the node is not safe, do nothing
-                if not self.verify_node(node):
-                    continue
-
-                if n_id in closed_set:
-                    continue
-
-                if n_id not in open_set:
-                    open_set[n_id] = node  # discovered a new node
-                else:
-                    if open_set[n_id].cost > node.cost:
-                        # This path is the best until now. record it
-                        open_set[n_id] = node
-
-        rx, ry = self.calc_final_path(goal_node, closed_set)
-
-        return rx, ry
-
-    def calc_final_path(self, goal_node, closed_set):
-        # generate final course
-        rx, ry = [self.calc_grid_position(goal_node.x, self.min_x)], [
-            self.calc_grid_position(goal_node.y, self.min_y)]
-        parent_index = goal_node.parent_index
-        while parent_index != -1:
-            n = closed_set[parent_index]
-            rx.append(self.calc_grid_position(n.x, self.min_x))
-            ry.append(self.calc_grid_position(n.y, self.min_y))
-            parent_index = n.parent_index
-
-        return rx, ry
-
-    def calc_heuristic(self, n1, n2):
+        # potential_field参数，只有势场启发函数用到
+        if heuristic is None:
+            self.load_potential_field(gx, gy)
+
+        return super().planning(sx, sy, gx, gy, mode, heuristic)
+
+    def load_potential_field(self, gx, gy):
+        """取终点所在网格的势力图，缓存中没有时计算并放入缓存
+
+        势力图以终点网格的位置为引力中心，同一网格内的终点共用一张图。
+        障碍物变化(map_version改变)后缓存清空。
+
+        Args:
+            gx (double): [目标点x]
+            gy (double): [目标点y]
+
+        Returns:
+            [ndarray]: [势力图，只读]
+        """
+        if self.pmap_cache_version != self.map_version:
+            self.pmap_cache.clear()
+            self.pmap_cache_version = self.map_version
+
+        goal = (self.calc_xy_index(gx, self.min_x),
+                self.calc_xy_index(gy, self.min_y))
+        key = (self.map_version,) + goal
+        pmap = self.pmap_cache.get(key)
+        if pmap is not None:
+            self.pmap = pmap
+            self.pmap_cells = memoryview(pmap.reshape(-1))
+            return pmap
+
+        inst = self.instrumentation
+        if inst is not None:
+            inst.start("potential_field")
+        pmap = self.calc_potential_field(
+            self.calc_grid_position(goal[0], self.min_x),
+            self.calc_grid_position(goal[1], self.min_y),
+            self.ox, self.oy, self.resolution, self.rr)
+        pmap.flags.writeable = False
+        self.pmap_cache.put(key, pmap)
+        if inst is not None:
+            inst.stop("potential_field")
+            if inst.on_potential_field is not None:
+                inst.on_potential_field(pmap, self.min_x, self.min_y)
+        return pmap
+
+    def calc_xy_heuristic(self, x1, y1, x2, y2):
         """[summary]
 
         Args:
-            n1 ([double]): [goal_node]
-            n2 ([double]): [open_set]
+            x1, y1 ([int]): [goal_node]
+            x2, y2 ([int]): [open_set]
 
         Returns:
             [double]: [heuristic]
         """
         w = 1.0  # weight of heuristic
-        d = w * math.hypot(n1.x - n2.x, n1.y - n2.y) * self.pmap[n2.x][n2.y]
+        d = w * math.hypot(x1 - x2, y1 - y2) * \
+            self.pmap_cells[x2 * self.y_width + y2]
 
         return d
 
-    def calc_grid_position(self, index, min_position):
-        """
-        calc grid position
-
-        :param index:
-        :param min_position:
-        :return:
-        """
-        pos = index * self.resolution + min_position
-        return pos
-
-    def calc_xy_index(self, position, min_pos):
-        return round((position - min_pos) / self.resolution)
-
-    def calc_grid_index(self, node):
-        return (node.y - self.min_y) * self.x_width + (node.x - self.min_x)
-
-    def verify_node(self, node):
-        px = self.calc_grid_position(node.x, self.min_x)
-        py = self.calc_grid_position(node.y, self.min_y)
-
-        if px < self.min_x:
-            return False
-        elif py < self.min_y:
-            return False
-        elif px >= self.max_x:
-            return False
-        elif py >= self.max_y:
-            return False
-
-        # collision check
-        if self.obstacle_map[node.x][node.y]:
-            return False
-
-        return True
-
-    def calc_obstacle_map(self, ox, oy):
-        self.min_x = round(min(ox))
-        self.min_y = round(min(oy))
-        self.max_x = round(max(ox))
-        self.max_y = round(max(oy))
-        print("min_x:", self.min_x)
-        print("min_y:", self.min_y)
-        print("max_x:", self.max_x)
-        print("max_y:", self.max_y)
-
-        self.x_width = round((self.max_x - self.min_x) / self.resolution)
-        self.y_width = round((self.max_y - self.min_y) / self.resolution)
-        print("x_width:", self.x_width)
-        print("y_width:", self.y_width)
-
-        # obstacle map generation
-        self.obstacle_map = [[False for _ in range(self.y_width)]
-                             for _ in range(self.x_width)]
-        for ix in range(self.x_width):
-            x = self.calc_grid_position(ix, self.min_x)
-            for iy in range(self.y_width):
-                y = self.calc_grid_position(iy, self.min_y)
-                for iox, ioy in zip(ox, oy):
-                    d = math.hypot(iox - x, ioy - y)
-                    if d <= self.rr:
-                        self.obstacle_map[ix][iy] = True
-                        break
-
     def calc_potential_field(self, gx, gy, ox, oy, reso, rr):
         """计算势力图，当终点和障碍物确定后，势力图也可以确定
 
+        field_workers大于1时由potential_field_planning.calc_field分块并行
+        计算，势能公式相同，结果一致。有距离图(distance_map)时斥力直接取
+        距离图，不再搜索障碍物。
+
         Args:
             gx (double): [目标点x]
             gy (double): [目标点y]
@@ -237,36 +204,33 @@ class AStarPlanner:
             rr (double): [机器人半径m]
 
         Returns:
-            [list]: [势力图]
+            [ndarray]: [势力图，形状为(x_width, y_width)]
         """
-        self.pmap = [[0.0 for i in range(self.y_width)] for i in range(self.x_width)]
-
-        for ix in range(self.x_width):
-            x = ix * reso +self.min_x
-
-            for iy in range(self.y_width):
-                y = iy * reso + self.min_y
-                ug = self.calc_attractive_potential(x, y, gx, gy)
-                uo = self.calc_repulsive_potential(x, y, ox, oy, rr)
-                uf = ug + uo
-                self.pmap[ix][iy] = uf
-
+        if self.field_workers > 1 and self.distance_map is None:
+            pmap = potential_field_planning.calc_field(
+                gx, gy, ox, oy, reso, rr, self.min_x, self.min_y,
+                self.x_width, self.y_width, workers=self.field_workers,
+                dtype=float)
+        else:
+            # 所有网格点的坐标，x为列向量，y为行向量，广播成整张地图
+            x = (np.arange(self.x_width) * reso + self.min_x)[:, None]
+            y = (np.arange(self.y_width) * reso + self.min_y)[None, :]
+            ug = self.calc_attractive_potential(x, y, gx, gy)
+            uo = self.calc_repulsive_potential(x, y, ox, oy, rr,
+                                               self.distance_map)
+            pmap = ug + uo
 
         # 归一化
-        pmin = min(min(row) for row in self.pmap)
-        pmax = max(max(row) for row in self.pmap)
-
-        for ix in range(len(self.pmap)):
-            for iy in range(len(self.pmap[0])):
-                self.pmap[ix][iy] = (self.pmap[ix][iy]-pmin)/(pmax-pmin)
-        
-        #print(self.pmap)
+        pmin = pmap.min()
+        pmax = pmap.max()
+        pmap = (pmap - pmin) / (pmax - pmin)
 
-        self.draw_heatmap(self.pmap)
-        
+        self.pmap = pmap
+        self.pmap_cells = memoryview(pmap.reshape(-1))
+        return pmap
 
     def calc_attractive_potential(self, cx, cy, gx, gy):
-        """计算引力
+        """计算引力，cx, cy可以是数组
 
         Args:
             cx (double): 当前点x
@@ -279,8 +243,8 @@ class AStarPlanner:
         """
         return 0.5 * KP * np.hypot(cx - gx, cy - gy)
 
-    def calc_repulsive_potential(self,cx, cy, ox, oy, rr):
-        """计算斥力
+    def calc_repulsive_potential(self,cx, cy, ox, oy, rr, dq=None):
+        """计算斥力，cx, cy可以是数组
 
         Args:
             cx (double): 当前点x
@@ -288,33 +252,28 @@ class AStarPlanner:
             ox (list): 障碍物x
             oy (list)): 障碍物y
             rr (double): 机器人半径
+            dq (ndarray): 各点与最近障碍物的距离，如距离图，为None时计算
 
         Returns:
             [double]: 斥力
         """
-        # 获取最近的障碍物
-        minid = -1
-        dmin = float("inf")
-        for i, _ in enumerate(ox):
-            d = np.hypot(cx - ox[i], cy - oy[i])
-            if dmin >= d:
-                dmin = d
-                minid = i
-
         # 计算与最近障碍物的欧式距离
-        dq = np.hypot(cx - ox[minid], cy - oy[minid])
-        
-        # 判断是否小于机器人半径
-        if dq <= rr:
-            if dq <= 0.1:
-                dq = 0.1
-
-            # 计算斥力
-            return 0.5 * ETA * (1.0 / dq - 1.0 / rr) ** 2
-        else:
-            return 0.0
+        if dq is None:
+            dq = grid_map.nearest_obstacle_distance(cx, cy, ox, oy)
+
+        # 小于机器人半径的点才有斥力
+        inside = dq <= rr
+        dq = np.maximum(dq, 0.1)
+
+        # 计算斥力
+        return np.where(inside, 0.5 * ETA * (1.0 / dq - 1.0 / rr) ** 2, 0.0)
 
-    def draw_heatmap(self, data):
+    def draw_heatmap(self, data, *_):
+        """绘制势力图，可作为Instrumentation的on_potential_field回调
+
+        Args:
+            data (list): 势力图
+        """
         data = np.array(data)  
         #data = np.array(data).T
         x_data = np.zeros([len(data),len(data[0])])
@@ -327,20 +286,6 @@ class AStarPlanner:
         #data = data[:-1, :-1]
         plt.pcolor(x_data, y_data, data, vmax=0.1,cmap=plt.cm.Blues)
 
-    @staticmethod
-    def get_motion_model():
-        # dx, dy, cost
-        motion = [[1, 0, 1],
-                  [0, 1, 1],
-                  [-1, 0, 1],
-                  [0, -1, 1],
-                  [-1, -1, math.sqrt(2)],
-                  [-1, 1, math.sqrt(2)],
-                  [1, -1, math.sqrt(2)],
-                  [1, 1, math.sqrt(2)]]
-
-        return motion
-
 
 def main():
     print(__file__ + " start!!")
@@ -394,7 +339,11 @@ def main():
         plt.grid(True)
         plt.axis("equal")
 
-    a_star = AStarPlanner(ox, oy, grid_size, robot_radius)
+    a_star = AStarPlanner(ox, oy, grid_size, robot_radius,
+                          Instrumentation(verbose=True))
+    if show_animation:  # pragma: no cover
+        a_star.instrumentation.on_potential_field = a_star.draw_heatmap
+        a_star.instrumentation.on_expand = ExpansionAnimation(a_star)
     rx, ry = a_star.planning(sx, sy, gx, gy)
 
     if show_animation:  # pragma: no cover
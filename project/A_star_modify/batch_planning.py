@@ -0,0 +1,106 @@
+"""
+
+Batch A* planning of many start/goal queries on one obstacle map
+
+The obstacle map is built once and copied into a shared memory block.
+Worker processes map that block as a numpy array, or a BitGrid for
+packed maps, so they all plan on the same pages instead of building or
+receiving their own copy of it.
+
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from bit_grid import BitGrid
+
+# planner of the current worker process, set up by _init_worker
+_planner = None
+_shm = None
+
+
+def _init_worker(planner_class, shm_name, shape, packed, params):
+    global _planner, _shm
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    if packed:
+        obstacle_map = BitGrid(*shape, bits=_shm.buf)
+    else:
+        obstacle_map = np.ndarray(shape, dtype=bool, buffer=_shm.buf)
+    _planner = planner_class.from_obstacle_map(obstacle_map, **params)
+
+
+def _plan_queries(queries, mode):
+    return [_planner.planning(sx, sy, gx, gy, mode=mode)
+            for sx, sy, gx, gy in queries]
+
+
+class BatchPlanner:
+    """
+    Plans batches of (sx, sy, gx, gy) queries on a process pool that shares
+    the obstacle map of one AStarPlanner
+
+    Use as a context manager, or call close() to stop the workers and free
+    the shared memory block.
+    """
+
+    def __init__(self, planner, workers=None):
+        """
+        planner: AStarPlanner whose obstacle map is shared with the workers,
+                 which plan with planners of its class, e.g.
+                 a_star_modify.AStarPlanner
+        workers: number of worker processes, default os.cpu_count()
+        """
+        self.workers = workers or os.cpu_count() or 1
+        obstacle_map = planner.obstacle_map
+        packed = isinstance(obstacle_map, BitGrid)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(obstacle_map.nbytes, 1))
+        if packed:
+            shared = np.ndarray(obstacle_map.nbytes, dtype=np.uint8,
+                                buffer=self._shm.buf)
+            shared[...] = obstacle_map.bits
+        else:
+            shared = np.ndarray(obstacle_map.shape, dtype=bool,
+                                buffer=self._shm.buf)
+            shared[...] = obstacle_map
+        self._pool = ProcessPoolExecutor(
+            self.workers, initializer=_init_worker,
+            initargs=(type(planner), self._shm.name, obstacle_map.shape,
+                      packed, planner.map_params()))
+
+    def planning(self, queries, mode="array", chunk_size=None):
+        """
+        plan every query of the batch
+
+        queries: iterable of (sx, sy, gx, gy) positions [m]
+        mode: search mode passed to AStarPlanner.planning
+        chunk_size: queries sent to a worker at a time
+
+        :return: list of (rx, ry) paths in query order
+        """
+        queries = list(queries)
+        if chunk_size is None:
+            chunk_size = max(1, len(queries) // (4 * self.workers))
+        chunks = [queries[i:i + chunk_size]
+                  for i in range(0, len(queries), chunk_size)]
+
+        paths = []
+        for result in self._pool.map(_plan_queries, chunks,
+                                     [mode] * len(chunks)):
+            paths.extend(result)
+        return paths
+
+    def close(self):
+        self._pool.shutdown()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,918 @@
+"""
+
+Benchmarks for the grid planners in this folder
+
+Every planner runs headless, without instrumentation, so the numbers
+only measure the planning code.
+
+run: python benchmark.py
+
+"""
+
+import gc
+import math
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import a_star
+import a_star_modify
+import batch_planning
+import cost_to_go
+import d_star_lite
+import flow_field
+import grid_map
+import hpa_star
+import path_cache
+import potential_field_planning
+import scenarios
+from instrumentation import Instrumentation
+
+
+def make_wall_map(size):
+    """
+    square room of size x size [m] split by two walls, so the route from
+    the lower-left to the upper-right corner has to go around both of them
+
+    :param size: room width [m]
+    :return: ox, oy obstacle position lists, start and goal position
+    """
+    ox, oy = [], []
+    for i in range(size + 1):
+        ox += [i, i, 0.0, float(size)]
+        oy += [0.0, float(size), i, i]
+    for i in range(int(size * 0.7)):
+        ox.append(size / 3.0)
+        oy.append(i)
+        ox.append(size * 2.0 / 3.0)
+        oy.append(size - i)
+
+    return ox, oy, (2.0, 2.0), (size - 2.0, size - 2.0)
+
+
+def make_pocket_map(size):
+    """
+    square room of size x size [m] with the goal inside a U-shaped pocket
+    whose opening faces away from the start, so a forward search floods the
+    area in front of the pocket walls
+
+    :param size: room width [m]
+    :return: ox, oy obstacle position lists, start and goal position
+    """
+    ox, oy = [], []
+    for i in range(size + 1):
+        ox += [i, i, 0.0, float(size)]
+        oy += [0.0, float(size), i, i]
+    a, b = size * 0.55, size * 0.85
+    for i in range(int(a), int(b) + 1):
+        ox += [i, a, i]
+        oy += [a, i, b]
+
+    return ox, oy, (2.0, 2.0), (size * 0.7, size * 0.7)
+
+
+def make_queries(planner, n, seed=0):
+    """
+    n random (sx, sy, gx, gy) queries between free cells of the planner map
+    """
+    rng = random.Random(seed)
+    free = [(ix, iy) for ix in range(planner.x_width)
+            for iy in range(planner.y_width)
+            if not planner.obstacle_map[ix, iy]]
+    queries = []
+    for _ in range(n):
+        (sx, sy), (gx, gy) = rng.sample(free, 2)
+        queries.append((planner.calc_grid_position(sx, planner.min_x),
+                        planner.calc_grid_position(sy, planner.min_y),
+                        planner.calc_grid_position(gx, planner.min_x),
+                        planner.calc_grid_position(gy, planner.min_y)))
+    return queries
+
+
+def planning_min_scan(planner, sx, sy, gx, gy):
+    """
+    the A* search AStarPlanner.planning ran before its open set became a
+    heap, headless: every iteration scans the whole open set with min()
+    and recomputes the heuristic of each entry
+    """
+    start_node = planner.Node(planner.calc_xy_index(sx, planner.min_x),
+                              planner.calc_xy_index(sy, planner.min_y),
+                              0.0, -1)
+    goal_node = planner.Node(planner.calc_xy_index(gx, planner.min_x),
+                             planner.calc_xy_index(gy, planner.min_y),
+                             0.0, -1)
+
+    open_set, closed_set = dict(), dict()
+    open_set[planner.calc_grid_index(start_node)] = start_node
+
+    while open_set:
+        c_id = min(open_set, key=lambda o: open_set[o].cost +
+                   planner.calc_heuristic(goal_node, open_set[o]))
+        current = open_set[c_id]
+
+        if current.x == goal_node.x and current.y == goal_node.y:
+            goal_node.parent_index = current.parent_index
+            goal_node.cost = current.cost
+            break
+
+        del open_set[c_id]
+        closed_set[c_id] = current
+
+        for dx, dy, move_cost in planner.motion:
+            node = planner.Node(current.x + dx, current.y + dy,
+                                current.cost + move_cost, c_id)
+            n_id = planner.calc_grid_index(node)
+            if not planner.verify_node(node) or n_id in closed_set:
+                continue
+            if n_id not in open_set or open_set[n_id].cost > node.cost:
+                open_set[n_id] = node
+
+    return planner.calc_final_path(goal_node, closed_set)
+
+
+def bench_planning(sizes=(25, 50, 100, 200), resolution=1.0, rr=1.0,
+                   repeat=3):
+    """
+    time AStarPlanner.planning on wall maps of growing size against the
+    min() scan open set it used to have, best of repeat runs each
+
+    same: both searches return the same path
+    """
+    print("size   cells  path  min scan[s]  heap[s]  speedup  same")
+    for size in sizes:
+        ox, oy, (sx, sy), (gx, gy) = make_wall_map(size)
+        planner = a_star.AStarPlanner(ox, oy, resolution, rr)
+        times, paths = [], []
+        for plan in (lambda: planning_min_scan(planner, sx, sy, gx, gy),
+                     lambda: planner.planning(sx, sy, gx, gy)):
+            best = float("inf")
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                path = plan()
+                best = min(best, time.perf_counter() - t0)
+            times.append(best)
+            paths.append(path)
+        print("{:4d}  {:6d}  {:4d}  {:11.4f}  {:7.4f}  {:7.1f}  {}".format(
+            size, planner.x_width * planner.y_width, len(paths[1][0]),
+            times[0], times[1], times[0] / times[1], paths[0] == paths[1]))
+
+
+def bench_obstacle_map(size=200, resolution=0.5, rr=1.0,
+                       n_points=(1000, 10000, 100000), seed=0):
+    """
+    time grid_map.build_obstacle_map for growing numbers of obstacle points
+    """
+    rng = random.Random(seed)
+    width = round(size / resolution)
+    print("points   cells  obstacles  build[s]")
+    for n in n_points:
+        ox = [rng.uniform(0, size) for _ in range(n)]
+        oy = [rng.uniform(0, size) for _ in range(n)]
+        t0 = time.perf_counter()
+        obstacle_map = grid_map.build_obstacle_map(ox, oy, resolution, rr,
+                                                   0, 0, width, width)
+        t = time.perf_counter() - t0
+        print("{:6d}  {:6d}  {:9d}  {:.4f}".format(
+            n, obstacle_map.size, int(obstacle_map.sum()), t))
+
+
+def bench_search_state(sizes=(100, 200, 400), resolution=1.0, rr=1.0):
+    """
+    compare the Node/dict search state with the flat array one
+
+    peak: tracemalloc peak during planning [MB]
+    blocks/exp: most memory blocks allocated at once during planning, per
+                expansion, i.e. how many objects each expansion allocates
+                and keeps. sys.getallocatedblocks() is read at every
+                expansion by an on_expand callback, in a run of its own.
+    """
+    print("size  mode    expanded  time[s]  peak[MB]  blocks/exp")
+    for size in sizes:
+        ox, oy, (sx, sy), (gx, gy) = make_wall_map(size)
+        planner = a_star.AStarPlanner(ox, oy, resolution, rr)
+        most = [0]  # most blocks allocated at an expansion so far
+
+        def on_expand(ix, iy):
+            most[0] = max(most[0], sys.getallocatedblocks())
+
+        sampled = a_star.AStarPlanner.from_obstacle_map(
+            planner.obstacle_map, instrumentation=Instrumentation(
+                on_expand=on_expand), **planner.map_params())
+        for mode in ("node", "array"):
+            t0 = time.perf_counter()
+            planner.planning(sx, sy, gx, gy, mode=mode)
+            t = time.perf_counter() - t0
+
+            tracemalloc.start()
+            planner.planning(sx, sy, gx, gy, mode=mode)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            gc.collect()
+            most[0] = blocks = sys.getallocatedblocks()
+            sampled.planning(sx, sy, gx, gy, mode=mode)
+            blocks = most[0] - blocks
+            print("{:4d}  {:6s}  {:8d}  {:7.3f}  {:8.2f}  {:10.2f}".format(
+                size, mode, planner.n_expanded, t, peak / 1e6,
+                blocks / max(planner.n_expanded, 1)))
+
+
+def bench_batch(size=100, n_queries=200, workers=(1, 2, 4, 8)):
+    """
+    throughput of batch_planning.BatchPlanner for growing worker counts
+    """
+    ox, oy, _, _ = make_wall_map(size)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    queries = make_queries(planner, n_queries)
+
+    print("workers  queries/s")
+    for n in workers:
+        with batch_planning.BatchPlanner(planner, n) as batch:
+            batch.planning(queries[:n])  # start up the workers
+            t0 = time.perf_counter()
+            batch.planning(queries)
+            t = time.perf_counter() - t0
+        print("{:7d}  {:9.1f}".format(n, len(queries) / t))
+
+
+def bench_map_cache(size=400, resolution=0.25, rr=1.0, n_points=100000,
+                    seed=0):
+    """
+    planner startup with a cold and a warm obstacle map cache
+    """
+    rng = random.Random(seed)
+    ox, oy, _, _ = make_wall_map(size)
+    ox += [rng.uniform(0, size) for _ in range(n_points)]
+    oy += [rng.uniform(0, size) for _ in range(n_points)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        t0 = time.perf_counter()
+        a_star.AStarPlanner.from_cache(ox, oy, resolution, rr, cache_dir)
+        t1 = time.perf_counter()
+        a_star.AStarPlanner.from_cache(ox, oy, resolution, rr, cache_dir)
+        t2 = time.perf_counter()
+    print("map cache  build+save[s]: {:.4f}  load[s]: {:.4f}".format(
+        t1 - t0, t2 - t1))
+
+
+def bench_replan(size=200, n_updates=5, wall=6):
+    """
+    D* Lite replan latency after obstacles show up on the current path,
+    against a full AStarPlanner.planning call on the changed map
+    """
+    ox, oy, (sx, sy), (gx, gy) = make_wall_map(size)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    d_star = d_star_lite.DStarLitePlanner(planner)
+    t0 = time.perf_counter()
+    rx, ry = d_star.planning(sx, sy, gx, gy)
+    print("initial D* Lite search[s]: {:.4f}  expanded: {}".format(
+        time.perf_counter() - t0, d_star.n_expanded))
+
+    print("update  d*lite[s]  expanded  a*node[s]  a*array[s]  expanded")
+    for i in range(n_updates):
+        # block a short wall across the current path, a quarter of the way
+        # from the start
+        k = len(rx) * 3 // 4
+        cx = planner.calc_xy_index(rx[k], planner.min_x)
+        cy = planner.calc_xy_index(ry[k], planner.min_y)
+        d_star.update_obstacles(added=[
+            (cx + d, cy - d) for d in range(-wall, wall + 1)
+            if 0 <= cx + d < planner.x_width and 0 <= cy - d < planner.y_width])
+
+        t0 = time.perf_counter()
+        rx, ry = d_star.planning(sx, sy, gx, gy)
+        t_d_star = time.perf_counter() - t0
+        times = []
+        for mode in ("node", "array"):
+            t0 = time.perf_counter()
+            planner.planning(sx, sy, gx, gy, mode=mode)
+            times.append(time.perf_counter() - t0)
+        print("{:6d}  {:9.4f}  {:8d}  {:9.4f}  {:10.4f}  {:8d}".format(
+            i, t_d_star, d_star.n_expanded, times[0], times[1],
+            planner.n_expanded))
+
+
+def bench_modes(sizes=(100, 200, 400), modes=("node", "array", "jps"),
+                resolution=1.0, rr=1.0, make_map=make_wall_map):
+    """
+    time and expansions of the AStarPlanner search modes on generated maps
+    """
+    print(make_map.__name__)
+    print("size  mode            expanded  time[s]  path")
+    for size in sizes:
+        ox, oy, (sx, sy), (gx, gy) = make_map(size)
+        planner = a_star.AStarPlanner(ox, oy, resolution, rr)
+        for mode in modes:
+            t0 = time.perf_counter()
+            rx, _ = planner.planning(sx, sy, gx, gy, mode=mode)
+            t = time.perf_counter() - t0
+            print("{:4d}  {:14s}  {:8d}  {:7.3f}  {:4d}".format(
+                size, mode, planner.n_expanded, t, len(rx)))
+
+
+def bench_bidirectional(sizes=(100, 200, 400)):
+    """
+    expansions of bidirectional against forward-only search
+    """
+    for make_map in (make_wall_map, make_pocket_map):
+        bench_modes(sizes, ("array", "bidirectional"), make_map=make_map)
+
+
+def path_cost(rx, ry):
+    return sum(math.hypot(x1 - x0, y1 - y0)
+               for x0, y0, x1, y1 in zip(rx, ry, rx[1:], ry[1:]))
+
+
+def bench_hpa(size=500, n_points=5000, n_queries=20, cluster_size=16,
+              seed=0):
+    """
+    HPA* abstract graph build, per cluster update and query time against
+    array mode A*, with the cost of the HPA* paths relative to optimal
+    """
+    rng = random.Random(seed)
+    ox, oy, _, _ = make_wall_map(size)
+    ox += [rng.uniform(0, size) for _ in range(n_points)]
+    oy += [rng.uniform(0, size) for _ in range(n_points)]
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    queries = make_queries(planner, n_queries, seed)
+
+    t0 = time.perf_counter()
+    hpa = hpa_star.HPAStarPlanner(planner, cluster_size)
+    print("hpa* cells: {}  build[s]: {:.3f}".format(
+        planner.x_width * planner.y_width, time.perf_counter() - t0))
+
+    t_hpa = t_a_star = ratio = 0.0
+    for q in queries:
+        t0 = time.perf_counter()
+        rx, ry = hpa.planning(*q)
+        t1 = time.perf_counter()
+        ax, ay = planner.planning(*q, mode="array")
+        t_a_star += time.perf_counter() - t1
+        t_hpa += t1 - t0
+        ratio = max(ratio, path_cost(rx, ry) / max(path_cost(ax, ay), 1e-9))
+    print("query[s] hpa*: {:.4f}  a*array: {:.4f}  worst cost ratio: "
+          "{:.3f}".format(t_hpa / len(queries), t_a_star / len(queries),
+                          ratio))
+
+    t0 = time.perf_counter()
+    cells = [(rng.randrange(planner.x_width), rng.randrange(planner.y_width))
+             for _ in range(10)]
+    hpa.update_obstacles(added=cells)
+    print("update of 10 cells[s]: {:.4f}".format(time.perf_counter() - t0))
+
+
+def bench_instrumentation(size=200, modes=("node", "array"), repeat=3):
+    """
+    planning time without instrumentation, with counters and timers only
+    and with an on_expand callback, plus the numbers it collected
+    """
+    ox, oy, (sx, sy), (gx, gy) = make_wall_map(size)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    setups = (("headless", None),
+              ("counters", Instrumentation()),
+              ("callback", Instrumentation(on_expand=lambda ix, iy: None)))
+
+    print("mode    instrumentation  time[s]")
+    for mode in modes:
+        for name, inst in setups:
+            planner.instrumentation = inst
+            best = float("inf")
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                planner.planning(sx, sy, gx, gy, mode=mode)
+                best = min(best, time.perf_counter() - t0)
+            print("{:6s}  {:15s}  {:.4f}".format(mode, name, best))
+
+    inst = Instrumentation()
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0, inst)
+    planner.planning(sx, sy, gx, gy, mode="array")
+    print("counters:", inst.counters)
+    print("timers[s]:", {k: round(t, 4) for k, t in inst.timers.items()})
+
+
+def bench_potential_field(sizes=(50, 100, 200), resolution=1.0, rr=1.0):
+    """
+    time of a_star_modify.AStarPlanner.calc_potential_field, which runs on
+    every planning call, on wall maps of growing size
+    """
+    print("size   cells  obstacles  field[s]")
+    for size in sizes:
+        ox, oy, _, (gx, gy) = make_wall_map(size)
+        planner = a_star_modify.AStarPlanner(ox, oy, resolution, rr)
+        t0 = time.perf_counter()
+        planner.calc_potential_field(gx, gy, ox, oy, resolution, rr)
+        print("{:4d}  {:6d}  {:9d}  {:.4f}".format(
+            size, planner.pmap.size, len(ox), time.perf_counter() - t0))
+
+
+def bench_pmap_cache(size=200, n_goals=20, n_queries=200, seed=0):
+    """
+    a_star_modify potential field lookups for queries cycling over a few
+    goals, with the goal-keyed cache against recomputing every time
+    """
+    rng = random.Random(seed)
+    ox, oy, _, _ = make_wall_map(size)
+    planner = a_star_modify.AStarPlanner(ox, oy, 1.0, 1.0)
+    goals = [q[2:] for q in make_queries(planner, n_goals, seed)]
+    queries = [rng.choice(goals) for _ in range(n_queries)]
+
+    t0 = time.perf_counter()
+    for gx, gy in queries:
+        planner.load_potential_field(gx, gy)
+    t_cached = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for gx, gy in queries:
+        planner.calc_potential_field(gx, gy, ox, oy, 1.0, 1.0)
+    t_uncached = time.perf_counter() - t0
+    print("pmap per query[s] cached: {:.5f}  uncached: {:.5f}".format(
+        t_cached / n_queries, t_uncached / n_queries))
+    print("pmap cache:", planner.pmap_cache.stats())
+
+
+def bench_large_potential_field(sizes=(500, 1000, 2000), reso=0.5,
+                                n_points=2000, rr=5.0, seed=0):
+    """
+    tiled potential field of potential_field_planning on outdoor areas of
+    size x size [m] with scattered obstacles, and the descent on it
+
+    peak: tracemalloc peak while building the field [MB], the field
+          itself is float32 and may be memory-mapped
+    """
+    rng = random.Random(seed)
+    print("size     cells  field[MB]  peak[MB]  field[s]  descent[s]")
+    for size in sizes:
+        ox = [rng.uniform(0, size) for _ in range(n_points)]
+        oy = [rng.uniform(0, size) for _ in range(n_points)]
+        sx, sy, gx, gy = 1.0, 1.0, size - 1.0, size - 1.0
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        pmap, _, _ = potential_field_planning.calc_potential_field(
+            gx, gy, ox, oy, reso, rr, sx, sy)
+        t = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        n_bytes = pmap.nbytes
+        del pmap
+
+        t0 = time.perf_counter()
+        potential_field_planning.potential_field_planning(
+            sx, sy, gx, gy, ox, oy, reso, rr)
+        print("{:4d}  {:8d}  {:9.1f}  {:8.1f}  {:8.3f}  {:10.3f}".format(
+            size, n_bytes // 4, n_bytes / 1e6, peak / 1e6, t,
+            time.perf_counter() - t0))
+
+
+def bench_lazy_potential_field(sizes=(500, 1000, 2000), reso=0.5,
+                               n_points=2000, rr=5.0, seed=0):
+    """
+    potential_field_planning with the full field against the lazy one
+
+    first[s]: lazy field setup plus the first descent step
+    evaluated: cells the lazy field evaluates, the neighbourhoods of the
+               path cells
+    """
+    rng = random.Random(seed)
+    motion = potential_field_planning.get_motion_model()
+    print("size     cells  full[s]  lazy[s]  first[s]  evaluated  same")
+    for size in sizes:
+        ox = [rng.uniform(0, size) for _ in range(n_points)]
+        oy = [rng.uniform(0, size) for _ in range(n_points)]
+        sx, sy, gx, gy = 1.0, 1.0, size - 1.0, size - 1.0
+        args = (sx, sy, gx, gy, ox, oy, reso, rr)
+
+        t0 = time.perf_counter()
+        full = potential_field_planning.potential_field_planning(*args)
+        t1 = time.perf_counter()
+        lazy = potential_field_planning.potential_field_planning(
+            *args, lazy=True)
+        t2 = time.perf_counter()
+        pmap = potential_field_planning.LazyPotentialField(
+            gx, gy, ox, oy, reso, rr, sx, sy)
+        ix = round((sx - pmap.minx) / reso)
+        iy = round((sy - pmap.miny) / reso)
+        for dx, dy in motion:
+            pmap[ix + dx, iy + dy]
+        t3 = time.perf_counter()
+
+        for x, y in zip(*lazy):
+            ix = round((x - pmap.minx) / reso)
+            iy = round((y - pmap.miny) / reso)
+            for dx, dy in motion:
+                pmap[ix + dx, iy + dy]
+        print("{:4d}  {:8d}  {:7.3f}  {:7.3f}  {:8.4f}  {:9d}  {}".format(
+            size, pmap.shape[0] * pmap.shape[1], t1 - t0, t2 - t1,
+            t3 - t2, len(pmap.values), full == lazy))
+
+
+def bench_multi_robot(agents=(1, 10, 100, 1000), size=200, reso=0.5,
+                      n_points=500, rr=5.0, n_sequential=10, seed=0):
+    """
+    potential_field_planning_batch time for growing robot counts, against
+    planning the robots one by one (timed on n_sequential robots and
+    scaled up)
+    """
+    rng = random.Random(seed)
+    ox = [0.0, size, 0.0, size] + [rng.uniform(0, size)
+                                   for _ in range(n_points)]
+    oy = [0.0, 0.0, size, size] + [rng.uniform(0, size)
+                                   for _ in range(n_points)]
+    gx, gy = size / 2.0, size / 2.0
+    starts = [(rng.uniform(1, size - 1), rng.uniform(1, size - 1))
+              for _ in range(max(agents))]
+
+    t0 = time.perf_counter()
+    for sx, sy in starts[:n_sequential]:
+        potential_field_planning.potential_field_planning(
+            sx, sy, gx, gy, ox, oy, reso, rr)
+    t_one = (time.perf_counter() - t0) / n_sequential
+
+    print("robots  batch[s]  one by one[s]")
+    for n in agents:
+        t0 = time.perf_counter()
+        potential_field_planning.potential_field_planning_batch(
+            starts[:n], gx, gy, ox, oy, reso, rr)
+        print("{:6d}  {:8.3f}  {:13.3f}".format(
+            n, time.perf_counter() - t0, n * t_one))
+
+
+def bench_cost_to_go(size=400, n_points=4000, n_goals=5, n_queries=50,
+                     seed=0):
+    """
+    cost-to-go field build and the walk and perfect heuristic queries on
+    it, against array mode A*, for queries sharing a few goals
+    """
+    rng = random.Random(seed)
+    ox, oy, _, _ = make_wall_map(size)
+    ox += [rng.uniform(0, size) for _ in range(n_points)]
+    oy += [rng.uniform(0, size) for _ in range(n_points)]
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    goals = [q[2:] for q in make_queries(planner, n_goals, seed)]
+    queries = [q[:2] + rng.choice(goals)
+               for q in make_queries(planner, n_queries, seed + 1)]
+    ctg = cost_to_go.CostToGoPlanner(planner)
+
+    # the first field also builds the move graph of the map
+    times = []
+    for gx, gy in goals:
+        t0 = time.perf_counter()
+        ctg.cost_to_go((planner.calc_xy_index(gx, planner.min_x),
+                        planner.calc_xy_index(gy, planner.min_y)))
+        times.append(time.perf_counter() - t0)
+    print("cost-to-go cells: {}  first field[s]: {:.3f}  field[s]: "
+          "{:.3f}".format(planner.x_width * planner.y_width, times[0],
+                          sum(times[1:]) / max(len(times) - 1, 1)))
+
+    print("query       time[s]  expanded")
+    for name, plan in (
+            ("a*array", lambda q: planner.planning(*q, mode="array")),
+            ("walk", lambda q: ctg.planning(*q, mode="walk")),
+            ("a*perfect", lambda q: ctg.planning(*q, mode="astar"))):
+        t0 = time.perf_counter()
+        n_expanded = 0
+        for q in queries:
+            planner.n_expanded = 0
+            plan(q)
+            n_expanded += planner.n_expanded
+        print("{:10s}  {:7.4f}  {:8d}".format(
+            name, (time.perf_counter() - t0) / n_queries,
+            n_expanded // n_queries))
+
+
+def bench_map_ingest(n_points=(10 ** 5, 10 ** 6, 4 * 10 ** 6), size=1000,
+                     resolution=0.5, rr=0.5, seed=0):
+    """
+    AStarPlanner construction from the same scattered obstacle points as
+    Python lists, as arrays and as a memory-mapped float32 point file,
+    and from a size / resolution pixel occupancy image of them
+
+    lists: time includes converting the file to lists, as the planners
+           used to need
+    """
+    rng = np.random.default_rng(seed)
+    print("  points  lists[s]  array[s]  file[s]  image[s]")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in n_points:
+            ox = rng.uniform(0, size, n)
+            oy = rng.uniform(0, size, n)
+            path = tmp + "/points.bin"
+            grid_map.save_point_file(path, ox, oy)
+
+            t0 = time.perf_counter()
+            fx, fy = grid_map.load_point_file(path)
+            a_star.AStarPlanner(fx.tolist(), fy.tolist(), resolution, rr)
+            t_lists = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            a_star.AStarPlanner(ox, oy, resolution, rr)
+            t_array = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            a_star.AStarPlanner.from_point_file(path, resolution, rr)
+            t_file = time.perf_counter() - t0
+
+            width = int(size / resolution)
+            image = np.ones((width, width), dtype=np.uint8) * 255
+            image[(width - 1 - (oy / resolution).astype(int)).clip(0),
+                  (ox / resolution).astype(int).clip(0, width - 1)] = 0
+            t0 = time.perf_counter()
+            a_star.AStarPlanner.from_occupancy_image(image, resolution,
+                                                     resolution, rr)
+            t_image = time.perf_counter() - t0
+
+            print("{:8d}  {:8.3f}  {:8.3f}  {:7.3f}  {:8.3f}".format(
+                n, t_lists, t_array, t_file, t_image))
+
+
+def bench_bit_grid(sizes=(1000, 5000, 20000), n_points=100000, rr=1.0,
+                   max_bool_cells=10 ** 8, seed=0):
+    """
+    obstacle map memory of size x size cell maps as the list of lists of
+    bools AStarPlanner used to build, as the bool array and as a BitGrid,
+    with the time to build and to pickle the latter two
+
+    list of lists sizes are computed, not built; the bool array is only
+    built up to max_bool_cells cells
+    """
+    rng = np.random.default_rng(seed)
+    print("size       cells  lists[MB]  bool[MB]  bits[MB]  bool[s]  "
+          "bits[s]  pickle bool[s]  pickle bits[s]")
+    for size in sizes:
+        ox = np.concatenate((rng.uniform(0, size, n_points), [0.0, size]))
+        oy = np.concatenate((rng.uniform(0, size, n_points), [0.0, size]))
+        n_cells = size * size
+        lists = sys.getsizeof([False] * size) * size + \
+            sys.getsizeof([None] * size)
+
+        t_bool = t_pickle_bool = math.nan
+        if n_cells <= max_bool_cells:
+            t0 = time.perf_counter()
+            obstacle_map = grid_map.build_obstacle_map(
+                ox, oy, 1.0, rr, 0, 0, size, size)
+            t_bool = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            pickle.dumps(obstacle_map, protocol=pickle.HIGHEST_PROTOCOL)
+            t_pickle_bool = time.perf_counter() - t0
+            del obstacle_map
+
+        t0 = time.perf_counter()
+        bits = grid_map.build_obstacle_map(ox, oy, 1.0, rr, 0, 0, size, size,
+                                           packed=True)
+        t_bits = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        pickle.dumps(bits, protocol=pickle.HIGHEST_PROTOCOL)
+        t_pickle_bits = time.perf_counter() - t0
+
+        print("{:5d}  {:10d}  {:9.1f}  {:8.1f}  {:8.1f}  {:7.3f}  {:7.3f}  "
+              "{:14.3f}  {:14.3f}".format(
+                  size, n_cells, lists / 1e6, n_cells / 1e6,
+                  bits.nbytes / 1e6, t_bool, t_bits, t_pickle_bool,
+                  t_pickle_bits))
+
+    print("mode           size  bool[s]  bits[s]")
+    for size in (100, 200):
+        ox, oy, start, goal = make_wall_map(size)
+        planner = a_star.AStarPlanner(ox, oy, 0.5, rr)
+        packed = a_star.AStarPlanner(ox, oy, 0.5, rr, packed=True)
+        for mode in ("node", "array", "jps"):
+            t = []
+            for p in (planner, packed):
+                t0 = time.perf_counter()
+                p.planning(*start, *goal, mode=mode)
+                t.append(time.perf_counter() - t0)
+            print("{:13s}  {:4d}  {:7.3f}  {:7.3f}".format(mode, size, *t))
+
+
+def bench_parallel_field(size=2000, reso=0.5, n_points=20000, rr=5.0,
+                         workers=(1, 2, 4, 8), seed=0):
+    """
+    potential field of potential_field_planning on a size x size [m] area
+    computed by 1, 2, 4 and 8 processes, 1 runs in this process
+
+    speedup: over the single process build, bounded by os.cpu_count()
+    """
+    rng = np.random.default_rng(seed)
+    ox = rng.uniform(0, size, n_points)
+    oy = rng.uniform(0, size, n_points)
+    print("cpus: {}".format(os.cpu_count()))
+    print("workers     cells  field[s]  speedup")
+    t1 = None
+    for n in workers:
+        t0 = time.perf_counter()
+        pmap, _, _ = potential_field_planning.calc_potential_field(
+            size - 1.0, size - 1.0, ox, oy, reso, rr, 1.0, 1.0, workers=n)
+        t = time.perf_counter() - t0
+        t1 = t1 or t
+        print("{:7d}  {:8d}  {:8.3f}  {:7.2f}".format(n, pmap.size, t,
+                                                      t1 / t))
+        del pmap
+
+
+def bench_anytime(kinds=("random", "rooms", "maze", "main"), sizes=(100, 200),
+                  resolution=0.5, rr=1.0, time_budget=a_star.ANYTIME_TIME_BUDGET):
+    """
+    anytime search against array mode A* on generated scenarios
+
+    first: time to and cost / bound of the first path
+    budget: paths found and cost / bound of the last one within
+            time_budget
+    optimal: time until the anytime search proves a path optimal
+    """
+    print("scenario  size  A*[s]    cost  first[s]    cost  bound  "
+          "budget paths    cost  bound  optimal[s]")
+    for kind in kinds:
+        for size in sizes:
+            ox, oy, start, goal = scenarios.make_scenario(kind, size)
+            planner = a_star.AStarPlanner(ox, oy, resolution, rr)
+            t0 = time.perf_counter()
+            cost = path_cost(*planner.planning(*start, *goal, mode="array"))
+            t_astar = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            search = planner.planning_anytime(*start, *goal, time_budget)
+            rx, ry, first_bound = next(search)
+            t_first = time.perf_counter() - t0
+            first_cost = path_cost(rx, ry)
+            paths = [(rx, ry, first_bound)] + list(search)
+
+            t0 = time.perf_counter()
+            for _ in planner.planning_anytime(*start, *goal, math.inf):
+                pass
+            t_optimal = time.perf_counter() - t0
+
+            print("{:8s}  {:4d}  {:5.3f}  {:6.1f}  {:8.3f}  {:6.1f}  "
+                  "{:5.2f}  {:12d}  {:6.1f}  {:5.2f}  {:10.3f}".format(
+                      kind, size, t_astar, cost, t_first, first_cost,
+                      first_bound, len(paths), path_cost(*paths[-1][:2]),
+                      paths[-1][2], t_optimal))
+
+
+def bench_flow_field(kinds=("random", "rooms", "maze"), size=200,
+                     resolution=0.5, rr=1.0, n_agents=50, n_updates=10,
+                     region=10, seed=0):
+    """
+    n_agents to one goal by array mode A* each, against one flow field
+    and a path lookup per agent, and region updates of the field against
+    building it again
+    """
+    rng = random.Random(seed)
+    print("scenario  agents  A*[s]  field[s]  paths[s]  update[s]  "
+          "rebuild[s]  cells")
+    for kind in kinds:
+        ox, oy, _, goal = scenarios.make_scenario(kind, size, seed)
+        planner = a_star.AStarPlanner(ox, oy, resolution, rr)
+        starts = [q[:2] for q in make_queries(planner, n_agents, seed)]
+
+        t0 = time.perf_counter()
+        for sx, sy in starts:
+            planner.planning(sx, sy, *goal, mode="array")
+        t_astar = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        field = flow_field.FlowField(planner, *goal)
+        t_field = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for sx, sy in starts:
+            field.planning(sx, sy)
+        t_paths = time.perf_counter() - t0
+
+        # toggle random cells in square regions, as a moving obstacle would
+        t_update, n_cells = 0.0, 0
+        for _ in range(n_updates):
+            x0 = rng.randrange(planner.x_width - region)
+            y0 = rng.randrange(planner.y_width - region)
+            cells = [(x0 + rng.randrange(region), y0 + rng.randrange(region))
+                     for _ in range(region)]
+            planner.update_obstacle_cells(
+                added=[c for c in cells if not planner.obstacle_map[c]],
+                removed=[c for c in cells if planner.obstacle_map[c]])
+            t0 = time.perf_counter()
+            n_cells += field.update_region(x0, x0 + region, y0, y0 + region)
+            t_update += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        flow_field.FlowField(planner, *goal)
+        t_rebuild = time.perf_counter() - t0
+
+        print("{:8s}  {:6d}  {:5.3f}  {:8.3f}  {:8.4f}  {:9.4f}  {:10.3f}  "
+              "{:5d}".format(kind, n_agents, t_astar, t_field, t_paths,
+                             t_update / n_updates, t_rebuild,
+                             n_cells // n_updates))
+
+
+def bench_robot_radii(radii=(0.5, 1.0, 1.5, 2.0, 3.0), size=400,
+                      n_points=20000, resolution=0.5, seed=0):
+    """
+    obstacle maps for a fleet of robot sizes: one map build per radius,
+    against one distance map and a threshold per radius, and the
+    a_star_modify potential field with and without the distance map
+    """
+    rng = random.Random(seed)
+    ox, oy, _, _ = make_wall_map(size)
+    ox += [rng.uniform(0, size) for _ in range(n_points)]
+    oy += [rng.uniform(0, size) for _ in range(n_points)]
+
+    t0 = time.perf_counter()
+    for rr in radii:
+        a_star.AStarPlanner(ox, oy, resolution, rr)
+    t_rebuild = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    planner = a_star.AStarPlanner(ox, oy, resolution, radii[0],
+                                  distance_map=True)
+    t_distance = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for rr in radii:
+        planner.for_robot_radius(rr)
+    t_threshold = time.perf_counter() - t0
+    print("robot radii: {}  cells: {}  rebuild[s]: {:.3f}  distance map[s]: "
+          "{:.3f}  thresholds[s]: {:.3f}".format(
+              len(radii), planner.x_width * planner.y_width, t_rebuild,
+              t_distance, t_threshold))
+
+    times = []
+    for distance_map in (False, True):
+        p = a_star_modify.AStarPlanner(ox, oy, resolution, 1.0,
+                                       distance_map=distance_map)
+        t0 = time.perf_counter()
+        p.load_potential_field(size / 2, size / 2)
+        times.append(time.perf_counter() - t0)
+    print("potential field[s]: {:.3f}  from distance map[s]: {:.3f}".format(
+        *times))
+
+
+def bench_path_cache(kind="rooms", size=100, resolution=0.5, rr=1.0,
+                     n_docks=8, n_aisles=32, n_queries=500, local=0.8,
+                     n_updates=5, seed=0):
+    """
+    queries with locality, a share local of them between a few aisle
+    starts and dock goals, the rest from random free cells, planned by
+    array mode A* directly and through a PathCache, then new obstacle
+    cells and the cached paths they drop
+    """
+    rng = random.Random(seed)
+    ox, oy, _, _ = scenarios.make_scenario(kind, size, seed)
+    planner = a_star.AStarPlanner(ox, oy, resolution, rr)
+    points = make_queries(planner, n_queries + n_docks + n_aisles, seed)
+    docks = [q[2:] for q in points[:n_docks]]
+    aisles = [q[:2] for q in points[n_docks:n_docks + n_aisles]]
+    queries = [(rng.choice(aisles) if rng.random() < local else q[:2]) +
+               rng.choice(docks) for q in points[n_docks + n_aisles:]]
+
+    t0 = time.perf_counter()
+    for q in queries:
+        planner.planning(*q, mode="array")
+    t_direct = time.perf_counter() - t0
+    cache = path_cache.PathCache(planner)
+    t0 = time.perf_counter()
+    for q in queries:
+        cache.planning(*q)
+    t_cached = time.perf_counter() - t0
+    stats = cache.stats()
+    print("path cache queries: {}  direct[s]: {:.3f}  cached[s]: {:.3f}  "
+          "hits: {}  subpath hits: {}  hit rate: {:.2f}".format(
+              n_queries, t_direct, t_cached, stats["hits"],
+              stats["subpath_hits"], stats["hit_rate"]))
+
+    free = [(ix, iy) for ix in range(planner.x_width)
+            for iy in range(planner.y_width)
+            if not planner.obstacle_map[ix, iy]]
+    for _ in range(n_updates):
+        entries = len(cache.paths)
+        cache.update_obstacle_cells(added=rng.sample(free, 5))
+        print("5 new obstacle cells dropped {} of {} cached paths".format(
+            entries - len(cache.paths), entries))
+
+
+def main():
+    bench_planning()
+    bench_obstacle_map()
+    bench_search_state()
+    bench_modes()
+    bench_bidirectional()
+    bench_batch()
+    bench_map_cache()
+    bench_replan()
+    bench_hpa()
+    bench_instrumentation()
+    bench_potential_field()
+    bench_pmap_cache()
+    bench_large_potential_field()
+    bench_lazy_potential_field()
+    bench_multi_robot()
+    bench_cost_to_go()
+    bench_map_ingest()
+    bench_bit_grid()
+    bench_parallel_field()
+    bench_anytime()
+    bench_flow_field()
+    bench_robot_radii()
+    bench_path_cache()
+
+
+if __name__ == '__main__':
+    main()
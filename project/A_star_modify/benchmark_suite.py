@@ -0,0 +1,193 @@
+"""
+
+Benchmark suite of the planners on generated scenarios
+
+Every planner runs headless on every scenario kind, size and resolution.
+One record per run, with wall time, the instrumentation timers and
+counters, peak memory and the path, is written to a JSON file, and the
+records of two files can be compared to spot regressions.
+
+run: python benchmark_suite.py [-o results.json] [--compare old.json]
+
+"""
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import a_star
+import a_star_modify
+import potential_field_planning
+import scenarios
+from instrumentation import Instrumentation
+
+SUITE_VERSION = 1
+SIZES = (50, 100, 200)  # [m]
+RESOLUTIONS = (1.0, 0.5)  # [m]
+ROBOT_RADIUS = 1.0  # [m]
+# wall time ratio over which --compare reports a run as a regression
+REGRESSION_RATIO = 1.2
+MIN_COMPARE_TIME = 0.01  # faster runs are too noisy to compare [s]
+
+
+def a_star_planner(cls, mode):
+    def plan(ox, oy, start, goal, resolution, rr, instrumentation):
+        planner = cls(ox, oy, resolution, rr, instrumentation)
+        rx, ry = planner.planning(*start, *goal, mode=mode)
+        return rx[::-1], ry[::-1]
+    return plan
+
+
+def potential_field_planner(ox, oy, start, goal, resolution, rr,
+                            instrumentation):
+    return potential_field_planning.potential_field_planning(
+        *start, *goal, ox, oy, resolution, rr, instrumentation)
+
+
+# planner name -> plan(ox, oy, start, goal, resolution, rr,
+# instrumentation) giving the path from start to goal
+PLANNERS = {
+    "a_star.node": a_star_planner(a_star.AStarPlanner, "node"),
+    "a_star.array": a_star_planner(a_star.AStarPlanner, "array"),
+    "a_star_modify.array": a_star_planner(a_star_modify.AStarPlanner,
+                                          "array"),
+    "potential_field": potential_field_planner,
+}
+
+
+def run_case(kind, size, resolution, planner, seed=0, rr=ROBOT_RADIUS):
+    """
+    plan one scenario with one planner, timed in a first run and traced
+    by tracemalloc in a second one, as tracing slows planning down
+
+    :return: result record
+    """
+    ox, oy, start, goal = scenarios.make_scenario(kind, size, seed)
+    plan = PLANNERS[planner]
+
+    inst = Instrumentation()
+    t0 = time.perf_counter()
+    rx, ry = plan(ox, oy, start, goal, resolution, rr, inst)
+    wall_time = time.perf_counter() - t0
+
+    tracemalloc.start()
+    plan(ox, oy, start, goal, resolution, rr, None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    record = dict(scenario=kind, size=size, resolution=resolution,
+                  seed=seed, planner=planner, obstacles=len(ox),
+                  wall_time=wall_time, peak_memory=peak)
+    record.update((name + "_time", t) for name, t in inst.timers.items())
+    record.update(inst.counters)
+    record.update(
+        path_points=len(rx),
+        path_length=sum(math.hypot(x1 - x0, y1 - y0)
+                        for x0, y0, x1, y1 in zip(rx, ry, rx[1:], ry[1:])),
+        reached=math.hypot(rx[0] - start[0], ry[0] - start[1]) <= resolution
+        and math.hypot(rx[-1] - goal[0], ry[-1] - goal[1]) <= resolution)
+    return record
+
+
+def run_suite(kinds=tuple(scenarios.GENERATORS), sizes=SIZES,
+              resolutions=RESOLUTIONS, planners=tuple(PLANNERS), seed=0,
+              log=print):
+    records = []
+    for kind in kinds:
+        for size in sizes:
+            for resolution in resolutions:
+                for planner in planners:
+                    record = run_case(kind, size, resolution, planner, seed)
+                    records.append(record)
+                    log("{:8s}  {:4d}  {:4.2f}  {:20s}  {:7.3f}  {:8d}  "
+                        "{:8.1f}  {}".format(
+                            kind, size, resolution, planner,
+                            record["wall_time"], record["expansions"],
+                            record["path_length"], record["reached"]))
+    return records
+
+
+def case_key(record):
+    return (record["scenario"], record["size"], record["resolution"],
+            record["seed"], record["planner"])
+
+
+def compare(old, new, ratio=REGRESSION_RATIO):
+    """
+    print the runs of two result files side by side
+
+    :return: keys of the runs whose wall time grew by more than ratio,
+             runs under MIN_COMPARE_TIME aside, or whose expansions or
+             path length changed
+    """
+    old_records = {case_key(r): r for r in old["results"]}
+    regressions = []
+    print("scenario  size  res   planner               old[s]    new[s]  "
+          "ratio  note")
+    for r in new["results"]:
+        o = old_records.get(case_key(r))
+        if o is None:
+            continue
+        t = r["wall_time"] / max(o["wall_time"], 1e-9)
+        notes = []
+        if t > ratio and r["wall_time"] > MIN_COMPARE_TIME:
+            notes.append("slower")
+        if r["expansions"] != o["expansions"]:
+            notes.append("expansions {} -> {}".format(o["expansions"],
+                                                      r["expansions"]))
+        if not math.isclose(r["path_length"], o["path_length"],
+                            rel_tol=1e-9):
+            notes.append("path {:.3f} -> {:.3f}".format(o["path_length"],
+                                                        r["path_length"]))
+        if notes:
+            regressions.append(case_key(r))
+        print("{:8s}  {:4d}  {:4.2f}  {:20s}  {:7.3f}  {:7.3f}  {:5.2f}  "
+              "{}".format(r["scenario"], r["size"], r["resolution"],
+                          r["planner"], o["wall_time"], r["wall_time"], t,
+                          ", ".join(notes)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("-o", "--output", default="benchmark_results.json",
+                        help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON file of earlier results")
+    parser.add_argument("--scenarios", nargs="+",
+                        default=list(scenarios.GENERATORS),
+                        choices=list(scenarios.GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--resolutions", nargs="+", type=float,
+                        default=RESOLUTIONS)
+    parser.add_argument("--planners", nargs="+", default=list(PLANNERS),
+                        choices=list(PLANNERS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("scenario  size  res   planner               time[s]  expanded"
+          "    path  reached")
+    results = dict(
+        suite_version=SUITE_VERSION,
+        created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        python=platform.python_version(), numpy=np.__version__,
+        machine=platform.machine(),
+        results=run_suite(args.scenarios, args.sizes, args.resolutions,
+                          args.planners, args.seed))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if compare(old, results):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
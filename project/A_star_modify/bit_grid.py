@@ -0,0 +1,166 @@
+"""
+
+Bit-packed occupancy grid
+
+One bit per cell instead of the byte of a bool array, so a map of
+20000 x 20000 cells takes 50 MB. Cell (ix, iy) is bit ix * y_width + iy
+of the packed bits, in the same order as the flat cell numbers of
+AStarPlanner, least significant bit first.
+
+"""
+
+import operator
+
+import numpy as np
+
+# number of set bits of every byte value
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class BitCells:
+    """
+    Flat view of a BitGrid, cells[ix * y_width + iy] is 1 for an obstacle,
+    like a memoryview of a bool obstacle map
+    """
+    __slots__ = ("bits",)
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def __getitem__(self, i):
+        return self.bits[i >> 3] >> (i & 7) & 1
+
+
+class BitGrid:
+    """
+    Bool grid of shape (x_width, y_width) packed to one bit per cell
+
+    Indexing follows the bool arrays it replaces: grid[ix, iy] is a cell,
+    grid[ix] a row and slices give bool blocks, np.asarray(grid) unpacks
+    the whole grid. Only single cells can be assigned, set_cells changes
+    many at once.
+    """
+
+    def __init__(self, x_width, y_width, bits=None):
+        """
+        x_width, y_width: number of grid cells
+        bits: packed bits to use as is, e.g. a shared memory buffer, a new
+              all-free grid when None
+        """
+        self.shape = (x_width, y_width)
+        n_bytes = (x_width * y_width + 7) // 8
+        if bits is None:
+            bits = np.zeros(n_bytes, dtype=np.uint8)
+        else:
+            bits = np.frombuffer(bits, dtype=np.uint8, count=n_bytes) \
+                if not isinstance(bits, np.ndarray) else bits[:n_bytes]
+        self.bits = bits
+        self._cells = memoryview(bits) if n_bytes else b""
+
+    @classmethod
+    def from_array(cls, array):
+        array = np.asarray(array, dtype=bool)
+        grid = cls(*array.shape)
+        grid.bits[:] = np.packbits(array.reshape(-1), bitorder="little")
+        return grid
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __reduce__(self):
+        return BitGrid, (self.shape[0], self.shape[1], np.array(self.bits))
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.rows(0, self.shape[0])
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def cells(self):
+        """
+        :return: BitCells flat view of the grid
+        """
+        return BitCells(self._cells)
+
+    def rows(self, x0, x1):
+        """
+        :return: bool array of shape (x1 - x0, y_width) of rows x0 to x1
+        """
+        y_width = self.shape[1]
+        first, last = x0 * y_width, x1 * y_width
+        if last <= first:
+            return np.zeros((max(x1 - x0, 0), y_width), dtype=bool)
+        unpacked = np.unpackbits(self.bits[first >> 3:(last + 7) >> 3],
+                                 bitorder="little")
+        offset = first & 7
+        return unpacked[offset:offset + last - first].view(bool).reshape(
+            x1 - x0, y_width)
+
+    def row(self, ix):
+        return self.rows(ix, ix + 1)[0]
+
+    def block(self, x0, x1, y0, y1):
+        """
+        :return: bool array of shape (x1 - x0, y1 - y0) of the cells
+                 x0 <= ix < x1, y0 <= iy < y1
+        """
+        return self.rows(x0, x1)[:, y0:y1]
+
+    def _cell_index(self, ix, iy):
+        x_width, y_width = self.shape
+        ix, iy = operator.index(ix), operator.index(iy)
+        if ix < 0:
+            ix += x_width
+        if iy < 0:
+            iy += y_width
+        if not (0 <= ix < x_width and 0 <= iy < y_width):
+            raise IndexError("cell ({}, {}) out of grid of shape {}".format(
+                ix, iy, self.shape))
+        return ix * y_width + iy
+
+    def __getitem__(self, key):
+        kx, ky = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(kx, slice):
+            r = range(*kx.indices(self.shape[0]))
+            if not r:
+                return np.zeros((0, self.shape[1]), dtype=bool)[:, ky]
+            lo = min(r[0], r[-1])
+            rows = self.rows(lo, max(r[0], r[-1]) + 1)
+            return rows[r[0] - lo::r.step, ky]
+        if isinstance(ky, slice):
+            return self.row(self._cell_index(kx, 0) // self.shape[1])[ky]
+        i = self._cell_index(kx, ky)
+        return bool(self._cells[i >> 3] >> (i & 7) & 1)
+
+    def __setitem__(self, key, value):
+        i = self._cell_index(*key)
+        if value:
+            self.bits[i >> 3] |= 1 << (i & 7)
+        else:
+            self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xff
+
+    def set_cells(self, ix, iy, value=True):
+        """
+        set or clear many cells at once
+
+        ix, iy: int arrays of grid indexes, within the grid
+        """
+        i = np.asarray(ix, dtype=np.int64) * self.shape[1] + \
+            np.asarray(iy, dtype=np.int64)
+        mask = np.left_shift(1, i & 7).astype(np.uint8)
+        if value:
+            np.bitwise_or.at(self.bits, i >> 3, mask)
+        else:
+            np.bitwise_and.at(self.bits, i >> 3, ~mask)
+
+    def sum(self):
+        """
+        :return: number of set cells
+        """
+        return int(POPCOUNT[self.bits].sum(dtype=np.int64))
@@ -0,0 +1,82 @@
+"""
+
+Caches shared by the planners in this folder
+
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by the total size of its values
+
+    Values that do not fit at all are not stored. hits, misses and
+    evictions count the cache activity since it was created.
+    """
+
+    def __init__(self, max_bytes, size=None, on_evict=None):
+        """
+        max_bytes: bound on the total size of the cached values [bytes]
+        size: callable giving the size of a value [bytes], the nbytes of
+              a numpy array by default
+        on_evict: callback(key, value) with every entry evicted to make
+                  room, None for no callback
+        """
+        self.max_bytes = max_bytes
+        self.size = size or (lambda value: value.nbytes)
+        self.on_evict = on_evict
+        self.n_bytes = 0
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._entries = OrderedDict()  # key -> (value, size), oldest first
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        """
+        :return: list of the cached keys, least recently used first
+        """
+        return list(self._entries)
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        self.pop(key)
+        size = self.size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.n_bytes += size
+        while self.n_bytes > self.max_bytes:
+            old_key, (old_value, evicted) = self._entries.popitem(last=False)
+            self.n_bytes -= evicted
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.n_bytes -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.n_bytes = 0
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, entries=len(self._entries),
+                    n_bytes=self.n_bytes, max_bytes=self.max_bytes)
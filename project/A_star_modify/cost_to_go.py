@@ -0,0 +1,161 @@
+"""
+
+Goal-rooted cost-to-go fields
+
+One backward Dijkstra search from a goal gives the exact cost of the
+shortest path from every grid cell to it. Queries to a goal whose field
+is cached are answered by walking down the field, or by A* with the
+field as a perfect heuristic, which only expands the nodes of one
+optimal path.
+
+"""
+
+import math
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from caching import LRUCache
+
+COST_TO_GO_CACHE_BYTES = 256 * 2 ** 20  # [bytes]
+
+
+class CostToGoPlanner:
+
+    def __init__(self, planner, cache_bytes=COST_TO_GO_CACHE_BYTES):
+        """
+        Initialize cost-to-go planning on the grid of an AStarPlanner
+
+        planner: AStarPlanner providing the obstacle map and motion model
+        cache_bytes: size bound of the LRU cache of cost-to-go fields
+        """
+        self.planner = planner
+        self.cache = LRUCache(cache_bytes)
+        self.cache_version = None  # map_version the cache and graph are for
+        self.graph = None  # reversed move graph, goal to start direction
+
+    def planning(self, sx, sy, gx, gy, mode="walk"):
+        """
+        shortest path search on the cost-to-go field of the goal
+
+        input:
+            sx: start x position [m]
+            sy: start y position [m]
+            gx: goal x position [m]
+            gy: goal y position [m]
+            mode: "walk" follows the field down from the start,
+                  "astar" runs array mode A* of the planner with the
+                  field as heuristic
+
+        output:
+            rx: x position list of the final path, goal first like
+                AStarPlanner.planning
+            ry: y position list of the final path
+        """
+        if mode not in ("walk", "astar"):
+            raise ValueError("unknown planning mode: {}".format(mode))
+        p = self.planner
+        start = (p.calc_xy_index(sx, p.min_x), p.calc_xy_index(sy, p.min_y))
+        goal = (p.calc_xy_index(gx, p.min_x), p.calc_xy_index(gy, p.min_y))
+        cost = self.cost_to_go(goal)
+
+        if cost[start] == math.inf:
+            # no path, like AStarPlanner only the goal is returned
+            return [p.calc_grid_position(goal[0], p.min_x)], [
+                p.calc_grid_position(goal[1], p.min_y)]
+        if mode == "walk":
+            return self.walk(cost, start, goal)
+
+        cells = memoryview(cost.reshape(-1))
+        y_width = p.y_width
+        return p.planning(
+            sx, sy, gx, gy, mode="array",
+            heuristic=lambda gx, gy, x, y: cells[x * y_width + y])
+
+    def cost_to_go(self, goal):
+        """
+        cost-to-go field of a goal cell, from the cache or a new search
+
+        goal: (ix, iy) grid index of the goal
+
+        :return: read-only float array of shape (x_width, y_width), the
+                 shortest path cost from each cell to the goal [cells],
+                 inf where the goal cannot be reached
+        """
+        p = self.planner
+        if self.cache_version != p.map_version:
+            self.cache.clear()
+            self.graph = None
+            self.cache_version = p.map_version
+
+        key = (p.map_version,) + tuple(goal)
+        cost = self.cache.get(key)
+        if cost is not None:
+            return cost
+
+        inst = p.instrumentation
+        if inst is not None:
+            inst.start("cost_to_go")
+        if self.graph is None:
+            self.graph = self.build_graph()
+        cost = dijkstra(self.graph, indices=goal[0] * p.y_width + goal[1])
+        cost = cost.reshape(p.x_width, p.y_width)
+        cost.flags.writeable = False
+        self.cache.put(key, cost)
+        if inst is not None:
+            inst.stop("cost_to_go")
+        return cost
+
+    def build_graph(self):
+        """
+        sparse graph of all moves of the motion model, reversed
+
+        A move from u to v needs v in the map and free, as in AStarPlanner,
+        and is stored as an edge from v to u, so a search from the goal
+        follows moves backwards.
+        """
+        p = self.planner
+        x_width, y_width = p.x_width, p.y_width
+        n_cells = x_width * y_width
+        free = ~np.asarray(p.obstacle_map, dtype=bool).reshape(-1)
+        ix, iy = np.divmod(np.arange(n_cells), y_width)
+
+        rows, cols, costs = [], [], []
+        for dx, dy, move_cost in p.motion:
+            x, y = ix + dx, iy + dy
+            u = np.flatnonzero((x >= 0) & (y >= 0) & (x < x_width) &
+                               (y < y_width))
+            v = x[u] * y_width + y[u]
+            u, v = u[free[v]], v[free[v]]
+            rows.append(v)
+            cols.append(u)
+            costs.append(np.full(u.size, move_cost))
+
+        return csr_matrix((np.concatenate(costs),
+                           (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(n_cells, n_cells))
+
+    def walk(self, cost, start, goal):
+        # each step takes the move with the lowest move cost plus
+        # cost-to-go, which lowers the cost-to-go, until the goal
+        p = self.planner
+        x_width, y_width = p.x_width, p.y_width
+        obstacle_map = p.obstacle_map
+        path = [start]
+        x, y = start
+        while (x, y) != goal:
+            best = math.inf
+            for dx, dy, move_cost in p.motion:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < x_width and 0 <= ny < y_width and \
+                        not obstacle_map[nx, ny] and \
+                        move_cost + cost[nx, ny] < best:
+                    best = move_cost + cost[nx, ny]
+                    step = nx, ny
+            x, y = step
+            path.append(step)
+
+        rx = [p.calc_grid_position(ix, p.min_x) for ix, _ in reversed(path)]
+        ry = [p.calc_grid_position(iy, p.min_y) for _, iy in reversed(path)]
+        return rx, ry
@@ -0,0 +1,215 @@
+"""
+
+D* Lite incremental grid planning
+
+Replans on the obstacle map and motion model of an AStarPlanner when
+obstacle cells are added or removed, repairing the previous search
+instead of starting over.
+
+Ref:
+S. Koenig, M. Likhachev, "D* Lite", AAAI 2002
+
+"""
+
+import heapq
+import math
+
+# keys whose first values differ by less than this are compared by their
+# second value, sums of the same move costs in another order differ in
+# the last bits
+KEY_TOLERANCE = 1e-9
+
+
+class DStarLitePlanner:
+
+    def __init__(self, planner):
+        """
+        Initialize incremental planning on the grid of an AStarPlanner
+
+        planner: AStarPlanner providing the obstacle map and motion model,
+                 its obstacle map is changed through update_obstacles
+        """
+        self.planner = planner
+        self.motion = planner.get_motion_model()
+        self.start = None  # grid index (ix, iy) of the start
+        self.goal = None
+        self.last = None  # start of the previous replan
+        self.km = 0.0  # key modifier, grows as the start moves
+        self.g, self.rhs = {}, {}
+        self.open_heap = []
+        self.open_keys = {}  # cell -> current key, stale heap entries differ
+        self.n_expanded = 0  # nodes expanded by the last planning call
+
+    def planning(self, sx, sy, gx, gy):
+        """
+        D* Lite path search
+
+        The first call, or a call with a new goal, searches from scratch.
+        Later calls reuse the search, only repairing the part affected by
+        obstacle updates and by the start moving.
+
+        input:
+            sx: start x position [m]
+            sy: start y position [m]
+            gx: goal x position [m]
+            gy: goal y position [m]
+
+        output:
+            rx: x position list of the final path, goal first like
+                AStarPlanner.planning
+            ry: y position list of the final path
+        """
+        p = self.planner
+        start = (p.calc_xy_index(sx, p.min_x), p.calc_xy_index(sy, p.min_y))
+        goal = (p.calc_xy_index(gx, p.min_x), p.calc_xy_index(gy, p.min_y))
+
+        if goal != self.goal:
+            self.reset(start, goal)
+        elif start != self.start:
+            self.km += self.calc_heuristic(self.last, start)
+            self.start = self.last = start
+
+        self.n_expanded = 0
+        self.compute_shortest_path()
+
+        return self.calc_final_path()
+
+    def update_obstacles(self, added=(), removed=()):
+        """
+        change obstacle cells of the planner map and mark the nodes whose
+        edge costs changed, the next planning call repairs the path
+
+        added: (ix, iy) grid indexes that become obstacles
+        removed: (ix, iy) grid indexes that become free
+        """
+        obstacle_map = self.planner.obstacle_map
+        added = [c for c in added if not obstacle_map[c[0], c[1]]]
+        removed = [c for c in removed if obstacle_map[c[0], c[1]]]
+        self.planner.update_obstacle_cells(added, removed)
+
+        if self.goal is None:
+            return
+        # only the edges into a changed cell change, so only the rhs of its
+        # neighbours has to be recomputed
+        changed = set()
+        for c in added + removed:
+            changed.update(n for n in self.neighbours(c) if self.in_map(n))
+        for u in changed:
+            self.update_vertex(u)
+
+    def reset(self, start, goal):
+        self.start = self.last = start
+        self.goal = goal
+        self.km = 0.0
+        self.g, self.rhs = {}, {goal: 0.0}
+        self.open_heap, self.open_keys = [], {}
+        self.push(goal)
+
+    def calc_heuristic(self, a, b):
+        return math.hypot(a[0] - b[0], a[1] - b[1])
+
+    def calc_key(self, s):
+        m = min(self.g.get(s, math.inf), self.rhs.get(s, math.inf))
+        return m + self.calc_heuristic(self.start, s) + self.km, m
+
+    @staticmethod
+    def key_less(k1, k2):
+        if abs(k1[0] - k2[0]) > KEY_TOLERANCE:
+            return k1[0] < k2[0]
+        return k1[1] < k2[1] - KEY_TOLERANCE
+
+    def push(self, s):
+        key = self.calc_key(s)
+        self.open_keys[s] = key
+        heapq.heappush(self.open_heap, (key, s))
+
+    def top_key(self):
+        while self.open_heap:
+            key, s = self.open_heap[0]
+            if self.open_keys.get(s) == key:
+                return key
+            heapq.heappop(self.open_heap)  # stale entry
+        return math.inf, math.inf
+
+    def in_map(self, c):
+        return 0 <= c[0] < self.planner.x_width and \
+            0 <= c[1] < self.planner.y_width
+
+    def is_free(self, c):
+        return self.in_map(c) and not self.planner.obstacle_map[c[0], c[1]]
+
+    def neighbours(self, c):
+        return [(c[0] + dx, c[1] + dy) for dx, dy, _ in self.motion]
+
+    def successors(self, u):
+        """
+        (cell, edge cost) of the cells reachable from u in one move. As in
+        AStarPlanner only the cell moved into has to be free.
+        """
+        return [((u[0] + dx, u[1] + dy), cost) for dx, dy, cost in self.motion
+                if self.is_free((u[0] + dx, u[1] + dy))]
+
+    def predecessors(self, u):
+        """
+        cells that can move into u
+        """
+        if not self.is_free(u):
+            return []
+        return [c for c in self.neighbours(u) if self.in_map(c)]
+
+    def update_vertex(self, u):
+        if u != self.goal:
+            self.rhs[u] = min((cost + self.g.get(s, math.inf)
+                               for s, cost in self.successors(u)),
+                              default=math.inf)
+        self.open_keys.pop(u, None)
+        if self.g.get(u, math.inf) != self.rhs.get(u, math.inf):
+            self.push(u)
+
+    def compute_shortest_path(self):
+        g, rhs = self.g, self.rhs
+        start = self.start
+        while (self.key_less(self.top_key(), self.calc_key(start))
+               or rhs.get(start, math.inf) != g.get(start, math.inf)):
+            k_old, u = heapq.heappop(self.open_heap)
+            if self.open_keys.get(u) != k_old:
+                continue  # stale entry
+            del self.open_keys[u]
+            self.n_expanded += 1
+
+            k_new = self.calc_key(u)
+            if self.key_less(k_old, k_new):
+                self.push(u)
+            elif g.get(u, math.inf) > rhs.get(u, math.inf):
+                g[u] = rhs[u]
+                for s in self.predecessors(u):
+                    self.update_vertex(s)
+            else:
+                g[u] = math.inf
+                self.update_vertex(u)
+                for s in self.predecessors(u):
+                    self.update_vertex(s)
+
+    def calc_final_path(self):
+        p = self.planner
+        path = [self.start]
+        if self.g.get(self.start, math.inf) == math.inf:
+            path = []  # no path, like AStarPlanner only the goal is returned
+        else:
+            u = self.start
+            visited = {u}
+            while u != self.goal:
+                u = min(self.successors(u),
+                        key=lambda sc: sc[1] + self.g.get(sc[0], math.inf))[0]
+                if u in visited:
+                    raise RuntimeError(
+                        "D* Lite path extraction revisits cell {}, the g "
+                        "values are inconsistent".format(u))
+                visited.add(u)
+                path.append(u)
+        if not path or path[-1] != self.goal:
+            path.append(self.goal)
+
+        rx = [p.calc_grid_position(ix, p.min_x) for ix, _ in reversed(path)]
+        ry = [p.calc_grid_position(iy, p.min_y) for _, iy in reversed(path)]
+        return rx, ry
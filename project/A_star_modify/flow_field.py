@@ -0,0 +1,261 @@
+"""
+
+Flow fields for many agents converging on one goal
+
+One wavefront from the goal gives every grid cell its shortest path cost
+to the goal and the move to take from it. Any number of agents then
+follow the moves to the goal, a lookup per step, instead of searching
+one by one. The wavefront relaxes a frontier of cells a whole array at a
+time, and when obstacles change inside a region of the map only the
+cells whose paths are affected are searched again.
+
+"""
+
+import math
+
+import numpy as np
+
+NO_MOVE = -1  # direction of the goal, obstacles and unreachable cells
+DIRECTION_CHUNK = 2 ** 20  # cells per block of the direction computation
+
+
+class FlowField:
+
+    def __init__(self, planner, gx, gy):
+        """
+        Initialize the flow field to a goal on the grid of an AStarPlanner
+
+        planner: AStarPlanner providing the obstacle map and motion model
+        gx: goal x position [m]
+        gy: goal y position [m]
+        """
+        self.planner = planner
+        p = planner
+        self.goal = (p.calc_xy_index(gx, p.min_x),
+                     p.calc_xy_index(gy, p.min_y))
+        self.goal_cell = self.goal[0] * p.y_width + self.goal[1]
+        motion = np.array(p.motion, dtype=float)
+        self.dx = motion[:, 0].astype(np.int64)
+        self.dy = motion[:, 1].astype(np.int64)
+        self.move_cost = motion[:, 2]
+
+        # flat arrays over the cells ix * y_width + iy, like planning_array
+        self.free = ~np.asarray(p.obstacle_map, dtype=bool).reshape(-1)
+        self.cost = None  # shortest path cost to the goal [cells]
+        self.direction = None  # index of the move in the motion model
+        self.map_version = p.map_version
+
+        inst = p.instrumentation
+        if inst is not None:
+            inst.start("flow_field")
+        self.calc_flow_field()
+        if inst is not None:
+            inst.stop("flow_field")
+
+    def calc_flow_field(self):
+        n_cells = self.free.size
+        self.cost = np.full(n_cells, math.inf)
+        self.direction = np.full(n_cells, NO_MOVE, dtype=np.int8)
+        self.cost[self.goal_cell] = 0.0
+        if self.free[self.goal_cell]:
+            changed = self.propagate(np.array([self.goal_cell]))
+            self.calc_directions(changed)
+
+    def propagate(self, frontier):
+        """
+        wavefront from the frontier cells, whose costs are final or upper
+        bounds, until no cost goes down
+
+        Every round relaxes all moves into the frontier cells at once and
+        the cells whose cost went down make the next frontier. An obstacle
+        cell gets the cost of moving out of it, as the start of
+        AStarPlanner may be one, but is never moved into.
+
+        :return: flat indexes of the cells whose cost went down
+        """
+        p = self.planner
+        x_width, y_width = p.x_width, p.y_width
+        cost, free = self.cost, self.free
+        lowered = []
+        while frontier.size:
+            fx, fy = np.divmod(frontier, y_width)
+            frontier_cost = cost[frontier]
+            cells, costs = [], []
+            for dx, dy, move_cost in zip(self.dx, self.dy, self.move_cost):
+                # cells (x, y) whose move (dx, dy) ends in the frontier
+                x, y = fx - dx, fy - dy
+                inside = (x >= 0) & (y >= 0) & (x < x_width) & (y < y_width)
+                u = x[inside] * y_width + y[inside]
+                new_cost = frontier_cost[inside] + move_cost
+                better = new_cost < cost[u]
+                cells.append(u[better])
+                costs.append(new_cost[better])
+            u = np.concatenate(cells)
+            np.minimum.at(cost, u, np.concatenate(costs))
+            u = np.unique(u)
+            lowered.append(u)
+            frontier = u[free[u]]
+        return np.concatenate(lowered) if lowered else \
+            np.zeros(0, dtype=np.int64)
+
+    def calc_directions(self, cells):
+        """
+        set the direction of the cells to the move with the lowest move
+        cost plus cost to go, the first one of the motion model on ties
+
+        cells: flat indexes of the cells
+        """
+        p = self.planner
+        x_width, y_width = p.x_width, p.y_width
+        cost, free = self.cost, self.free
+        for i in range(0, cells.size, DIRECTION_CHUNK):
+            chunk = cells[i:i + DIRECTION_CHUNK]
+            x, y = np.divmod(chunk, y_width)
+            best = np.full(chunk.size, math.inf)
+            direction = np.full(chunk.size, NO_MOVE, dtype=np.int8)
+            for k, (dx, dy, move_cost) in enumerate(
+                    zip(self.dx, self.dy, self.move_cost)):
+                nx, ny = x + dx, y + dy
+                inside = (nx >= 0) & (ny >= 0) & (nx < x_width) & \
+                    (ny < y_width)
+                v = np.where(inside, nx * y_width + ny, 0)
+                step_cost = np.where(inside & free[v], cost[v] + move_cost,
+                                     math.inf)
+                better = step_cost < best
+                best[better] = step_cost[better]
+                direction[better] = k
+            direction[chunk == self.goal_cell] = NO_MOVE
+            self.direction[chunk] = direction
+
+    def update_region(self, x0, x1, y0, y1):
+        """
+        repair the flow field after obstacle cells of the planner map
+        changed, all of them within x0 <= ix < x1, y0 <= iy < y1
+
+        Cells whose path ran through a new obstacle lose their cost and
+        are reached again by a wavefront from the cells around them and
+        around freed cells, the rest of the field is kept.
+
+        :return: number of cells whose cost or direction was recomputed
+        """
+        p = self.planner
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, p.x_width), min(y1, p.y_width)
+        if x1 <= x0 or y1 <= y0:
+            return 0
+        inst = p.instrumentation
+        if inst is not None:
+            inst.start("flow_field")
+
+        y_width = p.y_width
+        bx, by = np.meshgrid(np.arange(x0, x1), np.arange(y0, y1),
+                             indexing="ij")
+        region = (bx * y_width + by).reshape(-1)
+        now_free = ~np.asarray(p.obstacle_map[x0:x1, y0:y1],
+                               dtype=bool).reshape(-1)
+        was_free = self.free[region]
+        blocked = region[was_free & ~now_free]
+        freed = region[~was_free & now_free]
+        self.free[region] = now_free
+        self.map_version = p.map_version
+
+        invalid = self.descendants(blocked)
+        self.cost[invalid] = math.inf
+        self.direction[invalid] = NO_MOVE
+        self.cost[self.goal_cell] = 0.0
+
+        # restart the wavefront from the reachable free cells next to
+        # the invalidated and the freed ones
+        touched = np.unique(np.concatenate(
+            [invalid, freed, self.neighbours(invalid),
+             self.neighbours(freed)]))
+        seeds = touched[self.free[touched] &
+                        (self.cost[touched] < math.inf)]
+        changed = np.unique(np.concatenate([invalid,
+                                            self.propagate(seeds)]))
+        self.calc_directions(changed)
+        if inst is not None:
+            inst.stop("flow_field")
+        return changed.size
+
+    def neighbours(self, cells):
+        p = self.planner
+        x, y = np.divmod(cells, p.y_width)
+        out = []
+        for dx, dy in zip(self.dx, self.dy):
+            nx, ny = x + dx, y + dy
+            inside = (nx >= 0) & (ny >= 0) & (nx < p.x_width) & \
+                (ny < p.y_width)
+            out.append(nx[inside] * p.y_width + ny[inside])
+        return np.concatenate(out) if out else cells
+
+    def descendants(self, cells):
+        """
+        :return: flat indexes of the cells and of all cells whose
+                 directions lead through them
+        """
+        p = self.planner
+        x_width, y_width = p.x_width, p.y_width
+        marked = np.zeros(self.free.size, dtype=bool)
+        marked[cells] = True
+        frontier = np.unique(cells)
+        found = [frontier]
+        while frontier.size:
+            fx, fy = np.divmod(frontier, y_width)
+            children = []
+            for k, (dx, dy) in enumerate(zip(self.dx, self.dy)):
+                x, y = fx - dx, fy - dy
+                inside = (x >= 0) & (y >= 0) & (x < x_width) & (y < y_width)
+                u = x[inside] * y_width + y[inside]
+                children.append(u[(self.direction[u] == k) & ~marked[u]])
+            frontier = np.unique(np.concatenate(children))
+            marked[frontier] = True
+            found.append(frontier)
+        return np.concatenate(found)
+
+    def next_cells(self, ix, iy):
+        """
+        one step of many agents along the flow field
+
+        ix, iy: int arrays of the grid indexes of the agents
+
+        :return: grid indexes after the step, agents at the goal or
+                 without a path to it stay where they are
+        """
+        ix, iy = np.asarray(ix), np.asarray(iy)
+        k = self.direction[ix * self.planner.y_width + iy]
+        moving = k != NO_MOVE
+        return (np.where(moving, ix + self.dx[k], ix),
+                np.where(moving, iy + self.dy[k], iy))
+
+    def planning(self, sx, sy):
+        """
+        path from a start to the goal of the flow field
+
+        input:
+            sx: start x position [m]
+            sy: start y position [m]
+
+        output:
+            rx: x position list of the final path, goal first like
+                AStarPlanner.planning
+            ry: y position list of the final path
+        """
+        p = self.planner
+        x, y = p.calc_xy_index(sx, p.min_x), p.calc_xy_index(sy, p.min_y)
+        gx, gy = self.goal
+        y_width = p.y_width
+        cells = self.direction.data  # memoryview, fast scalar lookups
+        dx, dy = self.dx.tolist(), self.dy.tolist()
+        if not (0 <= x < p.x_width and 0 <= y < p.y_width) or \
+                self.cost[x * y_width + y] == math.inf:
+            # no path, like AStarPlanner only the goal is returned
+            x, y = gx, gy
+        rx, ry = [x], [y]
+        while (x, y) != (gx, gy):
+            k = cells[x * y_width + y]
+            x, y = x + dx[k], y + dy[k]
+            rx.append(x)
+            ry.append(y)
+        return ([p.calc_grid_position(ix, p.min_x) for ix in reversed(rx)],
+                [p.calc_grid_position(iy, p.min_y) for iy in reversed(ry)])
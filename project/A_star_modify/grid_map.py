@@ -0,0 +1,311 @@
+"""
+
+Grid map helpers shared by the grid planners
+
+"""
+
+import hashlib
+import math
+import os
+import struct
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from bit_grid import BitGrid
+
+# upper bound on the number of (point, cell) pairs tested per chunk
+CHUNK_CELLS = 1 << 20
+
+# occupancy images: a pixel is an obstacle when its darkness, 1 - gray
+# value, is over this threshold, as in ROS map_server map files
+OCCUPIED_THRESH = 0.65
+
+# obstacle map file: fixed size header, then the grid as one byte per cell
+MAP_FILE_MAGIC = b"AGRD"
+MAP_FILE_VERSION = 1
+MAP_FILE_HEADER = struct.Struct("<4sI4q2d2q")
+MAP_FILE_HEADER_SIZE = 128
+
+
+def as_points(ox):
+    """
+    position list or array as a 1-D array, without copying arrays
+
+    Position lists become float arrays. Arrays, memory-mapped ones
+    included, are returned as they are, so their values are only read
+    when a chunk of them is used.
+    """
+    if isinstance(ox, np.ndarray):
+        return ox if ox.ndim == 1 else ox.reshape(-1)
+    return np.asarray(ox, dtype=float).reshape(-1)
+
+
+def point_bounds(ox, oy):
+    """
+    :return: min_x, min_y, max_x, max_y of the obstacle points [m]
+    """
+    ox, oy = as_points(ox), as_points(oy)
+    return (float(ox.min()), float(oy.min()),
+            float(ox.max()), float(oy.max()))
+
+
+def build_obstacle_map(ox, oy, resolution, rr, min_x, min_y, x_width, y_width,
+                       packed=False):
+    """
+    rasterize the obstacle points and inflate them by the robot radius
+
+    A cell is an obstacle when its grid position lies within rr of any
+    obstacle point, the same test AStarPlanner used to run per cell. Only
+    the cells in a small window around each point can pass it, so the work
+    is O(N * (rr / resolution) ** 2) instead of O(W * H * N).
+
+    ox: x position list or array of Obstacles [m], memory-mapped arrays
+        are read one chunk at a time
+    oy: y position list or array of Obstacles [m]
+    resolution: grid resolution [m]
+    rr: robot radius[m]
+    min_x, min_y: position of grid index 0 [m]
+    x_width, y_width: number of grid cells
+    packed: build a BitGrid, the bool array is never allocated
+
+    :return: bool array of shape (x_width, y_width), indexed [ix][iy], or
+             BitGrid when packed
+    """
+    shape = (max(x_width, 0), max(y_width, 0))
+    obstacle_map = BitGrid(*shape) if packed else np.zeros(shape, dtype=bool)
+    ox, oy = as_points(ox), as_points(oy)
+    if obstacle_map.size == 0 or ox.size == 0:
+        return obstacle_map
+
+    # cells within rr of a point are at most rr / resolution + 0.5 cells
+    # away from the cell nearest to it
+    k = int(math.ceil(rr / resolution)) + 1
+    dx, dy = np.meshgrid(np.arange(-k, k + 1), np.arange(-k, k + 1),
+                         indexing="ij")
+    dx, dy = dx.ravel(), dy.ravel()
+    chunk = max(1, CHUNK_CELLS // dx.size)
+
+    for i in range(0, ox.size, chunk):
+        px = np.asarray(ox[i:i + chunk], dtype=float)[:, None]
+        py = np.asarray(oy[i:i + chunk], dtype=float)[:, None]
+        ix = np.round((px - min_x) / resolution).astype(np.int64) + dx
+        iy = np.round((py - min_y) / resolution).astype(np.int64) + dy
+        # same position formula as AStarPlanner.calc_grid_position
+        x = ix * resolution + min_x
+        y = iy * resolution + min_y
+        hit = np.hypot(px - x, py - y) <= rr
+        hit &= (ix >= 0) & (ix < x_width) & (iy >= 0) & (iy < y_width)
+        if packed:
+            obstacle_map.set_cells(ix[hit], iy[hit])
+        else:
+            obstacle_map[ix[hit], iy[hit]] = True
+
+    return obstacle_map
+
+
+def build_distance_map(ox, oy, resolution, min_x, min_y, x_width, y_width):
+    """
+    distance from every grid cell to its nearest obstacle point
+
+    The distances do not depend on the robot radius: a cell is an
+    obstacle of build_obstacle_map for radius rr exactly when its distance
+    is <= rr, see obstacle_map_of_radius. Rows of cells are queried one
+    chunk at a time against a k-d tree of the points built once.
+
+    ox: x position list or array of Obstacles [m]
+    oy: y position list or array of Obstacles [m]
+    resolution: grid resolution [m]
+    min_x, min_y: position of grid index 0 [m]
+    x_width, y_width: number of grid cells
+
+    :return: float array of shape (x_width, y_width), indexed [ix][iy], of
+             the distances [m], inf without obstacles
+    """
+    shape = (max(x_width, 0), max(y_width, 0))
+    distance_map = np.full(shape, np.inf)
+    ox = np.asarray(as_points(ox), dtype=float)
+    oy = np.asarray(as_points(oy), dtype=float)
+    if distance_map.size == 0 or ox.size == 0:
+        return distance_map
+
+    tree = cKDTree(np.column_stack((ox, oy)))
+    # same position formula as AStarPlanner.calc_grid_position
+    y = np.arange(shape[1]) * resolution + min_y
+    rows = max(1, CHUNK_CELLS // shape[1])
+    for ix in range(0, shape[0], rows):
+        x = np.arange(ix, min(ix + rows, shape[0])) * resolution + min_x
+        distance_map[ix:ix + x.size] = nearest_obstacle_distance(
+            x[:, None], y[None, :], ox, oy, tree)
+    return distance_map
+
+
+def obstacle_map_of_radius(distance_map, rr, packed=False):
+    """
+    obstacle map of a robot radius from a distance map, the same map
+    build_obstacle_map gives for rr
+
+    :return: bool array of the shape of distance_map, true where a robot
+             of radius rr collides, or BitGrid when packed
+    """
+    obstacle_map = distance_map <= rr
+    return BitGrid.from_array(obstacle_map) if packed else obstacle_map
+
+
+def nearest_obstacle_distance(x, y, ox, oy, tree=None):
+    """
+    distance from each position to its nearest obstacle point
+
+    The nearest point is found with a k-d tree, then the distance is
+    recomputed with np.hypot, so it is bit for bit the value a scan over
+    all points with np.hypot gives.
+
+    x, y: positions [m], arrays of any broadcastable shapes
+    ox: x position list or array of Obstacles [m]
+    oy: y position list or array of Obstacles [m]
+    tree: cKDTree of the obstacle points, built when None
+
+    :return: float array of the broadcast shape of x and y, inf without
+             obstacles
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                               np.asarray(y, dtype=float))
+    ox = np.asarray(ox, dtype=float).ravel()
+    oy = np.asarray(oy, dtype=float).ravel()
+    if ox.size == 0:
+        return np.full(x.shape, np.inf)
+    if tree is None:
+        tree = cKDTree(np.column_stack((ox, oy)))
+    _, i = tree.query(np.column_stack((x.ravel(), y.ravel())))
+    return np.hypot(x - ox[i].reshape(x.shape), y - oy[i].reshape(x.shape))
+
+
+def save_point_file(path, ox, oy, dtype=np.float32):
+    """
+    write obstacle points to a binary point file read by load_point_file
+
+    The file holds the (x, y) pairs interleaved as raw little-endian
+    values of dtype, without header.
+    """
+    points = np.empty((len(ox), 2), dtype=np.dtype(dtype).newbyteorder("<"))
+    points[:, 0] = ox
+    points[:, 1] = oy
+    points.tofile(path)
+
+
+def load_point_file(path, dtype=np.float32, columns=2):
+    """
+    memory-map a binary point file, e.g. a LiDAR dump
+
+    A .npy file holds an array of shape (N, columns), any other file the
+    raw little-endian values of dtype, one point of columns values after
+    the other. x and y are the first two columns, further ones like z or
+    intensity are skipped. Nothing is read until the points are used.
+
+    :return: ox, oy read-only arrays of the x and y positions [m]
+    """
+    if str(path).endswith(".npy"):
+        points = np.load(path, mmap_mode="r")
+    elif os.path.getsize(path) == 0:
+        points = np.zeros((0, columns), dtype=dtype)
+    else:
+        points = np.memmap(path, dtype=np.dtype(dtype).newbyteorder("<"),
+                           mode="r")
+    if points.size % columns:
+        raise ValueError("{} is not a file of {} column points".format(
+            path, columns))
+    points = points.reshape(-1, columns)
+    return points[:, 0], points[:, 1]
+
+
+def load_occupancy_image(path, resolution, origin=(0.0, 0.0),
+                         occupied_thresh=OCCUPIED_THRESH):
+    """
+    obstacle points of an occupancy grid image, e.g. a PNG map
+
+    Every occupied pixel gives one obstacle point at its center. The
+    bottom row of the image is the lowest y, as in ROS map files.
+
+    path: image file, or an image array of shape (H, W) or (H, W, 3|4)
+          with values in [0, 1] or [0, 255]
+    resolution: pixel size [m]
+    origin: position of the lower-left corner of the image [m]
+    occupied_thresh: darkness over which a pixel is an obstacle
+
+    :return: ox, oy float arrays of the obstacle positions [m]
+    """
+    if isinstance(path, np.ndarray):
+        image = path
+    else:
+        import matplotlib.image
+        image = matplotlib.image.imread(path)
+    if image.ndim == 3:
+        # alpha is ignored, colors are averaged
+        image = image[:, :, :3].mean(axis=2)
+    if image.dtype.kind in "iu" or image.max(initial=0) > 1:
+        image = image / 255.0
+
+    row, col = np.nonzero(1.0 - image > occupied_thresh)
+    ox = origin[0] + (col + 0.5) * resolution
+    oy = origin[1] + (image.shape[0] - row - 0.5) * resolution
+    return ox, oy
+
+
+def obstacle_map_key(ox, oy, resolution, rr):
+    """
+    hash of the obstacle set and the map parameters, used as cache file name
+    """
+    h = hashlib.sha1()
+    h.update(struct.pack("<I2d", MAP_FILE_VERSION, resolution, rr))
+    h.update(np.ascontiguousarray(ox, dtype="<f8").tobytes())
+    h.update(b"|")
+    h.update(np.ascontiguousarray(oy, dtype="<f8").tobytes())
+    return h.hexdigest()
+
+
+def save_obstacle_map(path, obstacle_map, resolution, rr, min_x, min_y,
+                      max_x, max_y):
+    """
+    write an obstacle map and its parameters to a binary map file
+
+    The file is written next to path and renamed into place, so readers
+    never see a partially written map.
+    """
+    x_width, y_width = obstacle_map.shape
+    header = MAP_FILE_HEADER.pack(MAP_FILE_MAGIC, MAP_FILE_VERSION,
+                                  min_x, min_y, max_x, max_y,
+                                  resolution, rr, x_width, y_width)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(MAP_FILE_HEADER_SIZE, b"\0"))
+        f.write(np.ascontiguousarray(obstacle_map, dtype=bool).tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_obstacle_map(path):
+    """
+    memory-map an obstacle map file written by save_obstacle_map
+
+    The grid is mapped copy-on-write: processes loading the same file share
+    its pages, and changing the map does not touch the file.
+
+    :return: obstacle_map, dict of resolution, rr, min_x, min_y, max_x, max_y
+    """
+    with open(path, "rb") as f:
+        header = f.read(MAP_FILE_HEADER.size)
+    if len(header) < MAP_FILE_HEADER.size:
+        raise ValueError("truncated obstacle map file: {}".format(path))
+    (magic, version, min_x, min_y, max_x, max_y, resolution, rr,
+     x_width, y_width) = MAP_FILE_HEADER.unpack(header)
+    if magic != MAP_FILE_MAGIC or version != MAP_FILE_VERSION:
+        raise ValueError("not an obstacle map file: {}".format(path))
+
+    if x_width * y_width == 0:
+        obstacle_map = np.zeros((x_width, y_width), dtype=bool)
+    else:
+        obstacle_map = np.memmap(path, dtype=bool, mode="c",
+                                 offset=MAP_FILE_HEADER_SIZE,
+                                 shape=(x_width, y_width))
+    params = dict(resolution=resolution, rr=rr, min_x=min_x, min_y=min_y,
+                  max_x=max_x, max_y=max_y)
+    return obstacle_map, params
@@ -0,0 +1,341 @@
+"""
+
+HPA* hierarchical grid planning
+
+The obstacle map of an AStarPlanner is cut into square clusters. Free
+cell pairs across cluster borders become entrances, the nodes of an
+abstract graph, whose intra-cluster edges hold the shortest distance
+between two entrances of the same cluster. A query searches the abstract
+graph and then refines only the clusters the abstract path goes through.
+Paths are near optimal: they cross cluster borders at entrances only.
+
+Ref:
+A. Botea, M. Muller, J. Schaeffer, "Near Optimal Hierarchical
+Path-Finding", Journal of Game Development 1, 2004
+
+"""
+
+import heapq
+import math
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+# border runs at least this long get an entrance at both ends
+LONG_ENTRANCE = 6
+
+
+class HPAStarPlanner:
+
+    def __init__(self, planner, cluster_size=16):
+        """
+        Initialize hierarchical planning on the grid of an AStarPlanner and
+        build its abstract graph
+
+        planner: AStarPlanner providing the obstacle map and motion model,
+                 its obstacle map is changed through update_obstacles
+        cluster_size: cluster width [grid cells]
+        """
+        self.planner = planner
+        self.cluster_size = cluster_size
+        self.motion = planner.get_motion_model()
+        self.n_cluster_x = -(-planner.x_width // cluster_size)
+        self.n_cluster_y = -(-planner.y_width // cluster_size)
+        # (cx, cy, axis) -> [(cell, cell)] entrances across the border of
+        # cluster (cx, cy) with its +x (axis 0) or +y (axis 1) neighbour, or
+        # across its +x+y corner (axis 2)
+        self.entrances = {}
+        self.inter_edges = {}  # cell -> {cell across a border: cost}
+        self.intra_edges = {}  # cluster -> {cell: {cell: cost}}
+        self.n_expanded = 0  # abstract nodes expanded by the last query
+
+        for cx in range(self.n_cluster_x):
+            for cy in range(self.n_cluster_y):
+                for axis in (0, 1, 2):
+                    self.build_entrances(cx, cy, axis)
+        for cx in range(self.n_cluster_x):
+            for cy in range(self.n_cluster_y):
+                self.build_intra_edges((cx, cy))
+
+    def planning(self, sx, sy, gx, gy):
+        """
+        HPA* path search
+
+        input:
+            sx: start x position [m]
+            sy: start y position [m]
+            gx: goal x position [m]
+            gy: goal y position [m]
+
+        output:
+            rx: x position list of the final path, goal first like
+                AStarPlanner.planning
+            ry: y position list of the final path
+        """
+        p = self.planner
+        start = (p.calc_xy_index(sx, p.min_x), p.calc_xy_index(sy, p.min_y))
+        goal = (p.calc_xy_index(gx, p.min_x), p.calc_xy_index(gy, p.min_y))
+
+        abstract_path = self.abstract_search(start, goal)
+        if abstract_path is None:
+            path = [goal]  # no path, like AStarPlanner only the goal
+        else:
+            path = self.refine(abstract_path)
+
+        rx = [p.calc_grid_position(ix, p.min_x) for ix, _ in reversed(path)]
+        ry = [p.calc_grid_position(iy, p.min_y) for _, iy in reversed(path)]
+        return rx, ry
+
+    def update_obstacles(self, added=(), removed=()):
+        """
+        change obstacle cells of the planner map and rebuild the entrances
+        and intra-cluster edges of the clusters they are in
+
+        added: (ix, iy) grid indexes that become obstacles
+        removed: (ix, iy) grid indexes that become free
+        """
+        added, removed = list(added), list(removed)
+        self.planner.update_obstacle_cells(added, removed)
+
+        # entrances on the borders and corners of a changed cluster may
+        # change, and with them the nodes of the clusters around it
+        dirty = {self.cluster_of(c) for c in added + removed}
+        around = {(cx + dx, cy + dy) for cx, cy in dirty
+                  for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+        around = {(cx, cy) for cx, cy in around
+                  if 0 <= cx < self.n_cluster_x and 0 <= cy < self.n_cluster_y}
+        for cx, cy in dirty:
+            for dx in (-1, 0):
+                for dy in (-1, 0):
+                    for axis in (0, 1, 2):
+                        if cx + dx >= 0 and cy + dy >= 0:
+                            self.build_entrances(cx + dx, cy + dy, axis)
+        for cluster in around:
+            self.build_intra_edges(cluster)
+
+    def cluster_of(self, cell):
+        return cell[0] // self.cluster_size, cell[1] // self.cluster_size
+
+    def cluster_bounds(self, cluster):
+        cs = self.cluster_size
+        return (cluster[0] * cs, min((cluster[0] + 1) * cs,
+                                     self.planner.x_width),
+                cluster[1] * cs, min((cluster[1] + 1) * cs,
+                                     self.planner.y_width))
+
+    def is_free(self, cell):
+        return 0 <= cell[0] < self.planner.x_width and \
+            0 <= cell[1] < self.planner.y_width and \
+            not self.planner.obstacle_map[cell[0], cell[1]]
+
+    def build_entrances(self, cx, cy, axis):
+        for a, b in self.entrances.pop((cx, cy, axis), []):
+            self.inter_edges[a].pop(b, None)
+            self.inter_edges[b].pop(a, None)
+
+        x0, x1, y0, y1 = self.cluster_bounds((cx, cy))
+        if axis == 0:
+            if cx + 1 >= self.n_cluster_x:
+                return
+            line = [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        elif axis == 1:
+            if cy + 1 >= self.n_cluster_y:
+                return
+            line = [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+        else:
+            if cx + 1 >= self.n_cluster_x or cy + 1 >= self.n_cluster_y:
+                return
+            line = []
+
+        # one entrance per run of free cell pairs, two for long runs
+        entrances = []
+        run = []
+        for pair in line + [None]:
+            if pair is not None and self.is_free(pair[0]) and \
+                    self.is_free(pair[1]):
+                run.append(pair)
+                continue
+            if len(run) >= LONG_ENTRANCE:
+                entrances += [run[0], run[-1]]
+            elif run:
+                entrances.append(run[len(run) // 2])
+            run = []
+
+        # diagonal moves across the border, or across the corner where four
+        # clusters meet, only need entrances of their own where no
+        # straight crossing is next to them
+        if axis == 2:
+            x, y = x1 - 1, y1 - 1
+            if not self.is_free((x + 1, y)) and not self.is_free((x, y + 1)):
+                entrances.append(((x, y), (x + 1, y + 1)))
+            if not self.is_free((x, y)) and not self.is_free((x + 1, y + 1)):
+                entrances.append(((x + 1, y), (x, y + 1)))
+        for (a, a_across), (b_across, b) in zip(line, line[1:]):
+            if not self.is_free(a_across) and not self.is_free(b_across):
+                entrances.append((a, b))
+            if not self.is_free(a) and not self.is_free(b):
+                entrances.append((b_across, a_across))
+
+        entrances = [(a, b) for a, b in entrances
+                     if self.is_free(a) and self.is_free(b)]
+        self.entrances[(cx, cy, axis)] = entrances
+        for a, b in entrances:
+            cost = math.hypot(a[0] - b[0], a[1] - b[1])
+            self.inter_edges.setdefault(a, {})[b] = cost
+            self.inter_edges.setdefault(b, {})[a] = cost
+
+    def cluster_nodes(self, cluster):
+        cx, cy = cluster
+        nodes = set()
+        for dx in (-1, 0):
+            for dy in (-1, 0):
+                for axis in (0, 1, 2):
+                    for pair in self.entrances.get((cx + dx, cy + dy, axis),
+                                                   []):
+                        nodes.update(c for c in pair
+                                     if self.cluster_of(c) == cluster)
+        return nodes
+
+    def build_intra_edges(self, cluster):
+        bounds = self.cluster_bounds(cluster)
+        nodes = sorted(self.cluster_nodes(cluster))
+        edges = {}
+        if nodes:
+            cost = self.local_search(nodes, bounds)
+            ids = [self.local_index(v, bounds) for v in nodes]
+            for i, u in enumerate(nodes):
+                edges[u] = {v: float(cost[i, ids[j]])
+                            for j, v in enumerate(nodes)
+                            if j != i and np.isfinite(cost[i, ids[j]])}
+        self.intra_edges[cluster] = edges
+
+    @staticmethod
+    def local_index(cell, bounds):
+        x0, _, y0, y1 = bounds
+        return (cell[0] - x0) * (y1 - y0) + cell[1] - y0
+
+    def cluster_graph(self, bounds):
+        """
+        sparse graph of the moves between the cells inside bounds, which
+        are numbered by local_index. As in AStarPlanner only the cell moved
+        into has to be free.
+        """
+        x0, x1, y0, y1 = bounds
+        width, height = x1 - x0, y1 - y0
+        free = ~np.asarray(self.planner.obstacle_map[x0:x1, y0:y1],
+                           dtype=bool)
+        ix, iy = np.meshgrid(np.arange(width), np.arange(height),
+                             indexing="ij")
+        rows, cols, costs = [], [], []
+        for dx, dy, move_cost in self.motion:
+            nx, ny = ix + dx, iy + dy
+            ok = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+            ok[ok] = free[nx[ok], ny[ok]]
+            rows.append((ix * height + iy)[ok])
+            cols.append((nx * height + ny)[ok])
+            costs.append(np.full(cols[-1].size, move_cost))
+        n = width * height
+        return csr_matrix((np.concatenate(costs),
+                           (np.concatenate(rows), np.concatenate(cols))),
+                          shape=(n, n))
+
+    def local_search(self, sources, bounds, return_predecessors=False):
+        """
+        Dijkstra search from each source through the free cells inside
+        bounds
+
+        :return: cost array of shape (len(sources), cells in bounds), and
+                 the predecessor array if asked for
+        """
+        ids = [self.local_index(c, bounds) for c in sources]
+        return dijkstra(self.cluster_graph(bounds), indices=ids,
+                        return_predecessors=return_predecessors)
+
+    def abstract_search(self, start, goal):
+        """
+        A* search over the abstract graph, with start and goal connected to
+        the entrances of their clusters
+
+        :return: list of abstract nodes from start to goal, None if there
+                 is no path
+        """
+        self.n_expanded = 0
+        if not self.is_free(goal) and start != goal:
+            return None
+
+        def cluster_edges(source, targets):
+            cluster = self.cluster_of(source)
+            bounds = self.cluster_bounds(cluster)
+            cost = self.local_search([source], bounds)[0]
+            return {v: float(cost[self.local_index(v, bounds)])
+                    for v in targets if v != source and
+                    self.cluster_of(v) == cluster and
+                    np.isfinite(cost[self.local_index(v, bounds)])}
+
+        start_edges = cluster_edges(
+            start, self.cluster_nodes(self.cluster_of(start)) | {goal})
+        # the free cells of a cluster are connected the same way in both
+        # directions, so costs from the goal are costs to it
+        to_goal = cluster_edges(goal,
+                                self.cluster_nodes(self.cluster_of(goal)))
+
+        def neighbours(u):
+            if u == start:
+                yield from start_edges.items()
+            else:
+                yield from self.intra_edges[self.cluster_of(u)][u].items()
+            yield from self.inter_edges.get(u, {}).items()
+            if u in to_goal:
+                yield goal, to_goal[u]
+
+        cost, parent = {start: 0.0}, {start: None}
+        closed = set()
+        open_heap = [(math.hypot(goal[0] - start[0], goal[1] - start[1]),
+                      start)]
+        while open_heap:
+            u = heapq.heappop(open_heap)[1]
+            if u in closed:
+                continue
+            if u == goal:
+                path = []
+                while u is not None:
+                    path.append(u)
+                    u = parent[u]
+                return path[::-1]
+            closed.add(u)
+            self.n_expanded += 1
+
+            for v, edge_cost in neighbours(u):
+                if v in closed:
+                    continue
+                n_cost = cost[u] + edge_cost
+                if n_cost < cost.get(v, math.inf):
+                    cost[v] = n_cost
+                    parent[v] = u
+                    heapq.heappush(open_heap, (
+                        n_cost + math.hypot(goal[0] - v[0], goal[1] - v[1]),
+                        v))
+        return None
+
+    def refine(self, abstract_path):
+        """
+        cell by cell path along the abstract path, searching only inside
+        the clusters it passes through
+        """
+        path = [abstract_path[0]]
+        for a, b in zip(abstract_path, abstract_path[1:]):
+            cluster = self.cluster_of(a)
+            if cluster != self.cluster_of(b):
+                path.append(b)  # entrance step across a border
+                continue
+            bounds = self.cluster_bounds(cluster)
+            _, parent = self.local_search([a], bounds, True)
+            segment = []
+            i, a_id = self.local_index(b, bounds), self.local_index(a, bounds)
+            while i != a_id:
+                segment.append((bounds[0] + i // (bounds[3] - bounds[2]),
+                                bounds[2] + i % (bounds[3] - bounds[2])))
+                i = parent[0, i]
+            path += segment[::-1]
+        return path
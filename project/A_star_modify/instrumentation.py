@@ -0,0 +1,62 @@
+"""
+
+Instrumentation of the planners in this folder
+
+A planner without an Instrumentation runs headless: it keeps its counters
+in local variables and does not time, print or call back anything. With
+one, the counters of a planning call are added to it once the search is
+over, the map build, search and path extraction are timed, and the
+callbacks are called, e.g. to animate the search.
+
+"""
+
+import time
+
+COUNTERS = ("expansions", "pushes", "rejections")
+TIMERS = ("map_build", "search", "path")
+
+
+class Instrumentation:
+
+    def __init__(self, on_expand=None, on_potential_field=None,
+                 verbose=False):
+        """
+        on_expand: callback(ix, iy) with the grid index of every expanded
+                   node, None for no callback
+        on_potential_field: callback(pmap, min_x, min_y) with every
+                   potential field a planner computes
+        verbose: print the status messages of the planners
+        """
+        self.on_expand = on_expand
+        self.on_potential_field = on_potential_field
+        self.verbose = verbose
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.timers = dict.fromkeys(TIMERS, 0.0)  # [s]
+        self._started = {}
+
+    def reset(self):
+        """
+        zero the counters and timers
+        """
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.timers = dict.fromkeys(TIMERS, 0.0)
+        self._started = {}
+
+    def start(self, name):
+        self._started[name] = time.perf_counter()
+
+    def stop(self, name):
+        # a timer that was not started, e.g. the search timer of a search
+        # mode called directly, is left as it is
+        started = self._started.pop(name, None)
+        if started is not None:
+            self.timers[name] = self.timers.get(name, 0.0) + \
+                time.perf_counter() - started
+
+    def count(self, **counts):
+        for name, n in counts.items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
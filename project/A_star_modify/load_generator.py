@@ -0,0 +1,163 @@
+"""
+
+Load generator for the planning server
+
+Loads a generated scenario map into a planning server and sends plan
+requests between random free cells from several concurrent clients,
+then prints throughput, latency percentiles and the server metrics.
+A share of the requests repeats recent ones, which the server coalesces
+while they are in flight. Busy answers are retried after a short pause.
+
+Without --host/--port or --unix a server is started on localhost in
+this process.
+
+run: python load_generator.py [--requests 1000] [--concurrency 32]
+
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+import a_star
+import scenarios
+from planning_server import MAX_PENDING, PlanningClient, PlanningServer
+
+BUSY_RETRY_DELAY = 0.005  # pause before resending a busy request [s]
+
+
+def make_plan_requests(planner, n, repeat=0.2, seed=0):
+    """
+    n (start, goal) pairs between free cells, a share repeat of them
+    copying one of the 8 requests before
+
+    :return: list of ((sx, sy), (gx, gy)) positions [m]
+    """
+    rng = random.Random(seed)
+    free = np.argwhere(~np.asarray(planner.obstacle_map, dtype=bool))
+    requests = []
+    for i in range(n):
+        if requests and rng.random() < repeat:
+            requests.append(requests[rng.randrange(max(0, i - 8), i)])
+            continue
+        (sx, sy), (gx, gy) = free[rng.randrange(len(free))], \
+            free[rng.randrange(len(free))]
+        requests.append(((planner.calc_grid_position(sx, planner.min_x),
+                          planner.calc_grid_position(sy, planner.min_y)),
+                         (planner.calc_grid_position(gx, planner.min_x),
+                          planner.calc_grid_position(gy, planner.min_y))))
+    return requests
+
+
+async def run_load(connect, requests, concurrency, mode):
+    """
+    send the requests from concurrency clients, each one waiting for its
+    answer before sending the next
+
+    :return: latencies of the answered requests [s], number of busy
+             answers, wall time [s]
+    """
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    latencies, busy = [], 0
+
+    async def client():
+        nonlocal busy
+        async with await connect() as c:
+            while not queue.empty():
+                start, goal = queue.get_nowait()
+                t0 = time.perf_counter()
+                while 1:
+                    response = await c.request("plan", map="load",
+                                               start=start, goal=goal,
+                                               mode=mode)
+                    if response["ok"] or response["error"] != "busy":
+                        break
+                    busy += 1
+                    await asyncio.sleep(BUSY_RETRY_DELAY)
+                latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return np.array(latencies), busy, time.perf_counter() - t0
+
+
+async def main_async(args):
+    ox, oy, _, _ = scenarios.make_scenario(args.scenario, args.size,
+                                           args.seed)
+    planner = a_star.AStarPlanner(ox, oy, args.resolution, args.rr)
+    requests = make_plan_requests(planner, args.requests, args.repeat,
+                                  args.seed)
+
+    server = None
+    if args.unix is None and args.port is None:
+        server = PlanningServer(args.workers, args.max_pending)
+        host, port = await server.start()
+    else:
+        host, port = args.host, args.port
+
+    async def connect():
+        return await PlanningClient.connect(host, port, args.unix)
+
+    try:
+        async with await connect() as c:
+            response = await c.request("load_map", map="load", ox=ox, oy=oy,
+                                       resolution=args.resolution,
+                                       rr=args.rr)
+            if not response["ok"]:
+                raise SystemExit(response["error"])
+            before = await c.request("metrics")
+
+        latencies, busy, wall_time = await run_load(
+            connect, requests, args.concurrency, args.mode)
+
+        async with await connect() as c:
+            metrics = await c.request("metrics")
+    finally:
+        if server is not None:
+            await server.close()
+
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99))
+    print("{} requests, {} clients, {} map {} m at {} m, mode {}".format(
+        len(latencies), args.concurrency, args.scenario, args.size,
+        args.resolution, args.mode))
+    print("throughput  {:8.1f} req/s".format(len(latencies) / wall_time))
+    print("latency     mean {:.4f}  p50 {:.4f}  p90 {:.4f}  p99 {:.4f}  "
+          "max {:.4f} s".format(latencies.mean(), p50, p90, p99,
+                                latencies.max()))
+    print("server      coalesced {}  busy {}  max queue depth {}  "
+          "workers {}".format(
+              metrics["coalesced"] - before["coalesced"], busy,
+              metrics["max_queue_depth"], metrics["workers"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int,
+                        help="server to connect to, default starts one")
+    parser.add_argument("--unix", help="Unix socket of the server")
+    parser.add_argument("--workers", type=int,
+                        help="workers of the server started here")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                        help="max_pending of the server started here")
+    parser.add_argument("--scenario", default="random",
+                        choices=list(scenarios.GENERATORS))
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--resolution", type=float, default=0.5)
+    parser.add_argument("--rr", type=float, default=1.0)
+    parser.add_argument("--mode", default="array")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--repeat", type=float, default=0.2,
+                        help="share of requests repeating a recent one")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
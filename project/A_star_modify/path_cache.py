@@ -0,0 +1,187 @@
+"""
+
+Path cache in front of AStarPlanner.planning
+
+Queries between the same start and goal cells are answered from an LRU
+cache of planned paths. Every subpath of an optimal path is optimal, so a
+query whose start cell lies on a cached path to the same goal is answered
+by the rest of that path. New obstacle cells only drop the cached paths
+that run through them: the other paths keep their cost, and costs cannot
+go down, so they stay optimal.
+
+"""
+
+from caching import LRUCache
+
+PATH_CACHE_BYTES = 16 * 2 ** 20  # [bytes]
+# rough size of a cached path cell: its positions, cell number and entry
+# in the cell index
+PATH_CELL_BYTES = 64  # [bytes]
+
+
+class PathCache:
+
+    def __init__(self, planner, mode="array", max_bytes=PATH_CACHE_BYTES,
+                 reuse_subpaths=True):
+        """
+        Initialize a path cache for an AStarPlanner
+
+        planner: AStarPlanner answering the cache misses, its obstacle map
+                 should be changed through update_obstacle_cells, other
+                 changes of its map_version clear the cache
+        mode: planning mode of the misses, see AStarPlanner.planning
+        max_bytes: size bound of the LRU cache of paths, see
+                   PATH_CELL_BYTES
+        reuse_subpaths: answer starts on a cached path from that path,
+                        which needs the paths of mode to be optimal
+                        ("anytime" ones are not, nor the potential field
+                        scaled ones of a_star_modify)
+        """
+        self.planner = planner
+        self.mode = mode
+        self.reuse_subpaths = reuse_subpaths
+        # (start, goal) grid indexes -> (rx, ry, cells), cells are the flat
+        # cell numbers of the path, goal first like rx and ry
+        self.paths = LRUCache(
+            max_bytes, on_evict=self.unindex,
+            size=lambda entry: max(len(entry[2]), 1) * PATH_CELL_BYTES)
+        self.cache_version = planner.map_version  # map_version of the paths
+        # flat cell number -> {(start, goal): position of the cell in cells}
+        self.by_cell = {}
+        self.hits, self.subpath_hits, self.misses = 0, 0, 0
+        self.invalidations = 0  # paths dropped by obstacle changes
+
+    def planning(self, sx, sy, gx, gy):
+        """
+        path search answered from the cache when possible
+
+        input:
+            sx: start x position [m]
+            sy: start y position [m]
+            gx: goal x position [m]
+            gy: goal y position [m]
+
+        output:
+            rx: x position list of the final path, goal first like
+                AStarPlanner.planning
+            ry: y position list of the final path
+        """
+        p = self.planner
+        if self.cache_version != p.map_version:
+            self.clear()
+        start = (p.calc_xy_index(sx, p.min_x), p.calc_xy_index(sy, p.min_y))
+        goal = (p.calc_xy_index(gx, p.min_x), p.calc_xy_index(gy, p.min_y))
+
+        entry = self.paths.get((start, goal))
+        if entry is not None:
+            self.hits += 1
+            return list(entry[0]), list(entry[1])
+        if self.reuse_subpaths and start != goal:
+            path = self.find_subpath(start, goal)
+            if path is not None:
+                self.subpath_hits += 1
+                return path
+
+        self.misses += 1
+        rx, ry = p.planning(sx, sy, gx, gy, mode=self.mode)
+        entry = (rx, ry, self.calc_path_cells(rx, ry, start, goal))
+        self.paths.put((start, goal), entry)
+        if (start, goal) in self.paths:
+            self.index((start, goal), entry)
+        return list(rx), list(ry)
+
+    def find_subpath(self, start, goal):
+        """
+        :return: rest of a cached path to goal from start, positions goal
+                 first, None when no cached path to goal runs through start
+        """
+        p = self.planner
+        if not (0 <= start[0] < p.x_width and 0 <= start[1] < p.y_width):
+            return None
+        for key, i in self.by_cell.get(start[0] * p.y_width + start[1],
+                                       {}).items():
+            if key[1] == goal:
+                cells = self.paths.get(key)[2]
+                y_width = p.y_width
+                return ([p.calc_grid_position(c // y_width, p.min_x)
+                         for c in cells[:i + 1]],
+                        [p.calc_grid_position(c % y_width, p.min_y)
+                         for c in cells[:i + 1]])
+        return None
+
+    def calc_path_cells(self, rx, ry, start, goal):
+        # flat cells of every step of the path, also between the jump
+        # points of "jps" paths, which are straight or diagonal lines
+        p = self.planner
+        if len(rx) == 1 and start != goal:
+            return ()  # no path, nothing to reuse or invalidate
+        points = [(p.calc_xy_index(x, p.min_x), p.calc_xy_index(y, p.min_y))
+                  for x, y in zip(rx, ry)]
+        x, y = points[0]
+        cells = [x * p.y_width + y]
+        for nx, ny in points[1:]:
+            while (x, y) != (nx, ny):
+                x += (nx > x) - (nx < x)
+                y += (ny > y) - (ny < y)
+                cells.append(x * p.y_width + y)
+        return tuple(cells)
+
+    def index(self, key, entry):
+        for i, cell in enumerate(entry[2]):
+            self.by_cell.setdefault(cell, {})[key] = i
+
+    def unindex(self, key, entry):
+        for cell in entry[2]:
+            keys = self.by_cell.get(cell)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self.by_cell[cell]
+
+    def update_obstacle_cells(self, added=(), removed=()):
+        """
+        change obstacle cells of the planner map and drop the cached paths
+        the change can affect
+
+        New obstacles only drop the paths running through them. Freed
+        cells can make shorter paths anywhere, so they clear the cache.
+
+        added: (ix, iy) grid indexes that become obstacles
+        removed: (ix, iy) grid indexes that become free
+        """
+        p = self.planner
+        added, removed = list(added), list(removed)
+        if self.cache_version != p.map_version:
+            self.clear()
+        p.update_obstacle_cells(added, removed)
+        if removed:
+            self.invalidations += len(self.paths)
+            self.clear()
+            return
+
+        self.cache_version = p.map_version
+        for ix, iy in added:
+            for key in list(self.by_cell.get(ix * p.y_width + iy, ())):
+                self.unindex(key, self.paths.pop(key))
+                self.invalidations += 1
+
+    def clear(self):
+        self.paths.clear()
+        self.by_cell.clear()
+        self.cache_version = self.planner.map_version
+
+    def stats(self):
+        """
+        :return: dict of the query counts, hits of whole cached paths and
+                 of subpaths, the hit rate and the cache size
+        """
+        n_queries = self.hits + self.subpath_hits + self.misses
+        stats = dict(queries=n_queries, hits=self.hits,
+                     subpath_hits=self.subpath_hits, misses=self.misses,
+                     hit_rate=(self.hits + self.subpath_hits) /
+                     max(n_queries, 1),
+                     invalidations=self.invalidations)
+        cache_stats = self.paths.stats()
+        stats.update((name, cache_stats[name]) for name in (
+            "evictions", "entries", "n_bytes", "max_bytes"))
+        return stats
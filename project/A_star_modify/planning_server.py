@@ -0,0 +1,576 @@
+"""
+
+Asyncio planning server
+
+Clients talk to the server over a local TCP or Unix socket, one JSON
+object per line in each direction. Maps are built once by load_map and
+kept in memory, their obstacle maps in shared memory blocks that the
+worker processes map, like BatchPlanner does. Searches run on the worker
+pool, so the event loop keeps serving other clients meanwhile. Once a
+map is unloaded and its last search finished, the idle workers are told
+to unmap it, so its memory is freed, and the busy ones once the pool is
+idle again.
+
+Identical plan requests in flight, same map, start cell, goal cell and
+mode, share one search. When MAX_PENDING searches are queued, further
+ones are answered with a "busy" error instead of queued, and a client
+only gets MAX_CLIENT_PENDING requests of its own served at a time.
+
+requests, "id" is echoed in the response:
+    {"op": "load_map", "map": name, "resolution": .., "rr": ..,
+     "ox": [..], "oy": [..] | "point_file": path | "image": path,
+     "pixel_size": ..,  "packed": false}
+    {"op": "unload_map", "map": name}
+    {"op": "plan", "map": name, "start": [sx, sy], "goal": [gx, gy],
+     "mode": "array"}
+    {"op": "metrics"}
+responses: {"id": .., "ok": true, ...} or {"id": .., "ok": false,
+    "error": message}
+
+run: python planning_server.py [--port 8765 | --unix path] [--workers n]
+
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import a_star
+from bit_grid import BitGrid
+from caching import LRUCache
+
+MAX_PENDING = 64  # searches queued on the worker pool at most
+MAX_CLIENT_PENDING = 32  # requests of one connection served at a time
+LATENCY_WINDOW = 1000  # plan requests the latency metrics are taken over
+WORKER_MAPS = 4  # maps a worker process keeps mapped
+# wait of a worker for the others in a sweep, a worker that took a
+# search meanwhile drops the map with its next one [s]
+SWEEP_TIMEOUT = 1.0
+# workers are started from a fork server, a forked one would inherit the
+# shared memory blocks, sockets and event loop of the server and never
+# unmap the blocks
+WORKER_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+    else "spawn")
+MAX_LINE = 2 ** 30  # longest request line [bytes]
+
+
+def _close_worker_map(shm_name, entry):
+    # the obstacle map is a view of the block and has to go first
+    shm, planner = entry
+    planner.obstacle_map = None
+    shm.close()
+
+
+# shared memory name -> (shm, planner) of the maps used by the current
+# worker process, closed when evicted
+_worker_maps = LRUCache(WORKER_MAPS, size=lambda entry: 1,
+                        on_evict=_close_worker_map)
+# condition and count of the workers done with the current sweep, see
+# _sync_worker_maps
+_sweep_done = None
+_sweep_count = None
+
+
+def _init_plan_worker(done, count):
+    global _sweep_done, _sweep_count
+    _sweep_done, _sweep_count = done, count
+
+
+def _drop_worker_maps(live):
+    # close the maps whose shared memory the server no longer keeps
+    for shm_name in _worker_maps.keys():
+        if shm_name not in live:
+            _close_worker_map(shm_name, _worker_maps.pop(shm_name))
+
+
+def _sync_worker_maps(live, parties):
+    # one of these is sent to each idle worker when a map is freed,
+    # waiting until all parties are done keeps a worker from taking a
+    # second one
+    _drop_worker_maps(live)
+    with _sweep_done:
+        _sweep_count.value += 1
+        _sweep_done.notify_all()
+        _sweep_done.wait_for(lambda: _sweep_count.value >= parties,
+                             SWEEP_TIMEOUT)
+
+
+def _plan(map_spec, start, goal, mode, live):
+    _drop_worker_maps(live)
+    shm_name, shape, packed, params, planner_class = map_spec
+    entry = _worker_maps.get(shm_name)
+    if entry is None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        if packed:
+            obstacle_map = BitGrid(*shape, bits=shm.buf)
+        else:
+            obstacle_map = np.ndarray(shape, dtype=bool, buffer=shm.buf)
+        entry = (shm, planner_class.from_obstacle_map(obstacle_map,
+                                                      **params))
+        _worker_maps.put(shm_name, entry)
+    planner = entry[1]
+
+    rx, ry = planner.planning(
+        planner.calc_grid_position(start[0], planner.min_x),
+        planner.calc_grid_position(start[1], planner.min_y),
+        planner.calc_grid_position(goal[0], planner.min_x),
+        planner.calc_grid_position(goal[1], planner.min_y), mode=mode)
+    return rx, ry, planner.n_expanded
+
+
+class LoadedMap:
+    """
+    planner of a loaded map and the shared memory block of its obstacle
+    map, freed once the map is unloaded and no search uses it
+    """
+
+    def __init__(self, name, version, planner):
+        self.name = name
+        self.version = version
+        self.planner = planner
+        obstacle_map = planner.obstacle_map
+        packed = isinstance(obstacle_map, BitGrid)
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=max(obstacle_map.nbytes, 1))
+        if packed:
+            shared = np.ndarray(obstacle_map.nbytes, dtype=np.uint8,
+                                buffer=self.shm.buf)
+            shared[...] = obstacle_map.bits
+        else:
+            shared = np.ndarray(obstacle_map.shape, dtype=bool,
+                                buffer=self.shm.buf)
+            shared[...] = obstacle_map
+        del shared
+        # sent with every search, workers plan with planners of the same
+        # class, built by its from_obstacle_map
+        self.spec = (self.shm.name, obstacle_map.shape, packed,
+                     planner.map_params(), type(planner))
+        self.pending = 0  # searches in flight on this map
+        self.searched = False  # workers may have it mapped
+        self.unloaded = False
+
+    def release(self):
+        """
+        :return: True when this call freed the shared memory block
+        """
+        if self.unloaded and self.pending == 0 and self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+            return True
+        return False
+
+
+class PlanningServer:
+    """
+    Serves load_map, unload_map, plan and metrics requests, see the
+    module docstring
+
+    Use as an async context manager, or call close() to stop serving and
+    free the worker pool and the maps.
+    """
+
+    def __init__(self, workers=None, max_pending=MAX_PENDING,
+                 max_client_pending=MAX_CLIENT_PENDING):
+        """
+        workers: number of worker processes, default os.cpu_count()
+        max_pending: searches queued on the worker pool at most
+        max_client_pending: requests of one connection served at a time
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_client_pending = max_client_pending
+        self.maps = {}  # name -> LoadedMap
+        # shared memory name -> LoadedMap of the blocks not freed yet,
+        # unloaded maps with searches in flight included
+        self.shared = {}
+        self.in_flight = {}  # coalescing key -> future of the search
+        self.sweep_done = WORKER_CONTEXT.Condition()
+        self.sweep_count = WORKER_CONTEXT.Value("i", 0, lock=False)
+        self.sweeping = None  # task of the sweep in progress
+        self.sweep_again = False  # a map was freed during the sweep
+        # busy workers missed a sweep, swept once the pool is idle
+        self.sweep_deferred = False
+        self.pool = ProcessPoolExecutor(
+            self.workers, mp_context=WORKER_CONTEXT,
+            initializer=_init_plan_worker,
+            initargs=(self.sweep_done, self.sweep_count))
+        self.server = None
+        self.clients = set()  # tasks serving the open connections
+        self.versions = itertools.count(1)
+        self.queue_depth = 0  # searches submitted and not done
+        self.counters = dict(requests=0, plans=0, coalesced=0, rejected=0,
+                             completed=0, failed=0, max_queue_depth=0)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # [s]
+        self.started = time.monotonic()
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """
+        listen on host:port, or on the Unix socket path when given
+
+        :return: the address listened on, (host, port) or path
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(
+                self.handle_client, path, limit=MAX_LINE)
+            return path
+        self.server = await asyncio.start_server(
+            self.handle_client, host, port, limit=MAX_LINE)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in list(self.clients):
+            task.cancel()
+        await asyncio.gather(*self.clients, return_exceptions=True)
+        if self.sweeping is not None:
+            self.sweeping.cancel()
+        # waits for the running searches, off the event loop
+        await asyncio.to_thread(self.pool.shutdown)
+        for loaded in self.shared.values():
+            loaded.unloaded = True
+            loaded.pending = 0
+            loaded.release()
+        self.maps.clear()
+        self.shared.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def handle_client(self, reader, writer):
+        # requests are served concurrently and answered as they finish,
+        # a connection with max_client_pending requests open is not read
+        # until one of them is answered
+        self.clients.add(asyncio.current_task())
+        slots = asyncio.Semaphore(self.max_client_pending)
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def serve(line):
+            try:
+                response = await self.handle_request(line)
+                async with lock:
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                slots.release()
+
+        try:
+            while 1:
+                await slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    slots.release()
+                    break
+                task = asyncio.ensure_future(serve(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # close() stops the connections still open
+            for task in tasks:
+                task.cancel()
+        finally:
+            writer.close()
+            self.clients.discard(asyncio.current_task())
+
+    async def handle_request(self, line):
+        """
+        :return: response dict of one request line
+        """
+        self.counters["requests"] += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            op = request.get("op")
+            handler = {"load_map": self.load_map,
+                       "unload_map": self.unload_map,
+                       "plan": self.plan,
+                       "metrics": self.metrics}.get(op)
+            if handler is None:
+                raise ValueError("unknown op: {}".format(op))
+            response = await handler(request)
+        except KeyError as e:
+            response = dict(ok=False, error="missing field: {}".format(e))
+        except Exception as e:
+            response = dict(ok=False, error=str(e) or type(e).__name__)
+        response["id"] = request_id
+        return response
+
+    async def load_map(self, request):
+        name = request["map"]
+        resolution, rr = float(request["resolution"]), float(request["rr"])
+        packed = bool(request.get("packed", False))
+        if "point_file" in request:
+            build = lambda: a_star.AStarPlanner.from_point_file(
+                request["point_file"], resolution, rr,
+                request.get("dtype", "<f4"), request.get("columns", 2),
+                packed=packed)
+        elif "image" in request:
+            build = lambda: a_star.AStarPlanner.from_occupancy_image(
+                request["image"], float(request["pixel_size"]), resolution,
+                rr, request.get("origin", (0.0, 0.0)), packed=packed)
+        else:
+            ox = np.asarray(request["ox"], dtype=float)
+            oy = np.asarray(request["oy"], dtype=float)
+            build = lambda: a_star.AStarPlanner(ox, oy, resolution, rr,
+                                                packed=packed)
+
+        # building is numpy work, which runs beside the event loop
+        planner = await asyncio.to_thread(build)
+        loaded = LoadedMap(name, next(self.versions), planner)
+        self.unload(name)
+        self.maps[name] = loaded
+        self.shared[loaded.spec[0]] = loaded
+        return dict(ok=True, map=name, version=loaded.version,
+                    x_width=planner.x_width, y_width=planner.y_width)
+
+    async def unload_map(self, request):
+        if not self.unload(request["map"]):
+            raise ValueError("unknown map: {}".format(request["map"]))
+        return dict(ok=True)
+
+    def unload(self, name):
+        loaded = self.maps.pop(name, None)
+        if loaded is None:
+            return False
+        loaded.unloaded = True
+        self.release(loaded)
+        return True
+
+    def release(self, loaded):
+        shm_name = loaded.spec[0]
+        if loaded.release():
+            del self.shared[shm_name]
+            # no worker mapped a map never searched
+            if loaded.searched:
+                self.sweep_worker_maps()
+
+    def sweep_worker_maps(self):
+        """
+        have the idle workers close the maps whose shared memory was
+        freed, one sweep at a time, maps freed meanwhile get another one.
+        The workers busy with searches are swept once none is left.
+        """
+        if self.sweeping is not None:
+            self.sweep_again = True
+        else:
+            self.sweeping = asyncio.ensure_future(self.sweep())
+
+    async def sweep(self):
+        loop = asyncio.get_running_loop()
+        try:
+            self.sweep_again = True
+            while self.sweep_again:
+                self.sweep_again = False
+                # one task per idle worker, the tasks wait for each other,
+                # so each idle worker takes one of them and none waits
+                # for a busy one
+                parties = self.workers - min(self.queue_depth, self.workers)
+                self.sweep_deferred = parties < self.workers
+                if not parties:
+                    continue
+                self.sweep_count.value = 0
+                live = frozenset(self.shared)
+                await asyncio.gather(
+                    *(loop.run_in_executor(self.pool, _sync_worker_maps,
+                                           live, parties)
+                      for _ in range(parties)),
+                    return_exceptions=True)
+        finally:
+            self.sweeping = None
+
+    async def plan(self, request):
+        t0 = time.perf_counter()
+        self.counters["plans"] += 1
+        loaded = self.maps.get(request["map"])
+        if loaded is None:
+            raise ValueError("unknown map: {}".format(request["map"]))
+        p = loaded.planner
+        sx, sy = request["start"]
+        gx, gy = request["goal"]
+        mode = request.get("mode", "array")
+        if mode not in a_star.PLANNING_MODES:
+            raise ValueError("unknown planning mode: {}".format(mode))
+        start = (p.calc_xy_index(sx, p.min_x), p.calc_xy_index(sy, p.min_y))
+        goal = (p.calc_xy_index(gx, p.min_x), p.calc_xy_index(gy, p.min_y))
+        key = (loaded.name, loaded.version, start, goal, mode)
+
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+        elif self.queue_depth >= self.max_pending:
+            self.counters["rejected"] += 1
+            return dict(ok=False, error="busy", queue_depth=self.queue_depth)
+        else:
+            # counted here, not once the search task runs, so requests
+            # read in the same loop iteration see each other
+            loaded.pending += 1
+            loaded.searched = True
+            self.queue_depth += 1
+            self.counters["max_queue_depth"] = max(
+                self.counters["max_queue_depth"], self.queue_depth)
+            future = asyncio.ensure_future(self.search(loaded, key))
+            self.in_flight[key] = future
+
+        try:
+            rx, ry, n_expanded = await asyncio.shield(future)
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        self.counters["completed"] += 1
+        self.latencies.append(time.perf_counter() - t0)
+        return dict(ok=True, rx=rx, ry=ry, expanded=n_expanded)
+
+    async def search(self, loaded, key):
+        _, _, start, goal, mode = key
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.pool, _plan, loaded.spec, start, goal, mode,
+                frozenset(self.shared))
+        finally:
+            self.queue_depth -= 1
+            loaded.pending -= 1
+            self.release(loaded)
+            del self.in_flight[key]
+            if self.sweep_deferred and not self.queue_depth:
+                self.sweep_deferred = False
+                self.sweep_worker_maps()
+
+    async def metrics(self, request=None):
+        latencies = np.array(self.latencies)
+        if latencies.size:
+            p50, p90, p99 = np.percentile(latencies, (50, 90, 99))
+            latency = dict(mean=latencies.mean(), p50=p50, p90=p90, p99=p99,
+                           max=latencies.max())
+        else:
+            latency = {}
+        return dict(ok=True, **self.counters, queue_depth=self.queue_depth,
+                    in_flight=len(self.in_flight), workers=self.workers,
+                    maps={name: loaded.version
+                          for name, loaded in self.maps.items()},
+                    latency={k: float(v) for k, v in latency.items()},
+                    uptime=time.monotonic() - self.started)
+
+
+class PlanningClient:
+    """
+    Client of a PlanningServer, requests may be sent concurrently, their
+    responses are matched by id
+    """
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.ids = itertools.count()
+        self.waiting = {}  # id -> future of the response
+        self.receiver = asyncio.ensure_future(self.receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=None, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(
+                path, limit=MAX_LINE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port,
+                                                           limit=MAX_LINE)
+        return cls(reader, writer)
+
+    async def receive(self):
+        try:
+            while 1:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.waiting.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.waiting.values():
+                if not future.done():
+                    future.set_exception(
+                        ConnectionError("planning server closed"))
+
+    async def request(self, op, **fields):
+        """
+        :return: response dict
+        """
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write(json.dumps(dict(fields, op=op, id=request_id))
+                          .encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        self.receiver.cancel()
+        try:
+            await self.receiver
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+async def serve(host, port, path, workers, max_pending):
+    async with PlanningServer(workers, max_pending) as server:
+        address = await server.start(host, port, path)
+        print("planning server on {}, {} workers".format(address,
+                                                         server.workers))
+        # SIGINT and SIGTERM stop serving, and the maps are freed on the
+        # way out
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, asyncio.current_task().cancel)
+        try:
+            await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="asyncio planning server, one JSON request per line")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.unix, args.workers,
+                      args.max_pending))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,16 @@ https://www.cs.cmu.edu/~motionplanning/lecture/Chap4-Potential-Field_howie.pdf
 """
 
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import tempfile
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.spatial import cKDTree
+
+import grid_map
+from instrumentation import Instrumentation
 
 # Parameters
 KP = 5.0  # attractive potential gain
@@ -19,59 +27,276 @@ ETA = 100.0  # repulsive potential gain
 AREA_WIDTH = 30.0  # potential area width [m]
 # the number of previous positions used to check oscillations
 OSCILLATIONS_DETECTION_LENGTH = 3
+FIELD_TILE = 512  # potential field tile width [cells]
+# fields with more cells are memory-mapped to a temporary file
+MAX_IN_MEMORY_CELLS = 1 << 26
 
 show_animation = True
 
-def calc_potential_field(gx, gy, ox, oy, reso, rr, sx, sy):
+def calc_field_bounds(gx, gy, ox, oy, reso, sx, sy):
+    """
+    origin [m] and size [cells] of the potential field, the bounding box
+    of the obstacles, start and goal plus AREA_WIDTH
+
+    sx, sy: start position [m], or arrays of the starts of many robots
+    :return: minx, miny, xw, yw
+    """
+    sx, sy = np.ravel(sx), np.ravel(sy)
+    ominx, ominy, omaxx, omaxy = grid_map.point_bounds(ox, oy)
 
     # 获取最大最小点，并扩展一定范围构建地图
-    minx = min(min(ox), sx, gx) - AREA_WIDTH / 2.0
-    miny = min(min(oy), sy, gy) - AREA_WIDTH / 2.0
-    maxx = max(max(ox), sx, gx) + AREA_WIDTH / 2.0
-    maxy = max(max(oy), sy, gy) + AREA_WIDTH / 2.0
+    minx = float(min(ominx, sx.min(), gx)) - AREA_WIDTH / 2.0
+    miny = float(min(ominy, sy.min(), gy)) - AREA_WIDTH / 2.0
+    maxx = float(max(omaxx, sx.max(), gx)) + AREA_WIDTH / 2.0
+    maxy = float(max(omaxy, sy.max(), gy)) + AREA_WIDTH / 2.0
     xw = int(round((maxx - minx) / reso))
     yw = int(round((maxy - miny) / reso))
 
-    # calc each potential
-    pmap = [[0.0 for i in range(yw)] for i in range(xw)]
+    return minx, miny, xw, yw
 
-    for ix in range(xw):
-        x = ix * reso + minx
 
-        for iy in range(yw):
-            y = iy * reso + miny
-            ug = calc_attractive_potential(x, y, gx, gy)
-            uo = calc_repulsive_potential(x, y, ox, oy, rr)
-            uf = ug + uo
-            pmap[ix][iy] = uf
+def calc_potential_field(gx, gy, ox, oy, reso, rr, sx, sy, path=None,
+                         workers=1):
+    """
+    potential field over the obstacles, start and goal plus AREA_WIDTH,
+    see calc_field
+
+    path: file to memory-map the field to, None for memory or a
+          temporary file
+    workers: number of processes computing the tiles
+    """
+    minx, miny, xw, yw = calc_field_bounds(gx, gy, ox, oy, reso, sx, sy)
+    pmap = calc_field(gx, gy, ox, oy, reso, rr, minx, miny, xw, yw, path,
+                      workers)
 
     return pmap, minx, miny
 
 
+def calc_field(gx, gy, ox, oy, reso, rr, minx, miny, xw, yw, path=None,
+               workers=1, dtype=np.float32):
+    """
+    potential field of xw x yw cells, cell (0, 0) at (minx, miny)
+
+    The field is an array indexed [ix, iy], computed vectorized one
+    FIELD_TILE x FIELD_TILE tile at a time, so only the field itself has
+    to fit in memory. Fields of more than MAX_IN_MEMORY_CELLS cells, or
+    all of them when path is given, are memory-mapped to a file.
+
+    The obstacles are sorted into tile buckets first. A tile only builds
+    its k-d tree from the points within rr of it, farther points add no
+    repulsive potential, so the field is the same as with all points.
+    With more than one worker the tiles are computed by a process pool
+    writing into the field in shared memory, or in the mapped file.
+
+    path: file to memory-map the field to, None for memory or a
+          temporary file
+    workers: number of processes computing the tiles
+    dtype: float type of the field
+    """
+    buckets = partition_obstacles(ox, oy, minx, miny, reso, xw, yw)
+    params = (gx, gy, reso, rr, minx, miny, xw, yw)
+    tiles = [(x0, y0) for x0 in range(0, xw, FIELD_TILE)
+             for y0 in range(0, yw, FIELD_TILE)]
+
+    if workers <= 1 or len(tiles) <= 1:
+        if path is not None:
+            pmap = np.memmap(path, dtype=dtype, mode="w+", shape=(xw, yw))
+        elif xw * yw > MAX_IN_MEMORY_CELLS:
+            # the mapping outlives the file object, the file is removed
+            # once the field is released
+            pmap = np.memmap(tempfile.TemporaryFile(), dtype=dtype,
+                             mode="w+", shape=(xw, yw))
+        else:
+            pmap = np.empty((xw, yw), dtype=dtype)
+        for x0, y0 in tiles:
+            calc_field_tile(pmap, x0, y0, buckets, params)
+        return pmap
+
+    # the field is shared as a mapped file when it is one anyway, else as
+    # a shared memory block copied out once all tiles are done
+    shm, tmp_path = None, None
+    if path is None and xw * yw > MAX_IN_MEMORY_CELLS:
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            tmp_path = path = f.name
+    if path is not None:
+        pmap = np.memmap(path, dtype=dtype, mode="w+", shape=(xw, yw))
+        field = ("file", path, (xw, yw), np.dtype(dtype).str)
+    else:
+        shm = shared_memory.SharedMemory(
+            create=True, size=max(xw * yw * np.dtype(dtype).itemsize, 1))
+        field = ("shm", shm.name, (xw, yw), np.dtype(dtype).str)
+
+    ox, oy, starts = buckets
+    points_shm = shared_memory.SharedMemory(create=True,
+                                            size=max(ox.nbytes * 2, 1))
+    try:
+        points = np.ndarray((2, ox.size), dtype=float, buffer=points_shm.buf)
+        points[0], points[1] = ox, oy
+        del points
+        with ProcessPoolExecutor(
+                workers, initializer=_init_field_worker,
+                initargs=(field, points_shm.name, ox.size, starts,
+                          params)) as pool:
+            list(pool.map(_calc_field_tiles, [
+                tiles[i::workers * 4] for i in range(workers * 4)]))
+        if shm is not None:
+            pmap = np.ndarray((xw, yw), dtype=dtype, buffer=shm.buf).copy()
+        else:
+            pmap.flush()
+    finally:
+        points_shm.close()
+        points_shm.unlink()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+        if tmp_path is not None:
+            # the mapping stays valid, the file is removed once the field
+            # is released
+            os.unlink(tmp_path)
+
+    return pmap
+
+
+def partition_obstacles(ox, oy, minx, miny, reso, xw, yw):
+    """
+    sort the obstacle points into the buckets of the FIELD_TILE x
+    FIELD_TILE tiles of a field, points outside the field into the
+    bucket of the nearest edge tile
+
+    :return: ox, oy float arrays sorted by bucket, start offset of each
+             bucket in them, bucket tx * n_tiles_y + ty of tile (tx, ty)
+             ending where the next one starts
+    """
+    ox, oy = grid_map.as_points(ox), grid_map.as_points(oy)
+    ntx = max(1, -(-xw // FIELD_TILE))
+    nty = max(1, -(-yw // FIELD_TILE))
+    tile = FIELD_TILE * reso
+    tx = np.clip(np.floor((ox - minx) / tile), 0, ntx - 1).astype(np.int64)
+    ty = np.clip(np.floor((oy - miny) / tile), 0, nty - 1).astype(np.int64)
+    bucket = tx * nty + ty
+    order = np.argsort(bucket, kind="stable")
+    starts = np.searchsorted(bucket[order], np.arange(ntx * nty + 1))
+    return (np.asarray(ox[order], dtype=float),
+            np.asarray(oy[order], dtype=float), starts)
+
+
+def calc_field_tile(pmap, x0, y0, buckets, params):
+    """
+    compute the tile of the field whose first cell is (x0, y0) into pmap
+
+    buckets: partition_obstacles of the field
+    params: gx, gy, reso, rr, minx, miny, xw, yw of calc_field
+    """
+    gx, gy, reso, rr, minx, miny, xw, yw = params
+    ox, oy, starts = buckets
+    x1, y1 = min(x0 + FIELD_TILE, xw), min(y0 + FIELD_TILE, yw)
+    x = (np.arange(x0, x1) * reso + minx)[:, None]
+    y = (np.arange(y0, y1) * reso + miny)[None, :]
+
+    # buckets of the tiles within rr, then the points within rr of the
+    # bounding box of the tile
+    nty = max(1, -(-yw // FIELD_TILE))
+    ntx = (len(starts) - 1) // nty
+    tx, ty = x0 // FIELD_TILE, y0 // FIELD_TILE
+    m = int(np.ceil(rr / (FIELD_TILE * reso)))
+    index = np.concatenate([
+        np.arange(starts[i * nty + max(ty - m, 0)],
+                  starts[i * nty + min(ty + m, nty - 1) + 1])
+        for i in range(max(tx - m, 0), min(tx + m, ntx - 1) + 1)])
+    tox, toy = ox[index], oy[index]
+    near = (tox >= x[0, 0] - rr) & (tox <= x[-1, 0] + rr) & \
+        (toy >= y[0, 0] - rr) & (toy <= y[0, -1] + rr)
+    tox, toy = tox[near], toy[near]
+
+    ug = calc_attractive_potential(x, y, gx, gy)
+    uo = calc_repulsive_potential(x, y, tox, toy, rr)
+    pmap[x0:x1, y0:y1] = ug + uo
+
+
+# field, obstacle buckets and parameters of the current calc_field worker,
+# set up by _init_field_worker
+_field_worker = None
+
+
+def _init_field_worker(field, points_name, n_points, starts, params):
+    global _field_worker
+    kind, name, shape, dtype = field
+    if kind == "file":
+        handle = None
+        pmap = np.memmap(name, dtype=dtype, mode="r+", shape=shape)
+    else:
+        handle = shared_memory.SharedMemory(name=name)
+        pmap = np.ndarray(shape, dtype=dtype, buffer=handle.buf)
+    points_shm = shared_memory.SharedMemory(name=points_name)
+    points = np.ndarray((2, n_points), dtype=float, buffer=points_shm.buf)
+    # the shared memory handles are kept so the blocks stay mapped
+    _field_worker = (pmap, (points[0], points[1], starts), params,
+                     handle, points_shm)
+
+
+def _calc_field_tiles(tiles):
+    pmap, buckets, params = _field_worker[:3]
+    for x0, y0 in tiles:
+        calc_field_tile(pmap, x0, y0, buckets, params)
+    if isinstance(pmap, np.memmap):
+        pmap.flush()
+
+
+class LazyPotentialField:
+    """
+    Potential field evaluated on first access and memoized, read like the
+    array of calc_potential_field through shape and pmap[ix, iy]
+
+    A miss evaluates the 3 x 3 cells around the cell in one k-d tree
+    query, the neighbourhood the descent reads next, with the float32
+    rounding of the full field, so both give the same paths. Building it
+    only takes the bounds and the tree, whatever the field area.
+    """
+
+    def __init__(self, gx, gy, ox, oy, reso, rr, sx, sy):
+        self.gx, self.gy = gx, gy
+        self.ox, self.oy = ox, oy
+        self.reso, self.rr = reso, rr
+        self.minx, self.miny, xw, yw = calc_field_bounds(
+            gx, gy, ox, oy, reso, sx, sy)
+        self.shape = (xw, yw)
+        self.tree = cKDTree(np.column_stack((np.ravel(ox), np.ravel(oy))))
+        self.values = {}  # (ix, iy) -> potential
+
+    def __getitem__(self, index):
+        p = self.values.get(index)
+        if p is None:
+            self.evaluate(*index)
+            p = self.values[index]
+        return p
+
+    def evaluate(self, ix, iy):
+        xw, yw = self.shape
+        cells = [(x, y) for x in range(max(ix - 1, 0), min(ix + 2, xw))
+                 for y in range(max(iy - 1, 0), min(iy + 2, yw))
+                 if (x, y) not in self.values]
+        index = np.array(cells)
+        x = index[:, 0] * self.reso + self.minx
+        y = index[:, 1] * self.reso + self.miny
+        ug = calc_attractive_potential(x, y, self.gx, self.gy)
+        uo = calc_repulsive_potential(x, y, self.ox, self.oy, self.rr,
+                                      self.tree)
+        self.values.update(zip(cells, (ug + uo).astype(np.float32).tolist()))
+
+
 def calc_attractive_potential(x, y, gx, gy):
     return 0.5 * KP * np.hypot(x - gx, y - gy)
 
 
-def calc_repulsive_potential(x, y, ox, oy, rr):
-    # search nearest obstacle
-    minid = -1
-    dmin = float("inf")
-    for i, _ in enumerate(ox):
-        d = np.hypot(x - ox[i], y - oy[i])
-        if dmin >= d:
-            dmin = d
-            minid = i
+def calc_repulsive_potential(x, y, ox, oy, rr, tree=None):
+    # distance to the nearest obstacle, x and y may be arrays
+    dq = grid_map.nearest_obstacle_distance(x, y, ox, oy, tree)
 
     # calc repulsive potential
-    dq = np.hypot(x - ox[minid], y - oy[minid])
+    inside = dq <= rr
+    dq = np.maximum(dq, 0.1)
 
-    if dq <= rr:
-        if dq <= 0.1:
-            dq = 0.1
-
-        return 0.5 * ETA * (1.0 / dq - 1.0 / rr) ** 2
-    else:
-        return 0.0
+    return np.where(inside, 0.5 * ETA * (1.0 / dq - 1.0 / rr) ** 2, 0.0)
 
 
 def get_motion_model():
@@ -104,7 +329,9 @@ def oscillations_detection(previous_ids, ix, iy):
     return False
 
 
-def potential_field_planning(sx, sy, gx, gy, ox, oy, reso, rr):
+def potential_field_planning(sx, sy, gx, gy, ox, oy, reso, rr,
+                             instrumentation=None, field_path=None,
+                             lazy=False, field_workers=1):
     """人工势场规划
 
     Args:
@@ -112,36 +339,55 @@ def potential_field_planning(sx, sy, gx, gy, ox, oy, reso, rr):
         sy ([type]): start y positon 
         gx ([type]): goal x position
         gy ([type]): goal y position
-        ox ([type]): obstacle x position list
-        oy ([type]): obstacle y position list
+        ox ([type]): obstacle x position list or array, e.g. from
+            grid_map.load_point_file
+        oy ([type]): obstacle y position list or array
         reso ([type]): potential grid size 
         rr ([type]): robot radius
+        instrumentation (Instrumentation): counters, timers and callbacks,
+            None runs headless. The potential field build is timed as
+            map_build, every descent step is an expansion, neighbours
+            outside the field are rejections.
+        field_path (str): file to memory-map the potential field to, see
+            calc_potential_field
+        lazy (bool): evaluate the potentials of the cells the descent
+            reads only, see LazyPotentialField. The path is the same.
+            on_potential_field is not called as there is no full field.
+        field_workers (int): number of processes computing the tiles of
+            the potential field, see calc_field
 
     Returns:
         [type]: [description]
     """
+    inst = instrumentation
 
     # calc potential field
-    pmap, minx, miny = calc_potential_field(gx, gy, ox, oy, reso, rr, sx, sy)
+    if inst is not None:
+        inst.start("map_build")
+    if lazy:
+        pmap = LazyPotentialField(gx, gy, ox, oy, reso, rr, sx, sy)
+        minx, miny = pmap.minx, pmap.miny
+    else:
+        pmap, minx, miny = calc_potential_field(gx, gy, ox, oy, reso, rr,
+                                                sx, sy, field_path,
+                                                field_workers)
+    if inst is not None:
+        inst.stop("map_build")
+        if inst.on_potential_field is not None and not lazy:
+            inst.on_potential_field(pmap, minx, miny)
+        inst.start("search")
+    on_expand = None if inst is None else inst.on_expand
 
     # search path
     d = np.hypot(sx - gx, sy - gy)
     ix = round((sx - minx) / reso)
     iy = round((sy - miny) / reso)
-    gix = round((gx - minx) / reso)
-    giy = round((gy - miny) / reso)
-
-    if show_animation:
-        draw_heatmap(pmap)
-        # for stopping simulation with the esc key.
-        plt.gcf().canvas.mpl_connect('key_release_event',
-                lambda event: [exit(0) if event.key == 'escape' else None])
-        plt.plot(ix, iy, "*k")
-        plt.plot(gix, giy, "*m")
 
     rx, ry = [sx], [sy]
     motion = get_motion_model()
     previous_ids = deque()
+    xw, yw = pmap.shape
+    n_rejected = 0
 
     while d >= reso:
         minp = float("inf")
@@ -149,11 +395,13 @@ def potential_field_planning(sx, sy, gx, gy, ox, oy, reso, rr):
         for i, _ in enumerate(motion):
             inx = int(ix + motion[i][0])
             iny = int(iy + motion[i][1])
-            if inx >= len(pmap) or iny >= len(pmap[0]) or inx < 0 or iny < 0:
+            if inx >= xw or iny >= yw or inx < 0 or iny < 0:
                 p = float("inf")  # outside area
-                print("outside potential!")
+                n_rejected += 1
+                if inst is not None:
+                    inst.log("outside potential!")
             else:
-                p = pmap[inx][iny]
+                p = pmap[inx, iny]
             if minp > p:
                 minp = p
                 minix = inx
@@ -167,23 +415,153 @@ def potential_field_planning(sx, sy, gx, gy, ox, oy, reso, rr):
         ry.append(yp)
 
         if (oscillations_detection(previous_ids, ix, iy)):
-            print("Oscillation detected at ({},{})!".format(ix, iy))
+            if inst is not None:
+                inst.log("Oscillation detected at ({},{})!".format(ix, iy))
             break
 
-        if show_animation:
-            plt.plot(ix, iy, ".r")
-            plt.pause(0.01)
+        if on_expand is not None:
+            on_expand(ix, iy)
 
-    print("Goal!!")
+    if inst is not None:
+        inst.stop("search")
+        inst.count(expansions=len(rx) - 1, rejections=n_rejected)
+        inst.log("Goal!!")
 
     return rx, ry
 
 
+def potential_field_planning_batch(starts, gx, gy, ox, oy, reso, rr,
+                                   instrumentation=None, field_path=None,
+                                   field_workers=1):
+    """
+    potential field planning of many robots heading to one goal
+
+    All robots descend one shared potential field, whose bounds include
+    every start, and step together: neighbour lookup, argmin and the
+    goal distance test are array operations over the robots still
+    moving. Each robot stops like in potential_field_planning, at the
+    goal or when oscillations_detection would report it over its last
+    OSCILLATIONS_DETECTION_LENGTH cells. A robot whose single-robot field
+    has the same bounds, e.g. one starting within the obstacles'
+    bounding box, gets the same path as from potential_field_planning.
+
+    starts: (sx, sy) start positions [m]
+    gx, gy: goal position [m]
+    ox, oy: obstacle position lists or arrays [m]
+    reso: potential grid size [m]
+    rr: robot radius [m]
+    instrumentation: as in potential_field_planning, on_expand is
+                     called for every robot step
+    field_path: file to memory-map the potential field to
+    field_workers: number of processes computing the potential field
+
+    :return: list of (rx, ry) paths in start order
+    """
+    inst = instrumentation
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    sx, sy = starts[:, 0], starts[:, 1]
+    n = len(starts)
+    if n == 0:
+        return []
+
+    if inst is not None:
+        inst.start("map_build")
+    pmap, minx, miny = calc_potential_field(gx, gy, ox, oy, reso, rr, sx, sy,
+                                            field_path, field_workers)
+    if inst is not None:
+        inst.stop("map_build")
+        if inst.on_potential_field is not None:
+            inst.on_potential_field(pmap, minx, miny)
+        inst.start("search")
+    on_expand = None if inst is None else inst.on_expand
+
+    xw, yw = pmap.shape
+    motion = np.array(get_motion_model())
+    ix = np.round((sx - minx) / reso).astype(np.int64)
+    iy = np.round((sy - miny) / reso).astype(np.int64)
+    # last cells of every robot for the oscillation test, -1 is no cell
+    history = np.full((n, OSCILLATIONS_DETECTION_LENGTH - 1), -1, np.int64)
+    active = np.flatnonzero(np.hypot(sx - gx, sy - gy) >= reso)
+    steps = []  # (robot indexes, x, y) of every step
+    n_rejected = 0
+
+    while active.size:
+        # neighbour potentials of every moving robot, inf outside the field
+        nx = ix[active, None] + motion[:, 0]
+        ny = iy[active, None] + motion[:, 1]
+        inside = (nx >= 0) & (ny >= 0) & (nx < xw) & (ny < yw)
+        p = np.full(nx.shape, np.inf, dtype=np.float32)
+        p[inside] = pmap[nx[inside], ny[inside]]
+        n_rejected += nx.size - int(inside.sum())
+
+        # the first of the lowest neighbours, like the scalar loop
+        best = np.argmin(p, axis=1)
+        rows = np.arange(active.size)
+        ix[active] = nx[rows, best]
+        iy[active] = ny[rows, best]
+        xp = ix[active] * reso + minx
+        yp = iy[active] * reso + miny
+        steps.append((active, xp, yp))
+
+        if on_expand is not None:
+            for i in active:
+                on_expand(int(ix[i]), int(iy[i]))
+
+        cell = ix[active] * yw + iy[active]
+        oscillating = (history[active] == cell[:, None]).any(axis=1)
+        history[active] = np.column_stack((history[active, 1:], cell))
+        if inst is not None:
+            for i in active[oscillating]:
+                inst.log("Oscillation detected at ({},{})!".format(
+                    ix[i], iy[i]))
+        active = active[(np.hypot(gx - xp, gy - yp) >= reso) & ~oscillating]
+
+    if inst is not None:
+        inst.stop("search")
+        inst.count(expansions=sum(len(a) for a, _, _ in steps),
+                   rejections=n_rejected)
+        inst.log("Goal!!")
+
+    paths = [([x], [y]) for x, y in zip(sx.tolist(), sy.tolist())]
+    for robots, xp, yp in steps:
+        for i, x, y in zip(robots.tolist(), xp.tolist(), yp.tolist()):
+            paths[i][0].append(x)
+            paths[i][1].append(y)
+    return paths
+
+
 def draw_heatmap(data):
     data = np.array(data).T
     plt.pcolor(data, vmax=100.0, cmap=plt.cm.Blues)
 
 
+class Animation:
+    """
+    Instrumentation callbacks drawing the potential field in grid index
+    coordinates and every descent step, what show_animation used to do
+    inside potential_field_planning
+    """
+
+    def __init__(self, sx, sy, gx, gy, reso):
+        self.sx, self.sy = sx, sy
+        self.gx, self.gy = gx, gy
+        self.reso = reso
+
+    def draw_field(self, pmap, minx, miny):  # pragma: no cover
+        draw_heatmap(pmap)
+        # for stopping simulation with the esc key.
+        plt.gcf().canvas.mpl_connect('key_release_event',
+                lambda event: [exit(0) if event.key == 'escape' else None])
+        plt.plot(round((self.sx - minx) / self.reso),
+                 round((self.sy - miny) / self.reso), "*k")
+        plt.plot(round((self.gx - minx) / self.reso),
+                 round((self.gy - miny) / self.reso), "*m")
+
+    def draw_step(self, ix, iy):  # pragma: no cover
+        plt.plot(ix, iy, ".r")
+        plt.pause(0.01)
+
+
 def main():
     print("potential_field_planning start")
 
@@ -197,13 +575,17 @@ def main():
     ox = [15.0, 5.0, 20.0, 25.0]  # obstacle x position list [m]
     oy = [25.0, 15.0, 26.0, 25.0]  # obstacle y position list [m]
 
+    instrumentation = Instrumentation(verbose=True)
     if show_animation:
         plt.grid(True)
         plt.axis("equal")
+        animation = Animation(sx, sy, gx, gy, grid_size)
+        instrumentation.on_potential_field = animation.draw_field
+        instrumentation.on_expand = animation.draw_step
 
     # path generation
     _, _ = potential_field_planning(
-        sx, sy, gx, gy, ox, oy, grid_size, robot_radius)
+        sx, sy, gx, gy, ox, oy, grid_size, robot_radius, instrumentation)
 
     if show_animation:
         plt.show()
@@ -0,0 +1,173 @@
+"""
+
+Reproducible planning scenarios
+
+Every generator returns obstacle point lists and a start and goal
+position like the main() layouts of the planners:
+ox, oy, (sx, sy), (gx, gy). Maps are square rooms of size x size [m]
+whose walls are sampled every WALL_STEP meters, the same seed always
+gives the same map.
+
+"""
+
+import math
+import random
+
+WALL_STEP = 0.5  # obstacle point spacing along walls [m]
+
+
+def wall(x0, y0, x1, y1, step=WALL_STEP):
+    """
+    obstacle points along the segment from (x0, y0) to (x1, y1), both
+    ends included
+
+    :return: ox, oy position lists [m]
+    """
+    n = max(1, int(math.ceil(math.hypot(x1 - x0, y1 - y0) / step)))
+    return ([x0 + (x1 - x0) * i / n for i in range(n + 1)],
+            [y0 + (y1 - y0) * i / n for i in range(n + 1)])
+
+
+def walls(segments, step=WALL_STEP):
+    ox, oy = [], []
+    for segment in segments:
+        x, y = wall(*segment, step=step)
+        ox += x
+        oy += y
+    return ox, oy
+
+
+def border(size):
+    return [(0.0, 0.0, size, 0.0), (size, 0.0, size, size),
+            (size, size, 0.0, size), (0.0, size, 0.0, 0.0)]
+
+
+def random_map(size, density=0.02, clearance=3.0, seed=0):
+    """
+    room with obstacle points scattered uniformly, none within clearance
+    of the start in the lower-left and the goal in the upper-right corner
+
+    density: obstacle points per square meter
+    """
+    rng = random.Random(seed)
+    start, goal = (2.0, 2.0), (size - 2.0, size - 2.0)
+    ox, oy = walls(border(size))
+    for _ in range(int(density * size * size)):
+        x, y = rng.uniform(0, size), rng.uniform(0, size)
+        if math.hypot(x - start[0], y - start[1]) > clearance and \
+                math.hypot(x - goal[0], y - goal[1]) > clearance:
+            ox.append(x)
+            oy.append(y)
+
+    return ox, oy, start, goal
+
+
+def maze_map(size, cell=8.0, seed=0):
+    """
+    perfect maze of cell x cell [m] corridors carved by a randomized depth
+    first search, from the lower-left to the upper-right cell
+    """
+    rng = random.Random(seed)
+    n = max(1, int(size // cell))
+    cell = size / n
+    # (i, j, d) in closed is a wall on the +x (d=0) or +y (d=1) side of
+    # cell (i, j)
+    closed = {(i, j, d) for i in range(n) for j in range(n) for d in (0, 1)}
+    visited = {(0, 0)}
+    stack = [(0, 0)]
+    while stack:
+        i, j = stack[-1]
+        options = [(i + di, j + dj) for di, dj in
+                   ((1, 0), (-1, 0), (0, 1), (0, -1))
+                   if 0 <= i + di < n and 0 <= j + dj < n and
+                   (i + di, j + dj) not in visited]
+        if not options:
+            stack.pop()
+            continue
+        ni, nj = rng.choice(options)
+        if ni != i:
+            closed.discard((min(i, ni), j, 0))
+        else:
+            closed.discard((i, min(j, nj), 1))
+        visited.add((ni, nj))
+        stack.append((ni, nj))
+
+    segments = border(size)
+    for i, j, d in sorted(closed):
+        if d == 0 and i < n - 1:
+            x = (i + 1) * cell
+            segments.append((x, j * cell, x, (j + 1) * cell))
+        elif d == 1 and j < n - 1:
+            y = (j + 1) * cell
+            segments.append((i * cell, y, (i + 1) * cell, y))
+    ox, oy = walls(segments)
+
+    return ox, oy, (cell / 2, cell / 2), (size - cell / 2, size - cell / 2)
+
+
+def rooms_map(size, room=20.0, door=4.0, corridor=6.0, seed=0):
+    """
+    rows of room x room [m] rooms between corridor x size [m] corridors.
+    Every room has a door to each corridor next to it and to each room
+    next to it, at random positions along the walls.
+    """
+    rng = random.Random(seed)
+    n = max(1, int(size // room))
+    room = size / n
+    n_rows = max(1, int((size + corridor) // (room + corridor)))
+    segments = border(size)
+
+    def split(x0, y0, x1, y1):
+        # wall from (x0, y0) to (x1, y1) with a door of width door
+        length = math.hypot(x1 - x0, y1 - y0)
+        ux, uy = (x1 - x0) / length, (y1 - y0) / length
+        gap = rng.uniform(door, length - door)
+        a, b = gap - door / 2, gap + door / 2
+        segments.append((x0, y0, x0 + ux * a, y0 + uy * a))
+        segments.append((x0 + ux * b, y0 + uy * b, x1, y1))
+
+    for r in range(n_rows):
+        y0 = r * (room + corridor)
+        y1 = min(y0 + room, size)
+        for i in range(n):
+            x0, x1 = i * room, (i + 1) * room
+            if r > 0:
+                split(x0, y0, x1, y0)
+            if y1 < size:
+                split(x0, y1, x1, y1)
+            if i < n - 1:
+                split(x1, y0, x1, y1)
+
+    ox, oy = walls(segments)
+    return ox, oy, (room / 2, room / 2), (size - room / 2, (y0 + y1) / 2)
+
+
+def main_map(size=70.0):
+    """
+    the main() layout of a_star and a_star_modify, scaled from its 70 m
+    extent to size [m]
+    """
+    s = size / 70.0
+    segments = [(-10, -10, 60, -10), (60, -10, 60, 60), (60, 60, -10, 60),
+                (-10, 60, -10, -10), (20, -10, 20, 40), (40, 60, 40, 20),
+                (30, 20, 40, 20), (40, 40, 50, 40), (0, 40, 20, 40),
+                (0, 20, 0, 40)]
+    ox, oy = walls([((x0 + 10) * s, (y0 + 10) * s, (x1 + 10) * s,
+                     (y1 + 10) * s) for x0, y0, x1, y1 in segments])
+
+    return ox, oy, (20.0 * s, 20.0 * s), (60.0 * s, 60.0 * s)
+
+
+GENERATORS = {"random": random_map, "maze": maze_map, "rooms": rooms_map,
+              "main": main_map}
+
+
+def make_scenario(kind, size, seed=0):
+    """
+    scenario of one of the GENERATORS kinds, main ignores seed
+    """
+    if kind not in GENERATORS:
+        raise ValueError("unknown scenario: {}".format(kind))
+    if kind == "main":
+        return main_map(size)
+    return GENERATORS[kind](size, seed=seed)
@@ -0,0 +1,242 @@
+"""
+
+AStarPlanner interface
+
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+import a_star
+import a_star_modify
+import scenarios
+from instrumentation import Instrumentation
+
+
+def test_calc_heuristic_is_static():
+    n1 = a_star.AStarPlanner.Node(0, 0, 0.0, -1)
+    n2 = a_star.AStarPlanner.Node(3, 4, 0.0, -1)
+    assert a_star.AStarPlanner.calc_heuristic(n1, n2) == 5.0
+    assert a_star_modify.AStarPlanner.calc_heuristic(n1, n2) == 5.0
+
+
+def test_node_heuristic_uses_planner_class():
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 40)
+    planner = a_star_modify.AStarPlanner(ox, oy, 1.0, 1.0)
+    planner.load_potential_field(*goal)
+    n1 = planner.Node(planner.calc_xy_index(goal[0], planner.min_x),
+                      planner.calc_xy_index(goal[1], planner.min_y), 0.0, -1)
+    n2 = planner.Node(n1.x - 3, n1.y - 4, 0.0, -1)
+    assert planner.calc_node_heuristic(n1, n2) == \
+        planner.calc_xy_heuristic(n1.x, n1.y, n2.x, n2.y)
+    assert not math.isclose(planner.calc_node_heuristic(n1, n2), 5.0)
+
+
+def test_for_robot_radius_keeps_instrumentation():
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 40)
+    for cls in (a_star.AStarPlanner, a_star_modify.AStarPlanner):
+        expanded, fields = [], []
+        inst = Instrumentation(
+            on_expand=lambda ix, iy: expanded.append((ix, iy)),
+            on_potential_field=lambda *args: fields.append(args))
+        planner = cls(ox, oy, 1.0, 1.0, inst, distance_map=True)
+        derived = planner.for_robot_radius(1.5)
+        assert derived.instrumentation is inst
+
+        rx, _ = derived.planning(*start, *goal, mode="array")
+        assert len(rx) > 1
+        assert expanded
+        assert inst.counters["expansions"] > 0
+        assert inst.timers["search"] > 0.0
+        if cls is a_star_modify.AStarPlanner:
+            assert len(fields) == 1
+
+
+def test_from_cache_warm_hit(tmp_path):
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 40)
+    for cls in (a_star.AStarPlanner, a_star_modify.AStarPlanner):
+        cache_dir = str(tmp_path / cls.__module__)
+        cold = cls.from_cache(ox, oy, 1.0, 1.0, cache_dir)
+        warm = cls.from_cache(ox, oy, 1.0, 1.0, cache_dir)
+        assert isinstance(warm.obstacle_map, np.memmap)
+        assert np.array_equal(warm.obstacle_map, cold.obstacle_map)
+        assert warm.map_params() == cold.map_params()
+        assert warm.planning(*start, *goal) == cold.planning(*start, *goal)
+
+
+def path_cost(rx, ry):
+    return sum(math.hypot(x1 - x0, y1 - y0)
+               for x0, y0, x1, y1 in zip(rx, ry, rx[1:], ry[1:]))
+
+
+def assert_grid_path(planner, rx, ry, start, goal):
+    # goal first, every step a move of the motion model into a free cell
+    cells = [(planner.calc_xy_index(x, planner.min_x),
+              planner.calc_xy_index(y, planner.min_y)) for x, y in zip(rx, ry)]
+    assert cells[0] == (planner.calc_xy_index(goal[0], planner.min_x),
+                        planner.calc_xy_index(goal[1], planner.min_y))
+    assert cells[-1] == (planner.calc_xy_index(start[0], planner.min_x),
+                         planner.calc_xy_index(start[1], planner.min_y))
+    for (x0, y0), (x1, y1) in zip(cells, cells[1:]):
+        assert max(abs(x1 - x0), abs(y1 - y0)) == 1
+    assert not any(planner.obstacle_map[c] for c in cells[:-1])
+
+
+SCENARIOS = [(kind, seed) for kind in ("random", "maze", "rooms", "main")
+             for seed in range(3)]
+
+
+def make_queries(kind, seed, n=4, size=60):
+    """
+    planner on a scenario map, dense for "random", and its start and goal
+    plus n random queries between free cells
+    """
+    if kind == "random":
+        ox, oy, start, goal = scenarios.random_map(size, density=0.12,
+                                                   seed=seed)
+    else:
+        ox, oy, start, goal = scenarios.make_scenario(kind, size, seed)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    rng = random.Random(seed)
+    free = [tuple(c) for c in np.argwhere(~planner.obstacle_map).tolist()]
+    queries = [(start, goal)]
+    for _ in range(n):
+        cells = rng.sample(free, 2)
+        queries.append(tuple(
+            (planner.calc_grid_position(ix, planner.min_x),
+             planner.calc_grid_position(iy, planner.min_y))
+            for ix, iy in cells))
+    return planner, queries
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_jps_matches_a_star(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    for start, goal in queries:
+        ax, ay = planner.planning(*start, *goal, mode="array")
+        rx, ry = planner.planning(*start, *goal, mode="jps")
+        if len(ax) == 1 and start != goal:
+            assert (rx, ry) == (ax, ay)  # no path
+            continue
+        assert_grid_path(planner, rx, ry, start, goal)
+        assert path_cost(rx, ry) == pytest.approx(path_cost(ax, ay))
+
+
+def test_jps_without_path():
+    ox, oy, _, _ = scenarios.make_scenario("rooms", 40)
+    ox += [30.0 + 0.5 * i for i in range(9)] + [30.0] * 9 + [34.0] * 9 + \
+        [30.0 + 0.5 * i for i in range(9)]
+    oy += [30.0] * 9 + [30.0 + 0.5 * i for i in range(9)] + \
+        [30.0 + 0.5 * i for i in range(9)] + [34.0] * 9
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 0.5)
+    rx, ry = planner.planning(5.0, 5.0, 32.0, 32.0, mode="jps")
+    assert (rx, ry) == planner.planning(5.0, 5.0, 32.0, 32.0, mode="array")
+    assert (rx, ry) == ([32.0], [32.0])
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_bidirectional_matches_a_star(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    for start, goal in queries:
+        ax, ay = planner.planning(*start, *goal, mode="array")
+        rx, ry = planner.planning(*start, *goal, mode="bidirectional")
+        if len(ax) == 1 and start != goal:
+            assert (rx, ry) == (ax, ay)  # no path
+            continue
+        assert_grid_path(planner, rx, ry, start, goal)
+        assert path_cost(rx, ry) == pytest.approx(path_cost(ax, ay))
+
+
+def test_bidirectional_start_in_obstacle():
+    planner, queries = make_queries("rooms", 0)
+    _, goal = queries[0]
+    for ix, iy in np.argwhere(planner.obstacle_map)[::97].tolist():
+        start = (planner.calc_grid_position(ix, planner.min_x),
+                 planner.calc_grid_position(iy, planner.min_y))
+        ax, ay = planner.planning(*start, *goal, mode="array")
+        rx, ry = planner.planning(*start, *goal, mode="bidirectional")
+        assert len(rx) == len(ax)
+        assert path_cost(rx, ry) == pytest.approx(path_cost(ax, ay))
+
+
+def test_bidirectional_start_is_goal():
+    planner, queries = make_queries("maze", 0)
+    start, _ = queries[0]
+    rx, ry = planner.planning(*start, *start, mode="bidirectional")
+    assert (rx, ry) == planner.planning(*start, *start, mode="array")
+    assert len(rx) == 1
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_anytime_bounds(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    for start, goal in queries:
+        best = path_cost(*planner.planning(*start, *goal, mode="array"))
+        paths = list(planner.planning_anytime(*start, *goal,
+                                              time_budget=60.0))
+        assert paths and paths[-1][2] == 1.0
+        bounds = [bound for _, _, bound in paths]
+        assert bounds == sorted(bounds, reverse=True)
+        assert bounds[0] <= a_star.ANYTIME_WEIGHT
+        for rx, ry, bound in paths:
+            assert_grid_path(planner, rx, ry, start, goal)
+            assert path_cost(rx, ry) <= bound * best + 1e-9
+        assert path_cost(*paths[-1][:2]) == pytest.approx(best, abs=1e-9)
+
+
+def test_anytime_out_of_time():
+    planner, [(start, goal)] = make_queries("maze", 0, n=0)
+    # the first search completes however short the budget
+    paths = list(planner.planning_anytime(*start, *goal, time_budget=0.0))
+    assert len(paths) == 1
+    rx, ry, bound = paths[0]
+    assert_grid_path(planner, rx, ry, start, goal)
+    assert 1.0 <= bound <= a_star.ANYTIME_WEIGHT
+
+    rx, ry = planner.planning(*start, *goal, mode="anytime")
+    assert_grid_path(planner, rx, ry, start, goal)
+    assert path_cost(rx, ry) <= a_star.ANYTIME_WEIGHT * path_cost(
+        *planner.planning(*start, *goal, mode="array")) + 1e-9
+
+
+def test_anytime_without_path():
+    planner, _ = make_queries("rooms", 0, n=0)
+    planner.update_obstacle_cells(added=[
+        (ix, iy) for ix in range(planner.x_width) for iy in (19, 20)])
+    assert list(planner.planning_anytime(5.0, 5.0, 5.0, 40.0)) == []
+    assert planner.planning(5.0, 5.0, 5.0, 40.0, mode="anytime") == \
+        ([5.0], [40.0])
+
+
+@pytest.mark.parametrize("kind", ["rooms", "maze", "random"])
+@pytest.mark.parametrize("packed", [False, True])
+def test_robot_radius_matches_fresh_planner(kind, packed):
+    ox, oy, start, goal = scenarios.make_scenario(kind, 40)
+    for cls in (a_star.AStarPlanner, a_star_modify.AStarPlanner):
+        planner = cls(ox, oy, 0.5, 1.0, packed=packed, distance_map=True)
+        for rr in (0.5, 1.5, 2.3, 1.0):
+            fresh = cls(ox, oy, 0.5, rr, packed=packed, distance_map=True)
+            derived = planner.for_robot_radius(rr)
+            assert type(derived) is cls and derived.rr == rr
+            assert derived.packed == packed
+            assert derived.distance_map is planner.distance_map
+            version = planner.map_version
+            planner.set_robot_radius(rr)
+            assert planner.map_version == version + 1
+            for other in (derived, planner):
+                assert np.array_equal(np.asarray(other.obstacle_map),
+                                      np.asarray(fresh.obstacle_map))
+                assert other.planning(*start, *goal, mode="array") == \
+                    fresh.planning(*start, *goal, mode="array")
+
+
+def test_robot_radius_needs_distance_map():
+    ox, oy, _, _ = scenarios.make_scenario("rooms", 40)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    with pytest.raises(ValueError):
+        planner.for_robot_radius(2.0)
+    with pytest.raises(ValueError):
+        planner.set_robot_radius(2.0)
@@ -0,0 +1,87 @@
+"""
+
+Potential field scaled A* of a_star_modify
+
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+import a_star_modify
+import scenarios
+from instrumentation import Instrumentation
+
+
+def potential_field_loop(planner, gx, gy):
+    # the potential field calc_potential_field used to compute cell by
+    # cell, nearest obstacle by a scan over all points
+    ox, oy, rr = planner.ox, planner.oy, planner.rr
+    pmap = np.zeros((planner.x_width, planner.y_width))
+    for ix in range(planner.x_width):
+        x = ix * planner.resolution + planner.min_x
+        for iy in range(planner.y_width):
+            y = iy * planner.resolution + planner.min_y
+            dq = min(np.hypot(x - iox, y - ioy) for iox, ioy in zip(ox, oy))
+            uo = 0.5 * a_star_modify.ETA * (
+                1.0 / max(dq, 0.1) - 1.0 / rr) ** 2 if dq <= rr else 0.0
+            pmap[ix, iy] = 0.5 * a_star_modify.KP * np.hypot(x - gx, y - gy) \
+                + uo
+    return (pmap - pmap.min()) / (pmap.max() - pmap.min())
+
+
+@pytest.mark.parametrize("kind, rr", [("rooms", 1.0), ("maze", 2.0),
+                                      ("random", 3.0)])
+def test_potential_field_matches_loop(kind, rr):
+    ox, oy, _, goal = scenarios.make_scenario(kind, 30)
+    planner = a_star_modify.AStarPlanner(ox, oy, 1.0, rr)
+    pmap = planner.calc_potential_field(*goal, ox, oy, 1.0, rr)
+    assert pmap.shape == (planner.x_width, planner.y_width)
+    np.testing.assert_allclose(pmap, potential_field_loop(planner, *goal),
+                               rtol=0.0, atol=1e-12)
+
+
+def test_heuristic_reads_potential_field():
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 30)
+    planner = a_star_modify.AStarPlanner(ox, oy, 1.0, 1.0)
+    pmap = planner.load_potential_field(*goal)
+    for x, y in ((3, 4), (10, 2), (0, 0)):
+        assert planner.calc_xy_heuristic(20, 20, x, y) == \
+            math.hypot(20 - x, 20 - y) * pmap[x, y]
+
+
+def test_potential_field_cache():
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 60)
+    fields = []
+    inst = Instrumentation(on_potential_field=lambda *a: fields.append(a))
+    planner = a_star_modify.AStarPlanner(ox, oy, 1.0, 1.0, inst)
+    path = planner.planning(*start, *goal)
+    pmap = planner.pmap
+    assert not pmap.flags.writeable
+
+    # goals in the same cell share a field, other goals get their own
+    assert planner.load_potential_field(goal[0] + 0.2, goal[1]) is pmap
+    other = planner.load_potential_field(*start)
+    assert other is not pmap and len(fields) == 2
+    assert planner.load_potential_field(*goal) is pmap
+    assert planner.planning(*start, *goal) == path
+    assert len(fields) == 2
+
+    # obstacle changes clear the cache
+    planner.update_obstacle_cells(added=[(5, 5)])
+    assert planner.load_potential_field(*goal) is not pmap
+    assert len(fields) == 3 and len(planner.pmap_cache) == 1
+
+
+def test_potential_field_cache_evicts():
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 30)
+    planner = a_star_modify.AStarPlanner(ox, oy, 1.0, 1.0)
+    n_bytes = planner.load_potential_field(*goal).nbytes
+    planner = a_star_modify.AStarPlanner(ox, oy, 1.0, 1.0,
+                                         pmap_cache_bytes=2 * n_bytes)
+    for gx in (5.0, 10.0, 15.0):
+        planner.load_potential_field(gx, 5.0)
+    assert len(planner.pmap_cache) == 2
+    assert planner.pmap_cache.evictions == 1
+    assert planner.pmap_cache.n_bytes <= 2 * n_bytes
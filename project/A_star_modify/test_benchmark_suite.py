@@ -0,0 +1,60 @@
+"""
+
+Benchmark suite records and their comparison
+
+"""
+
+import copy
+import json
+
+import pytest
+
+import benchmark_suite
+
+
+@pytest.mark.parametrize("planner", sorted(benchmark_suite.PLANNERS))
+def test_run_case(planner):
+    record = benchmark_suite.run_case("rooms", 40, 1.0, planner)
+    assert benchmark_suite.case_key(record) == ("rooms", 40, 1.0, 0, planner)
+    assert record["wall_time"] > 0.0 and record["peak_memory"] > 0
+    assert record["search_time"] > 0.0 and record["expansions"] > 0
+    assert record["path_points"] > 1 and record["path_length"] > 0.0
+    json.dumps(record)
+    if planner.startswith("a_star"):
+        assert record["reached"]
+
+
+def test_run_suite():
+    lines = []
+    records = benchmark_suite.run_suite(
+        kinds=("maze", "main"), sizes=(40,), resolutions=(1.0, 2.0),
+        planners=("a_star.node", "a_star.array"), log=lines.append)
+    assert len(records) == len(lines) == 8
+    node, array = records[:2]
+    # the two search state layouts expand the same nodes
+    assert node["expansions"] == array["expansions"]
+    assert node["path_length"] == array["path_length"]
+
+
+def test_compare(capsys):
+    records = benchmark_suite.run_suite(
+        kinds=("rooms",), sizes=(40,), resolutions=(1.0,),
+        planners=("a_star.node", "a_star.array", "a_star_modify.array"),
+        log=lambda line: None)
+    old = dict(results=records)
+    new = copy.deepcopy(old)
+    assert benchmark_suite.compare(old, new) == []
+
+    slower, changed, path = new["results"]
+    slower["wall_time"] = max(
+        benchmark_suite.MIN_COMPARE_TIME,
+        slower["wall_time"]) * benchmark_suite.REGRESSION_RATIO * 2
+    changed["expansions"] += 1
+    path["path_length"] += 1.0
+    assert benchmark_suite.compare(old, new) == [
+        benchmark_suite.case_key(r) for r in new["results"]]
+    out = capsys.readouterr().out
+    assert "slower" in out and "expansions" in out and "path" in out
+
+    # runs missing from the old results are not compared
+    assert benchmark_suite.compare(dict(results=[]), new) == []
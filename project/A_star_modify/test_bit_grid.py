@@ -0,0 +1,112 @@
+"""
+
+Bit-packed occupancy grid against the bool array it replaces
+
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+import a_star
+import scenarios
+from bit_grid import BitGrid
+
+
+def make_grid(shape, seed=0):
+    array = np.random.default_rng(seed).random(shape) < 0.3
+    return array, BitGrid.from_array(array)
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 5), (8, 8), (13, 7),
+                                   (17, 33), (0, 4)])
+def test_unpacks_to_array(shape):
+    array, grid = make_grid(shape)
+    assert grid.shape == shape and len(grid) == shape[0]
+    assert grid.size == array.size
+    assert grid.nbytes == (array.size + 7) // 8
+    assert np.array_equal(np.asarray(grid), array)
+    assert np.asarray(grid, dtype=np.uint8).dtype == np.uint8
+    assert grid.sum() == array.sum()
+    cells = grid.cells()
+    assert [cells[i] for i in range(array.size)] == \
+        array.reshape(-1).astype(int).tolist()
+
+
+def test_indexing():
+    array, grid = make_grid((13, 7))
+    for ix in range(-13, 13):
+        for iy in range(-7, 7):
+            assert grid[ix, iy] == array[ix, iy]
+        assert np.array_equal(grid[ix], array[ix])
+        assert np.array_equal(grid.row(ix % 13), array[ix])
+    for key in ((13, 0), (0, 7), (-14, 0), (0, -8)):
+        with pytest.raises(IndexError):
+            grid[key]
+    assert isinstance(grid[np.int64(2), np.int32(3)], bool)
+
+
+@pytest.mark.parametrize("kx", [slice(None), slice(2, 9), slice(9, 2),
+                                slice(1, 12, 3), slice(None, None, -1),
+                                slice(11, 1, -4), slice(-5, None)])
+@pytest.mark.parametrize("ky", [slice(None), slice(1, 6), slice(None, None, 2),
+                                3])
+def test_slicing(kx, ky):
+    array, grid = make_grid((13, 7))
+    assert np.array_equal(grid[kx, ky], array[kx, ky])
+    assert np.array_equal(grid[kx], array[kx])
+
+
+def test_rows_and_blocks():
+    array, grid = make_grid((17, 33))
+    for x0, x1 in ((0, 17), (3, 4), (5, 11), (16, 17), (4, 4)):
+        assert np.array_equal(grid.rows(x0, x1), array[x0:x1])
+        assert np.array_equal(grid.block(x0, x1, 5, 20), array[x0:x1, 5:20])
+
+
+def test_assignment():
+    array, grid = make_grid((13, 7))
+    for ix, iy, value in ((0, 0, True), (12, 6, False), (5, 3, True),
+                          (5, 3, False), (-1, -1, True)):
+        grid[ix, iy] = value
+        array[ix, iy] = value
+    assert np.array_equal(np.asarray(grid), array)
+
+    ix, iy = np.array([0, 4, 4, 12]), np.array([1, 2, 2, 6])
+    grid.set_cells(ix, iy)
+    array[ix, iy] = True
+    assert np.array_equal(np.asarray(grid), array)
+    grid.set_cells(ix[:2], iy[:2], False)
+    array[ix[:2], iy[:2]] = False
+    assert np.array_equal(np.asarray(grid), array)
+    with pytest.raises(IndexError):
+        grid[13, 0] = True
+
+
+def test_pickle_and_buffers():
+    array, grid = make_grid((17, 33))
+    copy = pickle.loads(pickle.dumps(grid))
+    assert copy.shape == grid.shape
+    assert np.array_equal(np.asarray(copy), array)
+    copy[0, 0] = not copy[0, 0]
+    assert grid[0, 0] == array[0, 0]  # the copy has bits of its own
+
+    # a grid on a buffer, e.g. shared memory, uses the buffer as is
+    buffer = bytearray(grid.bits.tobytes()) + b"\xff"
+    shared = BitGrid(17, 33, bits=buffer)
+    assert np.array_equal(np.asarray(shared), array)
+    shared[1, 1] = not array[1, 1]
+    assert BitGrid(17, 33, bits=buffer)[1, 1] != array[1, 1]
+
+
+def test_packed_planner():
+    ox, oy, start, goal = scenarios.make_scenario("maze", 60)
+    planner = a_star.AStarPlanner(ox, oy, 0.5, 1.0)
+    packed = a_star.AStarPlanner(ox, oy, 0.5, 1.0, packed=True)
+    assert isinstance(packed.obstacle_map, BitGrid)
+    assert np.array_equal(np.asarray(packed.obstacle_map),
+                          planner.obstacle_map)
+    for mode in ("node", "array", "jps", "bidirectional"):
+        assert packed.planning(*start, *goal, mode=mode) == \
+            planner.planning(*start, *goal, mode=mode)
@@ -0,0 +1,65 @@
+"""
+
+LRU cache bounded by the size of its values
+
+"""
+
+import numpy as np
+
+from caching import LRUCache
+
+
+def test_evicts_least_recently_used_by_size():
+    evicted = []
+    cache = LRUCache(100, on_evict=lambda k, v: evicted.append(k))
+    for key in "abc":
+        cache.put(key, np.zeros(30, dtype=np.uint8))
+    assert cache.n_bytes == 90 and len(cache) == 3
+
+    cache.get("a")  # b is now the least recently used
+    cache.put("d", np.zeros(30, dtype=np.uint8))
+    assert evicted == ["b"]
+    assert cache.keys() == ["c", "a", "d"]
+
+    # a big value evicts as many entries as it needs
+    cache.put("e", np.zeros(70, dtype=np.uint8))
+    assert evicted == ["b", "c", "a"]
+    assert cache.keys() == ["d", "e"]
+    assert cache.n_bytes == 100
+    assert cache.stats() == dict(hits=1, misses=0, evictions=3, entries=2,
+                                 n_bytes=100, max_bytes=100)
+
+
+def test_size_callable():
+    cache = LRUCache(10, size=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "yyyyyy")
+    cache.put("c", "z")
+    assert "a" not in cache and cache.keys() == ["b", "c"]
+    assert cache.n_bytes == 7
+
+
+def test_value_too_big_is_not_stored():
+    evicted = []
+    cache = LRUCache(10, size=len, on_evict=lambda k, v: evicted.append(k))
+    cache.put("a", "xx")
+    cache.put("b", "x" * 11)
+    assert "b" not in cache and cache.keys() == ["a"]
+    assert evicted == []
+
+
+def test_put_replaces_pop_and_clear():
+    evicted = []
+    cache = LRUCache(10, size=len, on_evict=lambda k, v: evicted.append(k))
+    cache.put("a", "xxxx")
+    cache.put("a", "xxxxxx")
+    assert cache.n_bytes == 6 and cache.get("a") == "xxxxxx"
+    assert cache.pop("a") == "xxxxxx" and cache.n_bytes == 0
+    assert cache.pop("a", 1) == 1
+    assert cache.get("a") is None and cache.misses == 1
+
+    cache.put("b", "xx")
+    cache.clear()
+    assert len(cache) == 0 and cache.n_bytes == 0
+    # replacing, popping and clearing do not count as evictions
+    assert evicted == [] and cache.evictions == 0
@@ -0,0 +1,114 @@
+"""
+
+Cost-to-go fields and the queries answered on them
+
+"""
+
+import pytest
+
+import a_star
+import a_star_modify
+from cost_to_go import CostToGoPlanner
+from instrumentation import Instrumentation
+from test_a_star import SCENARIOS, assert_grid_path, make_queries, path_cost
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_perfect_heuristic_expands_one_path(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    ctg = CostToGoPlanner(planner)
+    for start, goal in queries:
+        rx, _ = ctg.planning(*start, *goal, mode="astar")
+        if len(rx) > 1:
+            # every expanded node is on the path, the goal is not counted
+            assert planner.n_expanded == len(rx) - 1
+
+
+def test_astar_stops_its_timers():
+    planner, queries = make_queries("rooms", 0)
+    inst = Instrumentation()
+    planner.instrumentation = inst
+    ctg = CostToGoPlanner(planner)
+    start, goal = queries[0]
+    ctg.planning(*start, *goal, mode="astar")
+    assert not inst._started
+    assert inst.timers["search"] > 0.0 and inst.timers["path"] > 0.0
+    assert inst.counters["expansions"] == planner.n_expanded
+
+
+def test_astar_on_a_star_modify_planner():
+    planner, queries = make_queries("maze", 0)
+    modified = a_star_modify.AStarPlanner.from_obstacle_map(
+        planner.obstacle_map, **planner.map_params())
+    ctg = CostToGoPlanner(modified)
+    start, goal = queries[0]
+    # the field replaces the potential field heuristic, none is computed
+    assert ctg.planning(*start, *goal, mode="astar") == \
+        CostToGoPlanner(planner).planning(*start, *goal, mode="astar")
+    assert modified.pmap is None
+
+
+def test_heuristic_array_mode_only():
+    planner, queries = make_queries("rooms", 0)
+    start, goal = queries[0]
+    with pytest.raises(ValueError):
+        planner.planning(*start, *goal, mode="node",
+                         heuristic=lambda gx, gy, x, y: 0.0)
+    # ties of a given heuristic go to the deeper node, paths stay optimal
+    rx, ry = planner.planning(*start, *goal, mode="array",
+                              heuristic=a_star.AStarPlanner.calc_xy_heuristic)
+    assert path_cost(rx, ry) == pytest.approx(path_cost(
+        *planner.planning(*start, *goal, mode="array")))
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_costs_match_a_star(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    ctg = CostToGoPlanner(planner)
+    for start, goal in queries:
+        ax, ay = planner.planning(*start, *goal, mode="array")
+        for mode in ("walk", "astar"):
+            rx, ry = ctg.planning(*start, *goal, mode=mode)
+            if len(ax) == 1 and start != goal:
+                assert (rx, ry) == (ax, ay)  # no path
+                continue
+            assert_grid_path(planner, rx, ry, start, goal)
+            assert path_cost(rx, ry) == pytest.approx(path_cost(ax, ay))
+
+        goal_cell = (planner.calc_xy_index(goal[0], planner.min_x),
+                     planner.calc_xy_index(goal[1], planner.min_y))
+        start_cell = (planner.calc_xy_index(start[0], planner.min_x),
+                      planner.calc_xy_index(start[1], planner.min_y))
+        if len(ax) > 1:
+            assert ctg.cost_to_go(goal_cell)[start_cell] == \
+                pytest.approx(path_cost(ax, ay))
+
+
+def test_fields_are_cached_per_goal_and_map_version():
+    planner, queries = make_queries("rooms", 1)
+    ctg = CostToGoPlanner(planner)
+    (_, goal), (_, other) = queries[:2]
+    goal = (planner.calc_xy_index(goal[0], planner.min_x),
+            planner.calc_xy_index(goal[1], planner.min_y))
+    other = (planner.calc_xy_index(other[0], planner.min_x),
+             planner.calc_xy_index(other[1], planner.min_y))
+    field = ctg.cost_to_go(goal)
+    assert not field.flags.writeable
+    assert ctg.cost_to_go(goal) is field
+    assert ctg.cost_to_go(other) is not field
+    assert ctg.cache.hits == 1 and len(ctg.cache) == 2
+
+    planner.update_obstacle_cells(added=[(3, 3)])
+    changed = ctg.cost_to_go(goal)
+    assert changed is not field and len(ctg.cache) == 1
+    assert changed[3, 3] == pytest.approx(min(
+        move_cost + changed[3 + dx, 3 + dy]
+        for dx, dy, move_cost in planner.motion
+        if not planner.obstacle_map[3 + dx, 3 + dy]))
+
+
+def test_unknown_mode():
+    planner, queries = make_queries("rooms", 0)
+    with pytest.raises(ValueError):
+        CostToGoPlanner(planner).planning(*queries[0][0], *queries[0][1],
+                                          mode="jps")
@@ -0,0 +1,71 @@
+"""
+
+D* Lite replanning against A* from scratch on random maps
+
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+import a_star
+from d_star_lite import DStarLitePlanner
+
+
+def make_random_map(rng, size=40, n_points=300):
+    ox, oy = [], []
+    for i in range(size + 1):
+        ox += [i, i, 0.0, size]
+        oy += [0.0, size, i, i]
+    ox += [rng.uniform(0, size) for _ in range(n_points)]
+    oy += [rng.uniform(0, size) for _ in range(n_points)]
+    return ox, oy
+
+
+def path_cost(rx, ry):
+    return sum(math.hypot(x1 - x0, y1 - y0)
+               for x0, y0, x1, y1 in zip(rx, ry, rx[1:], ry[1:]))
+
+
+# seeds 69, 107 and 128 used to stop the search one float ulp early,
+# leaving wrong costs or a path extraction that never ended
+@pytest.mark.parametrize("seed", range(150))
+def test_replan_matches_a_star(seed):
+    rng = random.Random(seed)
+    ox, oy = make_random_map(rng)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 0.5)
+    d_star = DStarLitePlanner(planner)
+    free = [tuple(c) for c in np.argwhere(~planner.obstacle_map)]
+    (sx, sy), (gx, gy) = rng.sample(free, 2)
+    start = (planner.calc_grid_position(sx, planner.min_x),
+             planner.calc_grid_position(sy, planner.min_y))
+    goal = (planner.calc_grid_position(gx, planner.min_x),
+            planner.calc_grid_position(gy, planner.min_y))
+
+    for _ in range(10):
+        rx, ry = d_star.planning(*start, *goal)
+        ax, ay = planner.planning(*start, *goal, mode="array")
+        assert (rx[0], ry[0]) == (ax[0], ay[0])
+        assert (rx[-1], ry[-1]) == (ax[-1], ay[-1])
+        assert path_cost(rx, ry) == pytest.approx(path_cost(ax, ay))
+
+        cells = [(ix, iy) for ix in range(1, planner.x_width - 1)
+                 for iy in range(1, planner.y_width - 1)
+                 if (ix, iy) not in ((sx, sy), (gx, gy))]
+        changed = rng.sample(cells, 20)
+        d_star.update_obstacles(
+            added=[c for c in changed if not planner.obstacle_map[c]],
+            removed=[c for c in changed if planner.obstacle_map[c]])
+
+
+def test_final_path_raises_on_inconsistent_g():
+    rng = random.Random(0)
+    planner = a_star.AStarPlanner(*make_random_map(rng, n_points=0), 1.0, 0.5)
+    d_star = DStarLitePlanner(planner)
+    d_star.planning(5.0, 5.0, 30.0, 30.0)
+    # two cells pointing at each other, as early stopped searches left them
+    d_star.g[(6, 6)] = d_star.g[(5, 5)] = 0.0
+    with pytest.raises(RuntimeError):
+        d_star.calc_final_path()
@@ -0,0 +1,98 @@
+"""
+
+Flow fields against A*, and repaired ones against fields built anew
+
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from flow_field import FlowField, NO_MOVE
+from test_a_star import SCENARIOS, assert_grid_path, make_queries, path_cost
+
+
+def assert_same_field(field, fresh):
+    assert np.array_equal(np.isinf(field.cost), np.isinf(fresh.cost))
+    finite = np.isfinite(fresh.cost)
+    np.testing.assert_allclose(field.cost[finite], fresh.cost[finite],
+                               rtol=0.0, atol=1e-9)
+    assert np.array_equal(field.free, fresh.free)
+    # every direction is a move along which the cost to go drops by the
+    # cost of the move
+    cells = np.flatnonzero(finite & field.free)
+    cells = cells[cells != field.goal_cell]
+    k = field.direction[cells]
+    assert (k != NO_MOVE).all()
+    x, y = np.divmod(cells, field.planner.y_width)
+    to = (x + field.dx[k]) * field.planner.y_width + y + field.dy[k]
+    assert field.free[to].all()
+    np.testing.assert_allclose(field.cost[to] + field.move_cost[k],
+                               field.cost[cells], rtol=0.0, atol=1e-9)
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_paths_match_a_star(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    goal = queries[0][1]
+    field = FlowField(planner, *goal)
+    for start, _ in queries:
+        rx, ry = field.planning(*start)
+        assert_grid_path(planner, rx, ry, start, goal)
+        best = path_cost(*planner.planning(*start, *goal, mode="array"))
+        assert path_cost(rx, ry) == pytest.approx(best, abs=1e-9)
+        cell = planner.calc_xy_index(start[0], planner.min_x) * \
+            planner.y_width + planner.calc_xy_index(start[1], planner.min_y)
+        assert field.cost[cell] == pytest.approx(best, abs=1e-9)
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_update_region_matches_fresh_field(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    goal = queries[0][1]
+    field = FlowField(planner, *goal)
+    rng = random.Random(seed)
+    for i in range(6):
+        w = rng.randrange(2, 15)
+        x0 = rng.randrange(planner.x_width - w)
+        y0 = rng.randrange(planner.y_width - w)
+        added, removed = [], []
+        for ix in range(x0, x0 + w):
+            for iy in range(y0, y0 + w):
+                if (ix, iy) != field.goal and rng.random() < 0.3:
+                    (removed if planner.obstacle_map[ix, iy]
+                     else added).append((ix, iy))
+        # only added, then both
+        planner.update_obstacle_cells(added, removed if i % 2 else [])
+        field.update_region(x0, x0 + w, y0, y0 + w)
+        assert field.map_version == planner.map_version
+        assert_same_field(field, FlowField(planner, *goal))
+
+
+def test_goal_blocked_and_freed():
+    planner, [(start, goal)] = make_queries("rooms", 0, n=0)
+    field = FlowField(planner, *goal)
+    gx, gy = field.goal
+    planner.update_obstacle_cells(added=[field.goal])
+    field.update_region(gx, gx + 1, gy, gy + 1)
+    assert np.isinf(field.cost).sum() == field.cost.size - 1
+    assert field.planning(*start) == ([goal[0]], [goal[1]])
+
+    planner.update_obstacle_cells(removed=[field.goal])
+    field.update_region(gx, gx + 1, gy, gy + 1)
+    assert_same_field(field, FlowField(planner, *goal))
+    assert field.update_region(-5, 0, 3, 8) == 0
+
+
+def test_agents_reach_the_goal():
+    planner, [(start, goal)] = make_queries("maze", 1, n=0)
+    field = FlowField(planner, *goal)
+    reachable = np.flatnonzero(np.isfinite(field.cost) & field.free)
+    ix, iy = np.divmod(reachable, planner.y_width)
+    for _ in range(planner.x_width * planner.y_width):
+        nx, ny = field.next_cells(ix, iy)
+        if np.array_equal(nx, ix) and np.array_equal(ny, iy):
+            break
+        ix, iy = nx, ny
+    assert (ix == field.goal[0]).all() and (iy == field.goal[1]).all()
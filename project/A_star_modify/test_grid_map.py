@@ -0,0 +1,204 @@
+"""
+
+Grid map helpers: obstacle maps against the per-cell loop, map files
+and obstacle point loaders
+
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+import a_star
+import grid_map
+import scenarios
+
+
+def obstacle_map_loop(ox, oy, resolution, rr, min_x, min_y, x_width,
+                      y_width):
+    # the obstacle map AStarPlanner.calc_obstacle_map used to build, every
+    # cell tested against every point
+    obstacle_map = [[False for _ in range(y_width)] for _ in range(x_width)]
+    for ix in range(x_width):
+        x = ix * resolution + min_x
+        for iy in range(y_width):
+            y = iy * resolution + min_y
+            for iox, ioy in zip(ox, oy):
+                if math.hypot(iox - x, ioy - y) <= rr:
+                    obstacle_map[ix][iy] = True
+                    break
+    return np.array(obstacle_map, dtype=bool).reshape(x_width, y_width)
+
+
+@pytest.mark.parametrize("resolution, rr", [(1.0, 1.0), (0.5, 1.0),
+                                            (0.7, 2.3), (2.0, 0.5)])
+def test_obstacle_map_matches_loop(resolution, rr):
+    rng = random.Random(0)
+    ox = [rng.uniform(-5, 25) for _ in range(80)]
+    oy = [rng.uniform(-5, 25) for _ in range(80)]
+    min_x, min_y = -3, -2
+    x_width, y_width = round(24 / resolution), round(22 / resolution)
+    expected = obstacle_map_loop(ox, oy, resolution, rr, min_x, min_y,
+                                 x_width, y_width)
+    obstacle_map = grid_map.build_obstacle_map(
+        ox, oy, resolution, rr, min_x, min_y, x_width, y_width)
+    assert obstacle_map.dtype == bool
+    assert np.array_equal(obstacle_map, expected)
+
+
+def test_planner_map_matches_loop():
+    ox, oy, _, _ = scenarios.make_scenario("rooms", 40)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.5)
+    expected = obstacle_map_loop(ox, oy, 1.0, 1.5, planner.min_x,
+                                 planner.min_y, planner.x_width,
+                                 planner.y_width)
+    assert np.array_equal(planner.obstacle_map, expected)
+
+
+def test_obstacle_map_chunks(monkeypatch):
+    rng = random.Random(1)
+    ox = np.array([rng.uniform(0, 30) for _ in range(500)])
+    oy = np.array([rng.uniform(0, 30) for _ in range(500)])
+    expected = grid_map.build_obstacle_map(ox, oy, 0.5, 1.0, 0, 0, 60, 60)
+    monkeypatch.setattr(grid_map, "CHUNK_CELLS", 64)
+    assert np.array_equal(
+        grid_map.build_obstacle_map(ox, oy, 0.5, 1.0, 0, 0, 60, 60),
+        expected)
+
+
+def test_obstacle_map_without_points():
+    obstacle_map = grid_map.build_obstacle_map([], [], 1.0, 1.0, 0, 0, 5, 4)
+    assert obstacle_map.shape == (5, 4)
+    assert not obstacle_map.any()
+
+
+def test_obstacle_map_file_round_trip(tmp_path):
+    obstacle_map = np.random.default_rng(0).random((13, 7)) < 0.3
+    path = str(tmp_path / "map.grid")
+    grid_map.save_obstacle_map(path, obstacle_map, 0.5, 1.5, -2, -3, 4, 1)
+    loaded, params = grid_map.load_obstacle_map(path)
+    assert isinstance(loaded, np.memmap)
+    assert np.array_equal(loaded, obstacle_map)
+    assert params == dict(resolution=0.5, rr=1.5, min_x=-2, min_y=-3,
+                          max_x=4, max_y=1)
+
+    # copy-on-write, the file keeps the saved map
+    loaded[0, 0] = not loaded[0, 0]
+    assert np.array_equal(grid_map.load_obstacle_map(path)[0], obstacle_map)
+
+
+def test_obstacle_map_file_rejects_other_files(tmp_path):
+    path = tmp_path / "map.grid"
+    path.write_bytes(b"AGRD")
+    with pytest.raises(ValueError):
+        grid_map.load_obstacle_map(str(path))
+    path.write_bytes(b"\0" * grid_map.MAP_FILE_HEADER_SIZE)
+    with pytest.raises(ValueError):
+        grid_map.load_obstacle_map(str(path))
+
+
+def test_obstacle_map_key():
+    key = grid_map.obstacle_map_key([0.0, 1.0], [2.0, 3.0], 0.5, 1.0)
+    assert key == grid_map.obstacle_map_key((0, 1), (2, 3), 0.5, 1.0)
+    assert key != grid_map.obstacle_map_key([0.0, 1.0], [2.0, 3.0], 0.5, 2.0)
+    assert key != grid_map.obstacle_map_key([0.0, 1.0], [2.0, 3.0], 1.0, 1.0)
+    assert key != grid_map.obstacle_map_key([0.0, 1.5], [2.0, 3.0], 0.5, 1.0)
+
+
+def test_from_cache_loads_saved_map(tmp_path, monkeypatch):
+    ox, oy, _, _ = scenarios.make_scenario("maze", 40)
+    cold = a_star.AStarPlanner.from_cache(ox, oy, 1.0, 1.0, str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+
+    def build(*args, **kwargs):
+        raise AssertionError("warm cache built the obstacle map")
+
+    monkeypatch.setattr(grid_map, "build_obstacle_map", build)
+    warm = a_star.AStarPlanner.from_cache(ox, oy, 1.0, 1.0, str(tmp_path))
+    assert np.array_equal(warm.obstacle_map, cold.obstacle_map)
+    assert (warm.x_width, warm.y_width) == (cold.x_width, cold.y_width)
+
+
+def make_points(n=300, seed=0):
+    # positions on a 0.25 m lattice, exact in float32 point files
+    rng = random.Random(seed)
+    return ([rng.randrange(160) * 0.25 for _ in range(n)],
+            [rng.randrange(120) * 0.25 for _ in range(n)])
+
+
+@pytest.mark.parametrize("dtype", ("<f4", "<f8"))
+def test_point_file_round_trip(tmp_path, dtype):
+    ox, oy = make_points()
+    path = str(tmp_path / "points.bin")
+    grid_map.save_point_file(path, ox, oy, dtype)
+    px, py = grid_map.load_point_file(path, dtype)
+    assert isinstance(px.base, np.memmap) and not px.flags.writeable
+    assert px.tolist() == ox and py.tolist() == oy
+
+
+def test_point_file_columns(tmp_path):
+    ox, oy = make_points()
+    points = np.column_stack((ox, oy, np.ones(len(ox)), np.arange(len(ox))))
+    raw = str(tmp_path / "points.bin")
+    points.astype("<f4").tofile(raw)
+    npy = str(tmp_path / "points.npy")
+    np.save(npy, points)
+    for path, dtype in ((raw, "<f4"), (npy, None)):
+        px, py = grid_map.load_point_file(path, dtype, columns=4)
+        assert px.tolist() == ox and py.tolist() == oy
+
+    with pytest.raises(ValueError):
+        grid_map.load_point_file(raw, "<f4", columns=7)
+    empty = tmp_path / "empty.bin"
+    empty.write_bytes(b"")
+    px, py = grid_map.load_point_file(str(empty))
+    assert px.size == py.size == 0
+
+
+def test_planner_from_point_file(tmp_path, monkeypatch):
+    ox, oy = make_points(n=2000)
+    path = str(tmp_path / "points.bin")
+    grid_map.save_point_file(path, ox, oy)
+    monkeypatch.setattr(grid_map, "CHUNK_CELLS", 1000)
+    planner = a_star.AStarPlanner.from_point_file(path, 0.5, 1.0)
+    expected = a_star.AStarPlanner(ox, oy, 0.5, 1.0)
+    assert planner.map_params() == expected.map_params()
+    assert np.array_equal(planner.obstacle_map, expected.obstacle_map)
+
+
+def test_occupancy_image():
+    image = np.full((4, 6), 255, dtype=np.uint8)
+    image[0, 1] = 0  # top row, highest y
+    image[3, 4] = 40
+    image[2, 2] = 200  # too light to be an obstacle
+    ox, oy = grid_map.load_occupancy_image(image, 0.5, origin=(1.0, -1.0))
+    assert sorted(zip(ox.tolist(), oy.tolist())) == [(1.75, 0.75),
+                                                     (3.25, -0.75)]
+
+    # colors are averaged, alpha ignored, float images are in [0, 1]
+    rgba = np.ones((4, 6, 4))
+    rgba[0, 1, :3] = 0.0
+    rgba[3, 4, :3] = (0.1, 0.2, 0.1)
+    rgba[2, 2, 3] = 0.0
+    ox, oy = grid_map.load_occupancy_image(rgba, 0.5, origin=(1.0, -1.0))
+    assert sorted(zip(ox.tolist(), oy.tolist())) == [(1.75, 0.75),
+                                                     (3.25, -0.75)]
+
+
+def test_planner_from_occupancy_image(tmp_path):
+    import matplotlib.image
+
+    rng = np.random.default_rng(0)
+    image = np.where(rng.random((60, 80)) < 0.05, 0, 255).astype(np.uint8)
+    image[0, :] = image[-1, :] = image[:, 0] = image[:, -1] = 0
+    path = str(tmp_path / "map.png")
+    matplotlib.image.imsave(path, image, cmap="gray", vmin=0, vmax=255)
+
+    planner = a_star.AStarPlanner.from_occupancy_image(path, 0.5, 0.5, 0.5)
+    row, col = np.nonzero(image == 0)
+    ox, oy = (col + 0.5) * 0.5, (60 - row - 0.5) * 0.5
+    expected = a_star.AStarPlanner(ox, oy, 0.5, 0.5)
+    assert planner.map_params() == expected.map_params()
+    assert np.array_equal(planner.obstacle_map, expected.obstacle_map)
@@ -0,0 +1,79 @@
+"""
+
+HPA* abstract graph and paths against A*
+
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from hpa_star import HPAStarPlanner
+from test_a_star import SCENARIOS, assert_grid_path, make_queries, path_cost
+
+
+def abstract_graph(hpa):
+    # the graph without the empty lists and dicts updates leave behind
+    entrances = {k: sorted(v) for k, v in hpa.entrances.items() if v}
+    inter_edges = {u: edges for u, edges in hpa.inter_edges.items() if edges}
+    return entrances, inter_edges, hpa.intra_edges
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_paths_match_a_star(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    hpa = HPAStarPlanner(planner, cluster_size=10)
+    for start, goal in queries:
+        ax, ay = planner.planning(*start, *goal, mode="array")
+        rx, ry = hpa.planning(*start, *goal)
+        if len(ax) == 1 and start != goal:
+            assert (rx, ry) == (ax, ay)  # no path
+            continue
+        assert_grid_path(planner, rx, ry, start, goal)
+        # near optimal, only the border crossings are fixed
+        assert path_cost(ax, ay) - 1e-9 <= path_cost(rx, ry) <= \
+            1.3 * path_cost(ax, ay) + 2.0
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_update_obstacles_matches_rebuild(seed):
+    rng = random.Random(seed)
+    planner, queries = make_queries("rooms", seed)
+    hpa = HPAStarPlanner(planner, cluster_size=8)
+    for _ in range(5):
+        # a block of cells, some across cluster borders and corners
+        x0 = rng.randrange(planner.x_width - 4)
+        y0 = rng.randrange(planner.y_width - 4)
+        cells = [(x, y) for x in range(x0, x0 + rng.randint(1, 4))
+                 for y in range(y0, y0 + rng.randint(1, 4))]
+        hpa.update_obstacles(
+            added=[c for c in cells if not planner.obstacle_map[c]],
+            removed=[c for c in cells if planner.obstacle_map[c]])
+
+        rebuilt = HPAStarPlanner(planner, cluster_size=8)
+        assert abstract_graph(hpa) == abstract_graph(rebuilt)
+        for start, goal in queries:
+            assert hpa.planning(*start, *goal) == \
+                rebuilt.planning(*start, *goal)
+
+
+def test_update_obstacles_opens_and_closes_a_route():
+    planner, _ = make_queries("maze", 0)
+    hpa = HPAStarPlanner(planner, cluster_size=8)
+    free = np.argwhere(~planner.obstacle_map).tolist()
+    (sx, sy), (gx, gy) = free[0], free[-1]
+    start = (planner.calc_grid_position(sx, planner.min_x),
+             planner.calc_grid_position(sy, planner.min_y))
+    goal = (planner.calc_grid_position(gx, planner.min_x),
+            planner.calc_grid_position(gy, planner.min_y))
+    assert len(hpa.planning(*start, *goal)[0]) > 1
+
+    # wall the goal in, then open it again
+    ring = [(gx + dx, gy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            if (dx or dy) and not planner.obstacle_map[gx + dx, gy + dy]]
+    hpa.update_obstacles(added=ring)
+    assert hpa.planning(*start, *goal) == ([goal[0]], [goal[1]])
+    hpa.update_obstacles(removed=ring)
+    rx, ry = hpa.planning(*start, *goal)
+    assert_grid_path(planner, rx, ry, start, goal)
@@ -0,0 +1,95 @@
+"""
+
+Instrumentation hooks and headless planning
+
+"""
+
+import pytest
+
+import a_star
+import potential_field_planning
+import scenarios
+from instrumentation import COUNTERS, TIMERS, Instrumentation
+
+MODES = ("node", "array", "jps", "bidirectional")
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_headless_paths_match(mode):
+    ox, oy, start, goal = scenarios.make_scenario("maze", 60)
+    headless = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    expanded = []
+    inst = Instrumentation(on_expand=lambda ix, iy: expanded.append((ix, iy)))
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0, inst)
+
+    assert planner.planning(*start, *goal, mode=mode) == \
+        headless.planning(*start, *goal, mode=mode)
+    assert planner.n_expanded == headless.n_expanded
+    assert inst.counters["expansions"] == planner.n_expanded
+    assert inst.counters["pushes"] > 0
+    assert expanded
+    for name in TIMERS:
+        assert inst.timers[name] > 0.0
+    assert not inst._started  # every timer started was stopped
+
+
+@pytest.mark.parametrize("mode", ("node", "array"))
+def test_on_expand_order(mode):
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 40)
+    expanded = {}
+    for m in ("node", mode):
+        cells = expanded[m] = []
+        inst = Instrumentation(on_expand=lambda ix, iy: cells.append((ix, iy)))
+        planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0, inst)
+        planner.planning(*start, *goal, mode=m)
+        # the goal is reported when it is reached, it is not counted
+        assert len(cells) == inst.counters["expansions"] + 1
+    assert expanded[mode] == expanded["node"]
+
+
+def test_counters_add_up():
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 40)
+    inst = Instrumentation()
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0, inst)
+    planner.planning(*start, *goal, mode="array")
+    first = dict(inst.counters)
+    planner.planning(*start, *goal, mode="array")
+    assert inst.counters == {name: 2 * n for name, n in first.items()}
+    assert first["pushes"] + first["rejections"] == \
+        first["expansions"] * len(planner.motion)
+
+    inst.reset()
+    assert inst.counters == dict.fromkeys(COUNTERS, 0)
+    assert inst.timers == dict.fromkeys(TIMERS, 0.0)
+
+
+def test_timer_not_started():
+    inst = Instrumentation()
+    inst.stop("search")
+    assert inst.timers["search"] == 0.0
+    inst.start("custom")
+    inst.stop("custom")
+    assert inst.timers["custom"] >= 0.0
+
+
+def test_log(capsys):
+    ox, oy, start, goal = scenarios.make_scenario("rooms", 40)
+    a_star.AStarPlanner(ox, oy, 1.0, 1.0).planning(*start, *goal)
+    assert capsys.readouterr().out == ""
+    a_star.AStarPlanner(ox, oy, 1.0, 1.0,
+                        Instrumentation(verbose=True)).planning(*start, *goal)
+    assert "Find goal" in capsys.readouterr().out
+
+
+def test_potential_field_planning_hooks():
+    ox, oy = [15.0, 5.0, 20.0, 25.0], [25.0, 15.0, 26.0, 25.0]
+    steps, fields = [], []
+    inst = Instrumentation(on_expand=lambda ix, iy: steps.append((ix, iy)),
+                           on_potential_field=lambda *a: fields.append(a))
+    rx, ry = potential_field_planning.potential_field_planning(
+        0.0, 10.0, 30.0, 30.0, ox, oy, 0.5, 5.0, inst)
+    assert (rx, ry) == potential_field_planning.potential_field_planning(
+        0.0, 10.0, 30.0, 30.0, ox, oy, 0.5, 5.0)
+    assert len(fields) == 1
+    assert len(steps) == inst.counters["expansions"] == len(rx) - 1
+    assert inst.timers["map_build"] > 0.0 and inst.timers["search"] > 0.0
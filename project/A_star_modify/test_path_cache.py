@@ -0,0 +1,152 @@
+"""
+
+Path cache against the planner behind it
+
+"""
+
+import numpy as np
+import pytest
+
+import a_star
+from path_cache import PATH_CELL_BYTES, PathCache
+from test_a_star import SCENARIOS, assert_grid_path, make_queries, path_cost
+
+
+def position(planner, cell):
+    return (planner.calc_grid_position(cell[0], planner.min_x),
+            planner.calc_grid_position(cell[1], planner.min_y))
+
+
+def path_cells(planner, rx, ry):
+    return [(planner.calc_xy_index(x, planner.min_x),
+             planner.calc_xy_index(y, planner.min_y)) for x, y in zip(rx, ry)]
+
+
+def indexed(cache):
+    # (key, position) pairs of the cell index
+    return sorted((key, i) for keys in cache.by_cell.values()
+                  for key, i in keys.items())
+
+
+@pytest.mark.parametrize("kind, seed", SCENARIOS)
+def test_hits_and_subpath_hits(kind, seed):
+    planner, queries = make_queries(kind, seed)
+    cache = PathCache(planner)
+    for start, goal in queries:
+        path = planner.planning(*start, *goal, mode="array")
+        assert cache.planning(*start, *goal) == path
+        assert cache.planning(*start, *goal) == path
+        # every start on the path gets the rest of it
+        cells = path_cells(planner, *path)
+        for i in range(1, len(cells) - 1, 5):
+            rx, ry = cache.planning(*position(planner, cells[i]), *goal)
+            assert (rx, ry) == (path[0][:i + 1], path[1][:i + 1])
+            best = planner.planning(*position(planner, cells[i]), *goal,
+                                    mode="array")
+            assert path_cost(rx, ry) == pytest.approx(path_cost(*best),
+                                                      abs=1e-9)
+    stats = cache.stats()
+    assert stats["misses"] == len(queries) and stats["hits"] == len(queries)
+    assert stats["queries"] == \
+        stats["hits"] + stats["subpath_hits"] + stats["misses"]
+    assert stats["entries"] == len(queries)
+
+
+def test_jps_subpaths_between_jump_points():
+    planner, [(start, goal)] = make_queries("rooms", 0, n=0)
+    cache = PathCache(planner, mode="jps")
+    cache.planning(*start, *goal)
+    key = tuple(path_cells(planner, (start[0], goal[0]), (start[1], goal[1])))
+    cells = cache.paths.get(key)[2]
+    # every step of the path is indexed, not only the jump points
+    assert len(cells) == len(planner.planning(*start, *goal,
+                                              mode="array")[0])
+    for c in cells[1:-1]:
+        cell = divmod(c, planner.y_width)
+        rx, ry = cache.planning(*position(planner, cell), *goal)
+        assert_grid_path(planner, rx, ry, position(planner, cell), goal)
+        assert path_cost(rx, ry) == pytest.approx(path_cost(
+            *planner.planning(*position(planner, cell), *goal,
+                              mode="array")), abs=1e-9)
+    assert cache.subpath_hits == len(cells) - 2 and cache.misses == 1
+
+
+def test_subpaths_off():
+    planner, [(start, goal)] = make_queries("maze", 0, n=0)
+    cache = PathCache(planner, reuse_subpaths=False)
+    rx, ry = cache.planning(*start, *goal)
+    cache.planning(rx[1], ry[1], *goal)
+    assert cache.subpath_hits == 0 and cache.misses == 2
+
+
+def test_added_cells_drop_paths_through_them():
+    planner, queries = make_queries("random", 1)
+    fresh = a_star.AStarPlanner.from_obstacle_map(
+        planner.obstacle_map.copy(), **planner.map_params())
+    cache = PathCache(planner)
+    paths = [cache.planning(*start, *goal) for start, goal in queries]
+    blocked = path_cells(planner, *paths[0])[len(paths[0][0]) // 2]
+    through = [i for i, path in enumerate(paths)
+               if blocked in path_cells(planner, *path)]
+    cache.update_obstacle_cells(added=[blocked])
+    fresh.update_obstacle_cells(added=[blocked])
+    assert cache.invalidations == len(through)
+    assert len(cache.paths) == len(queries) - len(through)
+    assert not any(key in cache.paths for key in
+                   cache.by_cell.get(blocked[0] * planner.y_width +
+                                     blocked[1], {}))
+    assert indexed(cache) == sorted(
+        (key, i) for key in cache.paths.keys()
+        for i in range(len(cache.paths.get(key)[2])))
+
+    hits = cache.hits
+    for start, goal in queries:
+        assert path_cost(*cache.planning(*start, *goal)) == pytest.approx(
+            path_cost(*fresh.planning(*start, *goal, mode="array")),
+            abs=1e-9)
+    assert cache.hits == hits + len(queries) - len(through)
+
+
+def test_removed_cells_clear_the_cache():
+    planner, queries = make_queries("rooms", 2)
+    cache = PathCache(planner)
+    for start, goal in queries:
+        cache.planning(*start, *goal)
+    wall = tuple(np.argwhere(planner.obstacle_map)[0].tolist())
+    cache.update_obstacle_cells(removed=[wall])
+    assert len(cache.paths) == 0 and cache.by_cell == {}
+    assert cache.invalidations == len(queries)
+    assert not planner.obstacle_map[wall]
+    assert cache.cache_version == planner.map_version
+
+    # changes made to the planner directly clear the cache too
+    cache.planning(*queries[0][0], *queries[0][1])
+    planner.update_obstacle_cells(added=[wall])
+    cache.planning(*queries[1][0], *queries[1][1])
+    assert len(cache.paths) == 1 and cache.misses == len(queries) + 2
+
+
+def test_eviction_keeps_index():
+    planner, queries = make_queries("maze", 1, n=10)
+    lengths = [len(planner.planning(*start, *goal, mode="array")[0])
+               for start, goal in queries]
+    cache = PathCache(planner, max_bytes=2 * max(lengths) * PATH_CELL_BYTES)
+    for start, goal in queries:
+        cache.planning(*start, *goal)
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["entries"] + stats["evictions"] == len(queries)
+    assert stats["n_bytes"] <= stats["max_bytes"]
+    assert indexed(cache) == sorted(
+        (key, i) for key in cache.paths.keys()
+        for i in range(len(cache.paths.get(key)[2])))
+
+
+def test_no_path_is_cached():
+    planner, [(start, goal)] = make_queries("rooms", 0, n=0)
+    planner.update_obstacle_cells(added=[
+        (ix, iy) for ix in range(planner.x_width) for iy in (19, 20)])
+    cache = PathCache(planner)
+    assert cache.planning(5.0, 5.0, 5.0, 40.0) == ([5.0], [40.0])
+    assert cache.planning(5.0, 5.0, 5.0, 40.0) == ([5.0], [40.0])
+    assert cache.hits == 1 and cache.by_cell == {}
@@ -0,0 +1,192 @@
+"""
+
+Planning server: searches against A*, coalescing, back pressure and
+unloading maps
+
+"""
+
+import asyncio
+import json
+
+import a_star
+import scenarios
+from planning_server import PlanningClient, PlanningServer, SWEEP_TIMEOUT
+
+
+def run(test, **kwargs):
+    # runs test(server, ox, oy, start, goal) on a server with a maze loaded
+    async def main():
+        ox, oy, start, goal = scenarios.make_scenario("maze", 100, 1)
+        async with PlanningServer(workers=2, **kwargs) as server:
+            await request(server, "load_map", map="m", ox=ox, oy=oy,
+                          resolution=0.5, rr=1.0)
+            await test(server, ox, oy, start, goal)
+    asyncio.run(main())
+
+
+async def request(server, op, **fields):
+    return await server.handle_request(json.dumps(dict(fields, op=op,
+                                                       id=op)))
+
+
+def goals(planner, n):
+    # n free cells, spread over the map
+    cells = [(ix, iy) for ix in range(0, planner.x_width, 7)
+             for iy in range(0, planner.y_width, 7)
+             if not planner.obstacle_map[ix, iy]]
+    return [[planner.calc_grid_position(ix, planner.min_x),
+             planner.calc_grid_position(iy, planner.min_y)]
+            for ix, iy in cells[:n]]
+
+
+def test_plan_matches_a_star():
+    async def test(server, ox, oy, start, goal):
+        planner = a_star.AStarPlanner(ox, oy, 0.5, 1.0)
+        for mode in a_star.PLANNING_MODES[:-1]:
+            response = await request(server, "plan", map="m", start=start,
+                                     goal=goal, mode=mode)
+            assert response["ok"] and response["id"] == "plan"
+            assert (response["rx"], response["ry"]) == \
+                planner.planning(*start, *goal, mode=mode)
+            assert response["expanded"] == planner.n_expanded
+        metrics = await request(server, "metrics")
+        assert metrics["completed"] == 4 and metrics["queue_depth"] == 0
+        assert metrics["maps"] == {"m": 1}
+    run(test)
+
+
+def test_identical_requests_share_a_search():
+    async def test(server, ox, oy, start, goal):
+        responses = await asyncio.gather(*(
+            request(server, "plan", map="m", start=start, goal=goal,
+                    mode="node") for _ in range(8)))
+        assert all(r["ok"] and r["rx"] == responses[0]["rx"]
+                   for r in responses)
+        metrics = await request(server, "metrics")
+        assert metrics["plans"] == 8 and metrics["coalesced"] == 7
+        assert metrics["max_queue_depth"] == 1
+        assert metrics["completed"] == 8 and metrics["in_flight"] == 0
+
+        # another mode is another search
+        await asyncio.gather(*(
+            request(server, "plan", map="m", start=start, goal=goal,
+                    mode=mode) for mode in ("node", "array")))
+        assert (await request(server, "metrics"))["coalesced"] == 7
+    run(test)
+
+
+def test_busy_beyond_max_pending():
+    async def test(server, ox, oy, start, goal):
+        planner = a_star.AStarPlanner(ox, oy, 0.5, 1.0)
+        responses = await asyncio.gather(*(
+            request(server, "plan", map="m", start=start, goal=g,
+                    mode="node") for g in goals(planner, 6)))
+        assert [r["ok"] for r in responses] == [True] * 2 + [False] * 4
+        assert all(r["error"] == "busy" and r["queue_depth"] == 2
+                   for r in responses[2:])
+        metrics = await request(server, "metrics")
+        assert metrics["rejected"] == 4 and metrics["completed"] == 2
+        assert metrics["max_queue_depth"] == 2
+
+        # once the queue drains searches are taken again
+        response = await request(server, "plan", map="m", start=start,
+                                 goal=goal)
+        assert response["ok"]
+    run(test, max_pending=2)
+
+
+def test_bad_requests():
+    async def test(server, ox, oy, start, goal):
+        for op, fields, error in (
+                ("plan", dict(map="x", start=start, goal=goal),
+                 "unknown map: x"),
+                ("plan", dict(map="m", start=start, goal=goal, mode="bad"),
+                 "unknown planning mode: bad"),
+                ("plan", dict(map="m", start=start), "missing field: 'goal'"),
+                ("unload_map", dict(map="x"), "unknown map: x"),
+                ("nope", {}, "unknown op: nope")):
+            response = await request(server, op, **fields)
+            assert response == dict(ok=False, error=error, id=op)
+        # a bad mode is answered before a search is queued
+        metrics = await request(server, "metrics")
+        assert metrics["max_queue_depth"] == 0 and metrics["failed"] == 0
+        assert (await server.handle_request(b"{"))["ok"] is False
+    run(test)
+
+
+def test_unload_map():
+    async def test(server, ox, oy, start, goal):
+        loaded = server.maps["m"]
+        # a search in flight keeps the shared memory until it finishes
+        search = asyncio.ensure_future(request(
+            server, "plan", map="m", start=start, goal=goal, mode="node"))
+        await asyncio.sleep(0)
+        assert (await request(server, "unload_map", map="m"))["ok"]
+        assert loaded.shm is not None and server.maps == {}
+        response = await request(server, "plan", map="m", start=start,
+                                 goal=goal)
+        assert response["error"] == "unknown map: m"
+        assert (await search)["ok"]
+        assert loaded.shm is None and server.shared == {}
+        assert (await request(server, "metrics"))["maps"] == {}
+
+        # reloading under the same name gives a new version
+        response = await request(server, "load_map", map="m", ox=ox, oy=oy,
+                                 resolution=1.0, rr=1.0)
+        assert response["version"] == 2 and len(server.shared) == 1
+    run(test)
+
+
+def test_sweep_does_not_wait_for_busy_workers():
+    async def test(server, ox, oy, start, goal):
+        await request(server, "load_map", map="n", ox=ox, oy=oy,
+                      resolution=1.0, rr=1.0)
+        # a map never searched is not mapped by any worker
+        await request(server, "unload_map", map="n")
+        assert server.sweeping is None
+
+        await request(server, "load_map", map="n", ox=ox, oy=oy,
+                      resolution=1.0, rr=1.0)
+        # both workers started and holding the map
+        responses = await asyncio.gather(*(
+            request(server, "plan", map="n", start=start, goal=goal,
+                    mode=mode) for mode in ("node", "array")))
+        assert all(r["ok"] for r in responses)
+        # the idle worker is swept while the other one searches
+        search = asyncio.ensure_future(request(
+            server, "plan", map="m", start=start, goal=goal, mode="node"))
+        await asyncio.sleep(0)
+        t0 = asyncio.get_running_loop().time()
+        await request(server, "unload_map", map="n")
+        await server.sweeping
+        assert asyncio.get_running_loop().time() - t0 < SWEEP_TIMEOUT
+        assert server.sweep_deferred and not search.done()
+
+        # and the busy one once its search finished
+        assert (await search)["ok"]
+        assert server.sweeping is not None and not server.sweep_deferred
+        await server.sweeping
+    run(test)
+
+
+def test_client(tmp_path):
+    async def main():
+        ox, oy, start, goal = scenarios.make_scenario("rooms", 60)
+        path = str(tmp_path / "planning.sock")
+        async with PlanningServer(workers=1) as server:
+            assert await server.start(path=path) == path
+            async with await PlanningClient.connect(path=path) as client:
+                response = await client.request("load_map", map="m", ox=ox,
+                                                 oy=oy, resolution=1.0,
+                                                 rr=1.0)
+                assert response["ok"] and response["version"] == 1
+                responses = await asyncio.gather(*(
+                    client.request("plan", map="m", start=start, goal=goal,
+                                   mode=mode)
+                    for mode in ("array", "jps", "bad")))
+        planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+        for response, mode in zip(responses[:2], ("array", "jps")):
+            assert (response["rx"], response["ry"]) == \
+                planner.planning(*start, *goal, mode=mode)
+        assert not responses[2]["ok"]
+    asyncio.run(main())
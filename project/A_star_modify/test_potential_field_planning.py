@@ -0,0 +1,151 @@
+"""
+
+Tiled, lazy, batched and parallel potential fields against the full field
+
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import a_star_modify
+import potential_field_planning as pfp
+from instrumentation import Instrumentation
+
+
+def make_obstacles(n=60, size=40.0, seed=0):
+    rng = random.Random(seed)
+    return ([rng.uniform(0, size) for _ in range(n)],
+            [rng.uniform(0, size) for _ in range(n)])
+
+
+def full_field(gx, gy, ox, oy, reso, rr, minx, miny, xw, yw):
+    # the whole field at once, every cell against every obstacle point
+    x = (np.arange(xw) * reso + minx)[:, None]
+    y = (np.arange(yw) * reso + miny)[None, :]
+    dq = np.min(np.hypot(x[..., None] - np.asarray(ox),
+                         y[..., None] - np.asarray(oy)), axis=-1)
+    uo = np.where(dq <= rr, 0.5 * pfp.ETA *
+                  (1.0 / np.maximum(dq, 0.1) - 1.0 / rr) ** 2, 0.0)
+    return (pfp.calc_attractive_potential(x, y, gx, gy) + uo).astype(
+        np.float32)
+
+
+@pytest.mark.parametrize("tile, rr", [(7, 5.0), (16, 2.0), (64, 12.0)])
+def test_tiled_field_matches_full_field(monkeypatch, tile, rr):
+    monkeypatch.setattr(pfp, "FIELD_TILE", tile)
+    ox, oy = make_obstacles()
+    minx, miny, xw, yw = pfp.calc_field_bounds(35.0, 30.0, ox, oy, 0.5,
+                                               1.0, 2.0)
+    pmap = pfp.calc_field(35.0, 30.0, ox, oy, 0.5, rr, minx, miny, xw, yw)
+    assert pmap.dtype == np.float32 and pmap.shape == (xw, yw)
+    np.testing.assert_array_equal(
+        pmap, full_field(35.0, 30.0, ox, oy, 0.5, rr, minx, miny, xw, yw))
+
+
+def test_field_memory_mapped(monkeypatch, tmp_path):
+    monkeypatch.setattr(pfp, "FIELD_TILE", 16)
+    ox, oy = make_obstacles()
+    pmap, minx, miny = pfp.calc_potential_field(35.0, 30.0, ox, oy, 0.5,
+                                                5.0, 1.0, 2.0)
+    path = str(tmp_path / "field.f32")
+    mapped, _, _ = pfp.calc_potential_field(35.0, 30.0, ox, oy, 0.5, 5.0,
+                                            1.0, 2.0, path)
+    assert isinstance(mapped, np.memmap) and mapped.filename == path
+    np.testing.assert_array_equal(mapped, pmap)
+
+    # fields over MAX_IN_MEMORY_CELLS go to a temporary file
+    monkeypatch.setattr(pfp, "MAX_IN_MEMORY_CELLS", 100)
+    spilled, _, _ = pfp.calc_potential_field(35.0, 30.0, ox, oy, 0.5, 5.0,
+                                             1.0, 2.0)
+    assert isinstance(spilled, np.memmap)
+    np.testing.assert_array_equal(spilled, pmap)
+
+
+def test_tiled_field_paths(monkeypatch):
+    ox, oy = make_obstacles(seed=1)
+    path = pfp.potential_field_planning(0.0, 10.0, 38.0, 35.0, ox, oy,
+                                        0.5, 5.0)
+    monkeypatch.setattr(pfp, "FIELD_TILE", 8)
+    assert pfp.potential_field_planning(0.0, 10.0, 38.0, 35.0, ox, oy,
+                                        0.5, 5.0) == path
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_lazy_field_matches_full_field(seed):
+    ox, oy = make_obstacles(seed=seed)
+    rng = random.Random(seed)
+    sx, sy = rng.uniform(0, 40), rng.uniform(0, 40)
+    pmap, minx, miny = pfp.calc_potential_field(38.0, 35.0, ox, oy, 0.5,
+                                                5.0, sx, sy)
+    lazy = pfp.LazyPotentialField(38.0, 35.0, ox, oy, 0.5, 5.0, sx, sy)
+    assert lazy.shape == pmap.shape
+    assert (lazy.minx, lazy.miny) == (minx, miny)
+    for _ in range(200):
+        ix, iy = rng.randrange(pmap.shape[0]), rng.randrange(pmap.shape[1])
+        assert lazy[ix, iy] == pmap[ix, iy]
+
+    assert pfp.potential_field_planning(
+        sx, sy, 38.0, 35.0, ox, oy, 0.5, 5.0, lazy=True) == \
+        pfp.potential_field_planning(sx, sy, 38.0, 35.0, ox, oy, 0.5, 5.0)
+
+
+def test_lazy_field_evaluates_around_the_path():
+    ox, oy = make_obstacles()
+    lazy = pfp.LazyPotentialField(38.0, 35.0, ox, oy, 0.5, 5.0, 0.0, 10.0)
+    lazy[0, 0]
+    assert set(lazy.values) == {(0, 0), (0, 1), (1, 0), (1, 1)}
+    lazy[5, 5]
+    assert len(lazy.values) == 4 + 9
+
+
+def test_batch_matches_single_robot():
+    ox, oy = make_obstacles(n=80, seed=2)
+    rng = random.Random(2)
+    # starts within the obstacles' bounding box, so every single-robot
+    # field has the bounds of the shared one
+    starts = [(rng.uniform(min(ox), max(ox)), rng.uniform(min(oy), max(oy)))
+              for _ in range(40)] + [(38.0, 35.0)]
+    inst = Instrumentation()
+    paths = pfp.potential_field_planning_batch(starts, 38.0, 35.0, ox, oy,
+                                               0.5, 5.0, inst)
+    assert len(paths) == len(starts)
+    for (sx, sy), path in zip(starts, paths):
+        assert path == pfp.potential_field_planning(sx, sy, 38.0, 35.0, ox,
+                                                    oy, 0.5, 5.0)
+    assert inst.counters["expansions"] == sum(len(rx) - 1 for rx, _ in paths)
+
+
+def test_batch_without_robots():
+    ox, oy = make_obstacles()
+    assert pfp.potential_field_planning_batch([], 38.0, 35.0, ox, oy,
+                                              0.5, 5.0) == []
+
+
+def test_parallel_field_matches_serial(tmp_path):
+    # more than one FIELD_TILE tile a side, the default tile size is used
+    # as the workers may not see a patched one
+    ox, oy = make_obstacles(n=400, size=300.0, seed=3)
+    xw, yw = pfp.FIELD_TILE + 88, pfp.FIELD_TILE + 8
+    args = (150.0, 140.0, ox, oy, 0.5, 5.0, -2.0, -1.0, xw, yw)
+    serial = pfp.calc_field(*args)
+    np.testing.assert_array_equal(pfp.calc_field(*args, workers=2), serial)
+
+    path = str(tmp_path / "field.f32")
+    mapped = pfp.calc_field(*args, path=path, workers=2)
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(mapped, serial)
+    np.testing.assert_array_equal(
+        np.memmap(path, dtype=np.float32, mode="r", shape=(xw, yw)), serial)
+
+
+def test_parallel_a_star_modify_field():
+    ox, oy = make_obstacles(n=400, size=300.0, seed=4)
+    ox += [0.0, 300.0]
+    oy += [0.0, 300.0]
+    serial = a_star_modify.AStarPlanner(ox, oy, 0.5, 5.0)
+    parallel = a_star_modify.AStarPlanner(ox, oy, 0.5, 5.0, field_workers=2)
+    assert serial.x_width > pfp.FIELD_TILE
+    np.testing.assert_array_equal(parallel.load_potential_field(150.0, 140.0),
+                                  serial.load_potential_field(150.0, 140.0))
@@ -0,0 +1,50 @@
+"""
+
+Reproducible planning scenarios
+
+"""
+
+import pytest
+
+import a_star
+import scenarios
+
+
+@pytest.mark.parametrize("kind", sorted(scenarios.GENERATORS))
+@pytest.mark.parametrize("size", (40, 100))
+def test_start_and_goal_connected(kind, size):
+    ox, oy, start, goal = scenarios.make_scenario(kind, size)
+    assert len(ox) == len(oy)
+    planner = a_star.AStarPlanner(ox, oy, 1.0, 1.0)
+    for x, y in (start, goal):
+        ix = planner.calc_xy_index(x, planner.min_x)
+        iy = planner.calc_xy_index(y, planner.min_y)
+        assert not planner.obstacle_map[ix, iy]
+    rx, ry = planner.planning(*start, *goal, mode="array")
+    assert len(rx) > 1
+
+
+@pytest.mark.parametrize("kind", ("random", "maze", "rooms"))
+def test_seeds(kind):
+    first = scenarios.make_scenario(kind, 60, seed=3)
+    assert scenarios.make_scenario(kind, 60, seed=3) == first
+    assert scenarios.make_scenario(kind, 60, seed=4) != first
+
+
+def test_main_map_ignores_seed():
+    assert scenarios.make_scenario("main", 70, seed=1) == \
+        scenarios.make_scenario("main", 70)
+    ox, oy, start, goal = scenarios.main_map(70)
+    assert (min(ox), min(oy), max(ox), max(oy)) == (0.0, 0.0, 70.0, 70.0)
+    assert (start, goal) == ((20.0, 20.0), (60.0, 60.0))
+
+
+def test_wall_points():
+    ox, oy = scenarios.wall(0.0, 0.0, 3.0, 4.0, step=1.0)
+    assert len(ox) == 6
+    assert (ox[0], oy[0], ox[-1], oy[-1]) == (0.0, 0.0, 3.0, 4.0)
+
+
+def test_unknown_scenario():
+    with pytest.raises(ValueError):
+        scenarios.make_scenario("forest", 50)